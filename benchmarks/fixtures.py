@@ -0,0 +1,125 @@
+import math
+import os
+import random
+import subprocess
+import sys
+import wave
+from typing import Dict, List, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from ffmpeg_renderer import ffmpeg_binary
+from tts_engine import WordTiming
+
+# Synthesized inputs are reused between runs; delete the folder to regenerate them
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".fixtures")
+
+WORDS = (
+    "honestly the weirdest thing that ever happened to me was at my cousin's wedding when "
+    "a raccoon walked in through the kitchen door and nobody said anything for ten whole "
+    "minutes because everyone assumed it belonged to somebody else at the party"
+).split()
+
+
+class Fixtures:
+    """
+    Deterministic stand-ins for the pipeline's real inputs: gameplay footage (ffmpeg test
+    pattern), AI images (PIL-drawn gradients and shapes) and voiceovers (tone + noise WAVs
+    with evenly spaced word timings). Files are keyed by their parameters and cached on disk.
+    """
+
+    def __init__(self, root: str = FIXTURE_DIR, seed: int = 1234):
+        self.root = root
+        self.seed = seed
+        os.makedirs(root, exist_ok=True)
+
+    def gameplay(self, duration: float = 90.0, size: Tuple[int, int] = (1920, 1080), fps: int = 30) -> str:
+        """
+        Landscape gameplay-like clip with motion on every frame and 2-second GOPs.
+        Kept in its own folder so it can serve as a GameplayLibrary assets dir.
+        """
+        directory = os.path.join(self.root, "gameplay")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"gameplay_{size[0]}x{size[1]}_{fps}fps_{int(duration)}s.mp4")
+        if os.path.exists(path):
+            return path
+        tmp_path = f"{path}.{os.getpid()}.tmp.mp4"
+        cmd = [
+            ffmpeg_binary(), "-y", "-hide_banner", "-loglevel", "error",
+            "-f", "lavfi", "-i", f"testsrc2=size={size[0]}x{size[1]}:rate={fps}:duration={duration}",
+            "-c:v", "libx264", "-preset", "veryfast", "-crf", "23", "-g", str(fps * 2),
+            "-pix_fmt", "yuv420p", tmp_path,
+        ]
+        result = subprocess.run(cmd, capture_output=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed to synthesize gameplay: {result.stderr.decode(errors='replace')[-500:]}")
+        os.replace(tmp_path, path)
+        return path
+
+    def image(self, index: int, size: Tuple[int, int] = (1024, 1024)) -> str:
+        """
+        Square "generated" image (the size Pollinations returns) so the crop/resize path runs.
+        """
+        directory = os.path.join(self.root, "images")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"image_{index}_{size[0]}x{size[1]}.png")
+        if os.path.exists(path):
+            return path
+        rng = random.Random(self.seed + index)
+        w, h = size
+        top, bottom = np.array([rng.randrange(256) for _ in range(3)]), np.array([rng.randrange(256) for _ in range(3)])
+        ramp = np.linspace(0.0, 1.0, h)[:, None, None]
+        pixels = (top * (1 - ramp) + bottom * ramp).astype(np.uint8).repeat(w, axis=1)
+        img = Image.fromarray(pixels, "RGB")
+        draw = ImageDraw.Draw(img)
+        for _ in range(12):
+            x, y, r = rng.randrange(w), rng.randrange(h), rng.randrange(40, 220)
+            color = tuple(rng.randrange(256) for _ in range(3))
+            draw.ellipse((x - r, y - r, x + r, y + r), fill=color)
+        img.save(path)
+        return path
+
+    def voiceover(self, index: int, duration: float, sample_rate: int = 24000) -> str:
+        """
+        Mono 16-bit WAV of `duration` seconds: a gliding tone with syllable-rate amplitude
+        modulation plus a little noise, roughly speech-like to the encoder.
+        """
+        directory = os.path.join(self.root, "audio")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"voice_{index}_{duration:.2f}s.wav")
+        if os.path.exists(path):
+            return path
+        rng = np.random.default_rng(self.seed + index)
+        t = np.arange(int(duration * sample_rate)) / sample_rate
+        freq = 140 + 40 * np.sin(2 * math.pi * 0.5 * t)
+        phase = 2 * math.pi * np.cumsum(freq) / sample_rate
+        envelope = 0.5 + 0.5 * np.sin(2 * math.pi * 4 * t) ** 2
+        signal = 0.3 * envelope * np.sin(phase) + 0.02 * rng.standard_normal(len(t))
+        pcm = (np.clip(signal, -1, 1) * 32767).astype("<i2")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with wave.open(tmp_path, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(sample_rate)
+            wav.writeframes(pcm.tobytes())
+        os.replace(tmp_path, path)
+        return path
+
+    def segments(self, count: int, duration: float, captions: int) -> Tuple[List[Dict], List[str], List[str]]:
+        """
+        count segments sharing `duration` seconds and `captions` two-word caption chunks.
+        Returns (segments with text, word timings and length, image paths, voiceover paths).
+        """
+        seg_duration = duration / count
+        words_per_segment = max(1, round(captions * 2 / count))
+        segments, images, audio = [], [], []
+        for i in range(count):
+            words = [WORDS[(i * words_per_segment + j) % len(WORDS)] for j in range(words_per_segment)]
+            step = seg_duration / len(words)
+            timings = [WordTiming(word, j * step, step * 0.9) for j, word in enumerate(words)]
+            segments.append({"text": " ".join(words), "words": timings, "duration": seg_duration})
+            images.append(self.image(i))
+            audio.append(self.voiceover(i, seg_duration))
+        return segments, images, audio
@@ -0,0 +1,97 @@
+"""
+Offline provider load test: farm-scale traffic against the replay stand-in server.
+
+    HTTP_RECORD=1 python src/main.py --topic "..."        # once, online: record cassettes
+    python benchmarks/provider_load.py --jobs 40 --workers 8 --profile throttled
+
+Each job is one farm topic's network work (script, one image per segment, voiceovers)
+plus a Reddit thread selection. ContentEngine, MediaGen, TTSEngine and RedditClient run
+unmodified; only their traffic goes to the stand-in, shaped by the chosen profile.
+"""
+import argparse
+import concurrent.futures
+import json
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from http_replay import PROFILES, CassetteStore, ReplayServer
+
+SUBREDDITS = ["AskReddit", "NoStupidQuestions", "Showerthoughts"]
+
+
+def run_job(i: int, engines, work_dir: str) -> bool:
+    content, media, tts, reddit = engines
+    script = content.generate_script(f"Load test topic #{i}")
+    segments = script.get("script_segments", []) if script else []
+    if not segments:
+        return False
+    for j, segment in enumerate(segments):
+        media.generate_image(segment.get("visual_prompt", ""), os.path.join(work_dir, f"job{i}_img{j}.jpg"))
+    tts.generate_many([(segment.get("text", ""), None) for segment in segments])
+    return reddit.get_pooled_thread(SUBREDDITS) is not None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the provider clients against recorded responses")
+    parser.add_argument("--jobs", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent jobs (farm workers)")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="recorded")
+    parser.add_argument("--cassettes", default=None, help="Cassette folder (default: CASSETTE_DIR or cassettes/)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep-caches", action="store_true",
+                        help="Leave the image/TTS/Reddit caches on (by default every call reaches the stand-in)")
+    args = parser.parse_args()
+
+    server = ReplayServer(CassetteStore(args.cassettes), PROFILES[args.profile], port=0, seed=args.seed).start()
+    if not len(server.index):
+        print(f"⚠️ No cassettes in {server.store.root}. Record some first with HTTP_RECORD=1.")
+    print(f"📼 {len(server.index)} cassettes, profile '{args.profile}', stand-in at {server.url}")
+
+    work_dir = tempfile.mkdtemp(prefix="provider_load_")
+    # Must be set before the shared HTTP client is created
+    os.environ["HTTP_REPLAY_URL"] = server.url
+    os.environ["CONTENT_DB"] = os.path.join(work_dir, "content.db")
+    if not args.keep_caches:
+        for name in ("IMAGE_CACHE_MB", "TTS_CACHE_MB", "REDDIT_CACHE_MB"):
+            os.environ[name] = "0"
+
+    from content_engine import ContentEngine
+    from media_gen import MediaGen
+    from reddit_client import RedditClient
+    from tts_engine import TTSEngine
+    from http_client import get_client
+    from rate_limiter import limiter_stats
+    import tracing
+
+    engines = (ContentEngine(), MediaGen(), TTSEngine(output_dir=work_dir), RedditClient())
+    started = time.perf_counter()
+    ok = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = [executor.submit(run_job, i, engines, work_dir) for i in range(args.jobs)]
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                ok += bool(future.result())
+            except Exception as e:
+                print(f"❌ Job failed: {e}")
+    elapsed = time.perf_counter() - started
+    server.stop()
+
+    print(f"\n🏁 {ok}/{args.jobs} jobs in {elapsed:.1f}s ({args.jobs / elapsed * 60:.1f} jobs/min)")
+    tracing.TRACER.print_summary()
+    print("\n🚦 Client limiters:")
+    for provider, s in limiter_stats().items():
+        print(f"   {provider:<20} {s['requests']:5d} requests, {s['throttled']:4d} throttled, "
+              f"{s['waited_seconds']:7.1f}s waited, settled at {s['rate']} req/s")
+    print("\n🌐 Client latency by host:")
+    for host, s in get_client().stats().items():
+        print(f"   {host:<36} {s['requests']:5d} requests, {s['errors']:4d} errors, avg {s['avg_seconds']}s")
+    print(f"\n📊 Stand-in: {json.dumps(server.stats(), indent=2)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+"""
+Offline render benchmarks: no network, all inputs synthesized (see fixtures.py).
+
+    python benchmarks/render_bench.py                     # quick suite, compare to baseline.json
+    python benchmarks/render_bench.py --suite full --repeat 3
+    python benchmarks/render_bench.py --save-baseline     # record this machine's numbers
+
+Every case runs in a fresh process so peak RSS belongs to that case alone.
+Exits with status 1 if any case failed or regressed beyond --tolerance against the baseline.
+"""
+import argparse
+import concurrent.futures
+import contextlib
+import json
+import math
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from itertools import product
+from typing import Dict, List, NamedTuple, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+try:
+    import resource
+except ImportError:  # Windows: no getrusage, RSS is not reported
+    resource = None
+
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+TARGETS = ("caption_clip", "create_video", "reddit")
+
+
+class BenchCase(NamedTuple):
+    target: str      # caption_clip | create_video | reddit
+    segments: int
+    captions: int    # Two-word caption chunks across the whole video
+    duration: float  # Seconds of output
+    backend: str = "moviepy"
+
+    @property
+    def key(self) -> str:
+        return (f"{self.target}[{self.backend}] seg={self.segments} "
+                f"cap={self.captions} dur={self.duration:g}s")
+
+
+def suite_cases(suite: str, targets: List[str], backends: List[str]) -> List[BenchCase]:
+    if suite == "quick":
+        grids = {
+            "caption_clip": [(1, c, 4.0) for c in (10, 40)],
+            "create_video": [(2, 8, 6.0), (4, 24, 6.0)],
+            "reddit": [(2, 8, 6.0), (4, 24, 12.0)],
+        }
+    else:
+        grids = {
+            "caption_clip": [(1, c, d) for c, d in product((20, 80, 320), (10.0, 30.0))],
+            "create_video": list(product((3, 8), (20, 80), (20.0, 60.0))),
+            "reddit": list(product((3, 8), (20, 80), (30.0, 60.0))),
+        }
+    cases = []
+    for target in targets:
+        # create_caption_clip has no backend switch
+        target_backends = ["moviepy"] if target == "caption_clip" else backends
+        for backend in target_backends:
+            cases.extend(BenchCase(target, s, c, d, backend) for s, c, d in grids[target])
+    return cases
+
+
+# --- Cases (run inside a fresh worker process) ---
+
+def _bench_caption_clip(case: BenchCase, workdir: str) -> Dict:
+    """
+    create_caption_clip for every chunk, then every frame of the caption layers composited
+    over a blank background (what MoviePy does per frame when captions are separate clips).
+    """
+    from moviepy.editor import ColorClip, CompositeVideoClip
+    from fixtures import WORDS
+    from video_editor import VideoEditor
+
+    editor = VideoEditor(render_backend="moviepy")
+    chunk_duration = case.duration / case.captions
+    started = time.perf_counter()
+    clips = []
+    for i in range(case.captions):
+        text = f"{WORDS[(2 * i) % len(WORDS)]} {WORDS[(2 * i + 1) % len(WORDS)]}".upper()
+        clips.append(editor.create_caption_clip(text, chunk_duration, i * chunk_duration))
+    background = ColorClip((editor.width, editor.height), color=(20, 20, 20), duration=case.duration)
+    composite = CompositeVideoClip([background] + clips, size=(editor.width, editor.height))
+    frames = sum(1 for _ in composite.iter_frames(fps=editor.fps))
+    wall = time.perf_counter() - started
+    composite.close()
+    return {"wall": wall, "frames": frames, "output_seconds": frames / editor.fps}
+
+
+def _bench_create_video(case: BenchCase, workdir: str) -> Dict:
+    from fixtures import Fixtures
+    from ffmpeg_renderer import media_duration
+    from video_editor import VideoEditor
+
+    segments, images, audio = Fixtures().segments(case.segments, case.duration, case.captions)
+    editor = VideoEditor(render_backend=case.backend, render_workers=1)
+    output = os.path.join(workdir, "slideshow.mp4")
+    started = time.perf_counter()
+    editor.create_video(segments, images, audio, output)
+    wall = time.perf_counter() - started
+    seconds = media_duration(output)
+    return {"wall": wall, "frames": math.ceil(seconds * editor.fps), "output_seconds": seconds}
+
+
+def _bench_reddit(case: BenchCase, workdir: str) -> Dict:
+    from fixtures import Fixtures
+    from ffmpeg_renderer import media_duration
+    from gameplay_library import GameplayLibrary
+    from main_reddit import RedditShortsMaker
+
+    fixtures = Fixtures()
+    gameplay = fixtures.gameplay(duration=max(90.0, case.duration * 1.5))
+    segments, _, audio = fixtures.segments(case.segments, case.duration, case.captions)
+    # The maker creates its folders and content DB in the working directory: keep them in the scratch dir
+    os.environ["CONTENT_DB"] = os.path.join(workdir, "content.db")
+    maker = RedditShortsMaker(render_backend=case.backend)
+    maker.output_dir = workdir
+    maker.gameplay = GameplayLibrary(os.path.dirname(gameplay))
+    random.seed(0)
+    output = os.path.join(workdir, "reddit.mp4")
+    started = time.perf_counter()
+    maker._assemble_reddit_video(gameplay, audio, segments, output)
+    wall = time.perf_counter() - started
+    seconds = media_duration(output)
+    return {"wall": wall, "frames": math.ceil(seconds * maker.editor.fps), "output_seconds": seconds}
+
+
+CASE_RUNNERS = {
+    "caption_clip": _bench_caption_clip,
+    "create_video": _bench_create_video,
+    "reddit": _bench_reddit,
+}
+
+
+def _peak_rss_mb(who) -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _run_case(case: BenchCase, verbose: bool) -> Dict:
+    """
+    Worker entry point: one measurement of one case in this (fresh) process.
+    """
+    workdir = tempfile.mkdtemp(prefix="bench_")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        sink = contextlib.nullcontext() if verbose else open(os.devnull, "w")
+        with sink as devnull:
+            with contextlib.redirect_stdout(devnull or sys.stdout), contextlib.redirect_stderr(devnull or sys.stderr):
+                result = CASE_RUNNERS[case.target](case, workdir)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    result["peak_rss_mb"] = _peak_rss_mb(resource.RUSAGE_SELF) if resource else None
+    # Largest child (ffmpeg encoder / decoders) seen by this process
+    result["child_rss_mb"] = _peak_rss_mb(resource.RUSAGE_CHILDREN) if resource else None
+    return result
+
+
+def measure(case: BenchCase, repeat: int, verbose: bool = False) -> Dict:
+    """
+    Median wall time over `repeat` fresh processes; peak RSS is the worst run.
+    """
+    runs = []
+    context = multiprocessing.get_context("spawn")
+    for _ in range(repeat):
+        with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            runs.append(executor.submit(_run_case, case, verbose).result())
+    wall = statistics.median(r["wall"] for r in runs)
+    frames = runs[0]["frames"]
+    output_seconds = runs[0]["output_seconds"]
+    rss = [r["peak_rss_mb"] for r in runs if r["peak_rss_mb"] is not None]
+    child_rss = [r["child_rss_mb"] for r in runs if r["child_rss_mb"] is not None]
+    return {
+        "wall_seconds": round(wall, 3),
+        "frames": frames,
+        "fps": round(frames / wall, 2),
+        "realtime": round(output_seconds / wall, 3),  # Seconds of output per wall-second
+        "peak_rss_mb": max(rss) if rss else None,
+        "child_rss_mb": max(child_rss) if child_rss else None,
+        "repeat": repeat,
+    }
+
+
+# --- Baseline comparison ---
+
+def machine_info() -> Dict:
+    return {
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def load_baseline(path: str) -> Optional[Dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_baseline(path: str, results: Dict[str, Dict]):
+    """
+    Merges results into the baseline file (cases not run this time keep their old numbers).
+    """
+    baseline = load_baseline(path) or {}
+    merged = dict(baseline.get("results", {}))
+    merged.update(results)
+    data = {"machine": machine_info(), "saved_at": time.strftime("%Y-%m-%d %H:%M:%S"), "results": merged}
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _change(new: Optional[float], old: Optional[float]) -> Optional[float]:
+    if new is None or not old:
+        return None
+    return (new - old) / old
+
+
+def compare(result: Dict, base: Optional[Dict], tolerance: float) -> List[str]:
+    """
+    Regressions of one case against its baseline entry: lower fps or higher peak RSS beyond tolerance.
+    """
+    if not base:
+        return []
+    problems = []
+    fps_change = _change(result["fps"], base.get("fps"))
+    if fps_change is not None and fps_change < -tolerance:
+        problems.append(f"fps {base['fps']} -> {result['fps']} ({fps_change:+.0%})")
+    rss_change = _change(result["peak_rss_mb"], base.get("peak_rss_mb"))
+    if rss_change is not None and rss_change > tolerance:
+        problems.append(f"peak RSS {base['peak_rss_mb']} -> {result['peak_rss_mb']} MB ({rss_change:+.0%})")
+    return problems
+
+
+def _fmt_change(new, old) -> str:
+    change = _change(new, old)
+    return "" if change is None else f"{change:+.0%}"
+
+
+def print_report(results: Dict[str, Dict], baseline: Optional[Dict]):
+    base_results = (baseline or {}).get("results", {})
+    print(f"\n{'case':<52} {'fps':>8} {'Δ':>6} {'x realtime':>10} {'peak MB':>8} {'Δ':>6} {'ffmpeg MB':>9}")
+    for key, r in results.items():
+        base = base_results.get(key, {})
+        print(f"{key:<52} {r['fps']:>8.1f} {_fmt_change(r['fps'], base.get('fps')):>6} "
+              f"{r['realtime']:>10.2f} {r['peak_rss_mb'] or 0:>8.0f} "
+              f"{_fmt_change(r['peak_rss_mb'], base.get('peak_rss_mb')):>6} {r['child_rss_mb'] or 0:>9.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline render benchmarks with baseline comparison")
+    parser.add_argument("--suite", choices=("quick", "full"), default="quick")
+    parser.add_argument("--targets", default=",".join(TARGETS),
+                        help=f"Comma-separated subset of {', '.join(TARGETS)}")
+    parser.add_argument("--backends", default=os.getenv("RENDER_BACKEND") or "moviepy",
+                        help="Comma-separated render backends (moviepy, ffmpeg, stills)")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per case (median wall time is reported)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed slowdown / RSS growth (0.10 = 10%%)")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="Show render logs")
+    args = parser.parse_args()
+
+    targets = [t.strip() for t in args.targets.split(",") if t.strip()]
+    unknown = set(targets) - set(TARGETS)
+    if unknown:
+        parser.error(f"Unknown targets: {', '.join(sorted(unknown))}")
+    backends = [b.strip().lower() for b in args.backends.split(",") if b.strip()]
+    cases = suite_cases(args.suite, targets, backends)
+
+    baseline = load_baseline(args.baseline)
+    if baseline and baseline.get("machine") != machine_info():
+        print(f"⚠️ Baseline was recorded on a different machine ({baseline.get('machine')}); compare with care")
+
+    # Fixtures are built once up front so their cost never lands in a measurement
+    from fixtures import Fixtures
+    print("🧪 Synthesizing fixtures...")
+    fixtures = Fixtures()
+    for case in cases:
+        if case.target == "reddit":
+            fixtures.gameplay(duration=max(90.0, case.duration * 1.5))
+        if case.target != "caption_clip":
+            fixtures.segments(case.segments, case.duration, case.captions)
+
+    results: Dict[str, Dict] = {}
+    regressions: Dict[str, List[str]] = {}
+    failures: Dict[str, str] = {}
+    for i, case in enumerate(cases):
+        print(f"⏱️ [{i + 1}/{len(cases)}] {case.key}")
+        try:
+            results[case.key] = measure(case, max(1, args.repeat), args.verbose)
+        except Exception as e:
+            print(f"❌ {case.key} failed: {e}")
+            failures[case.key] = str(e) or type(e).__name__
+            continue
+        problems = compare(results[case.key], (baseline or {}).get("results", {}).get(case.key), args.tolerance)
+        if problems:
+            regressions[case.key] = problems
+
+    print_report(results, baseline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"machine": machine_info(), "results": results}, f, indent=2, sort_keys=True)
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"\n💾 Baseline saved to {args.baseline}")
+    elif baseline is None:
+        print(f"\nℹ️ No baseline at {args.baseline} yet. Run with --save-baseline to record one.")
+
+    if failures:
+        print(f"\n💥 {len(failures)} case(s) failed:")
+        for key, error in failures.items():
+            print(f"   {key}: {error}")
+    if regressions:
+        print(f"\n📉 {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+        for key, problems in regressions.items():
+            print(f"   {key}: {'; '.join(problems)}")
+    if failures or regressions:
+        sys.exit(1)
+    if baseline and not args.save_baseline:
+        print(f"\n✅ No regressions beyond {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main()
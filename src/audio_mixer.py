@@ -0,0 +1,117 @@
+import os
+import subprocess
+import tempfile
+import wave
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from ffmpeg_renderer import ffmpeg_binary
+from tracing import traced
+
+
+class MixResult(NamedTuple):
+    """
+    The mixed master plus where each input clip landed on it.
+    """
+    samples: np.ndarray                 # float32, shape (n_samples, channels)
+    sample_rate: int
+    offsets: List[Tuple[int, int]]      # (start_sample, end_sample) per input clip
+
+    @property
+    def duration(self) -> float:
+        return len(self.samples) / self.sample_rate
+
+    def segment_times(self) -> List[Tuple[float, float]]:
+        """
+        (start, duration) in seconds for every input clip, for caption timing.
+        """
+        return [(start / self.sample_rate, (end - start) / self.sample_rate) for start, end in self.offsets]
+
+
+class AudioMixer:
+    """
+    Decodes each voiceover clip exactly once into float32 PCM and concatenates them in a
+    preallocated buffer, with vectorized loudness matching and peak normalization.
+    Replaces the concatenate_audioclips -> temp MP3 -> reload round-trip.
+    """
+
+    def __init__(self, sample_rate: int = 44100, channels: int = 2,
+                 target_rms_db: Optional[float] = -20.0, peak_db: float = -1.0):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.target_rms_db = target_rms_db  # None keeps each clip's own level
+        self.peak_db = peak_db
+
+    def decode(self, path: str) -> np.ndarray:
+        """
+        Decodes any ffmpeg-readable file to float32 PCM at the mixer's rate/channel layout.
+        """
+        cmd = [
+            ffmpeg_binary(), "-hide_banner", "-loglevel", "error", "-i", path,
+            "-f", "f32le", "-acodec", "pcm_f32le",
+            "-ac", str(self.channels), "-ar", str(self.sample_rate), "-",
+        ]
+        result = subprocess.run(cmd, capture_output=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"Could not decode {path}: {result.stderr.decode(errors='replace')[-500:]}")
+        return np.frombuffer(result.stdout, dtype=np.float32).reshape(-1, self.channels)
+
+    @traced("audio.mix")
+    def mix(self, paths: List[str], gap: float = 0.0) -> MixResult:
+        """
+        Concatenates paths (with optional silence of `gap` seconds between clips).
+        """
+        clips = [self.decode(p) for p in paths]
+        gap_samples = int(round(gap * self.sample_rate))
+        total = sum(len(c) for c in clips) + gap_samples * max(0, len(clips) - 1)
+
+        master = np.zeros((total, self.channels), dtype=np.float32)
+        offsets: List[Tuple[int, int]] = []
+        pos = 0
+        for i, clip in enumerate(clips):
+            if i:
+                pos += gap_samples
+            master[pos:pos + len(clip)] = clip
+            offsets.append((pos, pos + len(clip)))
+            pos += len(clip)
+
+        if self.target_rms_db is not None:
+            self._match_loudness(master, offsets)
+        self._normalize_peak(master)
+        return MixResult(master, self.sample_rate, offsets)
+
+    def _match_loudness(self, master: np.ndarray, offsets: List[Tuple[int, int]]):
+        """
+        Per-clip gain so every voiceover segment sits at the same RMS level.
+        """
+        target = 10 ** (self.target_rms_db / 20)
+        for start, end in offsets:
+            if end <= start:
+                continue
+            segment = master[start:end]
+            rms = float(np.sqrt(np.mean(np.square(segment, dtype=np.float64))))
+            if rms > 1e-6:
+                segment *= np.float32(target / rms)
+
+    def _normalize_peak(self, master: np.ndarray):
+        peak = float(np.max(np.abs(master))) if master.size else 0.0
+        ceiling = 10 ** (self.peak_db / 20)
+        if peak > ceiling:
+            master *= np.float32(ceiling / peak)
+
+    def write_wav(self, result: MixResult, path: Optional[str] = None, directory: Optional[str] = None) -> str:
+        """
+        Writes the master as 16-bit PCM WAV (lossless hand-off to the encoder).
+        Without an explicit path a unique temp file is created, so concurrent runs never collide.
+        """
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix="mix_", suffix=".wav", dir=directory)
+            os.close(fd)
+        pcm = (np.clip(result.samples, -1.0, 1.0) * 32767).astype("<i2")
+        with wave.open(path, "wb") as wav:
+            wav.setnchannels(self.channels)
+            wav.setsampwidth(2)
+            wav.setframerate(result.sample_rate)
+            wav.writeframes(pcm.tobytes())
+        return path
@@ -1,46 +1,118 @@
 from main_reddit import RedditShortsMaker
-import random
+from tts_cache import default_cache
+from rate_limiter import limiter_stats
+import tracing
+import os
+import queue
+import threading
 import time
 
+# Videos whose thread + voiceover are fetched ahead of the one being rendered
+PREFETCH = max(1, int(os.getenv("BATCH_PREFETCH", "2")))
+
+def prefetch_jobs(bot, count, subreddits, jobs, stop):
+    """
+    Producer: fetches threads and synthesizes voiceovers into the bounded jobs queue.
+    Blocks once PREFETCH jobs are waiting, so it never runs far ahead of the encoder.
+    No fixed cooldown: Reddit and edge-tts calls are paced by their adaptive rate limiters.
+    Puts None when finished. Already-produced threads are skipped via the bot's content store.
+    """
+    try:
+        for i in range(count):
+            if stop.is_set():
+                break
+            job = None
+            # Simple retry logic: one more attempt (the pool moves on to other threads)
+            for attempt in range(2):
+                try:
+                    # One combined listing across all subreddits feeds the whole batch
+                    job = bot.prepare(subreddits)
+                except Exception as e:
+                    print(f"❌ Prefetch error for video {i+1}: {e}")
+                    import traceback
+                    traceback.print_exc()
+                if job:
+                    break
+                print(f"⚠️ Failed to prepare video {i+1}. Retrying...")
+
+            if job:
+                print(f"📥 Prefetched video {i+1}: {job.title}")
+                queued = False
+                while not stop.is_set():
+                    try:
+                        jobs.put(job, timeout=1)
+                        queued = True
+                        break
+                    except queue.Full:
+                        continue
+                if not queued:
+                    # Stopped while the queue was full: release the thread and its audio
+                    bot.discard(job)
+    finally:
+        jobs.put(None)
+
 def batch_generate(count=20):
     bot = RedditShortsMaker()
-    used_ids = []
-    
+
     # List of text-heavy subreddits
     subreddits = [
-        "AskReddit", "NoStupidQuestions", "Showerthoughts", 
+        "AskReddit", "NoStupidQuestions", "Showerthoughts",
         "confessions", "TrueOffMyChest", "explainlikeimfive", "AmItheAsshole"
     ]
-    
-    print(f"🚀 Starting Batch Generation of {count} videos...")
-    
-    for i in range(count):
-        print(f"\n=================================")
-        print(f"🎬 Generating Video {i+1}/{count}")
-        print(f"=================================\n")
-        
-        selected_sub = random.choice(subreddits)
-        
-        try:
-            # We track used IDs to avoid duplicates in this run
-            post_id = bot.run(selected_sub, ignore_ids=used_ids)
-            
-            if post_id:
-                used_ids.append(post_id)
-                print(f"✅ Finished Video {i+1}. Sleeping for 5s to cool down...")
-            else:
-                print(f"⚠️ Failed to generate video {i+1}. Retrying different sub...")
-                # Simple retry logic
-                selected_sub = random.choice(subreddits)
-                post_id = bot.run(selected_sub, ignore_ids=used_ids)
-                if post_id: used_ids.append(post_id)
-                
-            time.sleep(5) # Cool down
-            
-        except Exception as e:
-            print(f"❌ Critical Error in Batch {i+1}: {e}")
-            import traceback
-            traceback.print_exc()
+
+    print(f"🚀 Starting Batch Generation of {count} videos (prefetching {PREFETCH} ahead)...")
+
+    # Fetch/TTS for the next videos runs on a background thread while this one encodes
+    jobs = queue.Queue(maxsize=PREFETCH)
+    stop = threading.Event()
+    producer = threading.Thread(target=prefetch_jobs, args=(bot, count, subreddits, jobs, stop),
+                                name="prefetch", daemon=True)
+    producer.start()
+
+    started = time.time()
+    done = 0
+    try:
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+
+            print(f"\n=================================")
+            print(f"🎬 Rendering Video {done+1}/{count}")
+            print(f"=================================\n")
+
+            try:
+                if bot.render(job):
+                    done += 1
+                    print(f"✅ Finished Video {done}.")
+            except Exception as e:
+                print(f"❌ Critical Error rendering '{job.title}': {e}")
+                import traceback
+                traceback.print_exc()
+    finally:
+        # On early exit, stop the producer and release prefetched threads
+        stop.set()
+        while True:
+            try:
+                job = jobs.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                bot.discard(job)
+
+    elapsed = time.time() - started
+    print(f"\n🏁 {done}/{count} videos in {elapsed:.0f}s")
+    stats = default_cache().stats()
+    print(f"🗄️ TTS cache: {stats['hits']} hits, {stats['misses']} misses "
+          f"(~{stats['saved_seconds']}s of synthesis saved)")
+    posts = bot.store.counts()["posts"]
+    print(f"📋 Reddit listing requests: {bot.reddit.pool_refills}")
+    for provider, limiter in limiter_stats().items():
+        print(f"🚦 {provider}: {limiter['requests']} requests, {limiter['throttled']} throttled, "
+              f"settled at {limiter['rate']} req/s")
+    tracing.TRACER.print_summary()
+    print(f"📚 Content store: {posts.get('done', 0)} threads produced so far")
 
 if __name__ == "__main__":
+    tracing.enable()
     batch_generate(20)
@@ -0,0 +1,222 @@
+import os
+import shutil
+import subprocess
+import threading
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from tracing import traced
+
+
+class CaptionStyle(NamedTuple):
+    """
+    Everything that changes how a caption looks. Hashable, so it can be part of a cache key.
+    """
+    font_family: str = "Arial"
+    bold: bool = True
+    fontsize: int = 150           # "Big Fonts" starting size
+    min_fontsize: int = 50        # Shrink-to-fit never goes below this
+    fontsize_step: int = 5
+    fill: str = "#FFD700"         # Gold/Yellow
+    stroke_fill: str = "black"
+    stroke_ratio: int = 15        # stroke_width = fontsize / stroke_ratio
+    max_width_ratio: float = 0.9  # 90% of screen width
+    center_y: int = 1350          # Vertical center of the text on a 1080x1920 frame
+
+
+class CaptionSprite(NamedTuple):
+    """
+    A tightly cropped RGBA caption bitmap plus where its top-left corner lands on the frame.
+    """
+    image: np.ndarray
+    x: int
+    y: int
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.image.shape[1], self.image.shape[0]
+
+
+class FontRegistry:
+    """
+    Resolves font files once and hands out sized ImageFont objects from a cache.
+    Lookup order: Windows-style file names (Pillow searches the system font dirs),
+    then fontconfig (`fc-match`) on Linux, then Pillow's built-in font.
+    """
+
+    # Family -> (bold file, regular file) names Pillow can find on Windows/macOS
+    KNOWN_FILES = {
+        "arial": ("arialbd.ttf", "arial.ttf"),
+    }
+
+    def __init__(self):
+        self._paths: Dict[Tuple[str, bool], Optional[str]] = {}
+        self._fonts: Dict[Tuple[str, bool, int], ImageFont.ImageFont] = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, family: str = "Arial", bold: bool = True) -> Optional[str]:
+        """
+        Returns a loadable font path for family/weight, or None if only the default font is available.
+        """
+        key = (family.lower(), bold)
+        with self._lock:
+            if key not in self._paths:
+                self._paths[key] = self._lookup(family, bold)
+            return self._paths[key]
+
+    def get_font(self, size: int, family: str = "Arial", bold: bool = True):
+        key = (family.lower(), bold, size)
+        font = self._fonts.get(key)
+        if font is None:
+            path = self.resolve(family, bold)
+            if path:
+                font = ImageFont.truetype(path, size)
+            else:
+                try:
+                    font = ImageFont.load_default(size=size)
+                except TypeError:
+                    # Pillow < 10.1 has no sized default font
+                    font = ImageFont.load_default()
+            self._fonts[key] = font
+        return font
+
+    def _lookup(self, family: str, bold: bool) -> Optional[str]:
+        candidates = []
+        bold_file, regular_file = self.KNOWN_FILES.get(family.lower(), (None, None))
+        if bold and bold_file:
+            candidates.append(bold_file)
+        if regular_file:
+            candidates.append(regular_file)
+
+        for name in candidates:
+            try:
+                ImageFont.truetype(name, 10)
+                return name
+            except OSError:
+                continue
+
+        path = self._fontconfig_match(family, bold)
+        if path:
+            return path
+
+        print(f"Warning: No TrueType font found for '{family}'. Falling back to Pillow default font.")
+        return None
+
+    def _fontconfig_match(self, family: str, bold: bool) -> Optional[str]:
+        fc_match = shutil.which("fc-match")
+        if not fc_match:
+            return None
+        pattern = f"{family}:bold" if bold else family
+        try:
+            result = subprocess.run(
+                [fc_match, "--format=%{file}", pattern],
+                capture_output=True, text=True, timeout=5
+            )
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+        path = result.stdout.strip()
+        if result.returncode != 0 or not path or not os.path.exists(path):
+            return None
+        try:
+            ImageFont.truetype(path, 10)
+        except OSError:
+            # fontconfig can return bitmap/Type1 fonts Pillow cannot scale
+            return None
+        return path
+
+
+# Shared across every renderer in the process so fonts resolve once at startup
+FONTS = FontRegistry()
+
+
+class CaptionRenderer:
+    """
+    Rasterizes caption text into tight RGBA sprites with a single stroke pass.
+    Sprites are kept in an LRU cache keyed by (text, frame width, style).
+    """
+
+    def __init__(self, width: int = 1080, style: Optional[CaptionStyle] = None,
+                 cache_size: int = 512, fonts: Optional[FontRegistry] = None):
+        self.width = width
+        self.style = style or CaptionStyle()
+        self.fonts = fonts or FONTS
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[tuple, CaptionSprite]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        # Resolve eagerly so the first caption doesn't pay for the lookup
+        self.fonts.resolve(self.style.font_family, self.style.bold)
+
+    def cache_key(self, text: str, style: Optional[CaptionStyle] = None) -> tuple:
+        """
+        Identifies the sprite render() returns for text (stable even after LRU eviction).
+        """
+        return (text, self.width, style or self.style)
+
+    def render(self, text: str, style: Optional[CaptionStyle] = None) -> CaptionSprite:
+        """
+        Returns the (cached) sprite for text. The sprite array is shared, treat it as read-only.
+        """
+        style = style or self.style
+        key = self.cache_key(text, style)
+        with self._lock:
+            sprite = self._cache.get(key)
+            if sprite is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return sprite
+            self.misses += 1
+
+        sprite = self._rasterize(text, style)
+
+        with self._lock:
+            self._cache[key] = sprite
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return sprite
+
+    def fit_fontsize(self, text: str, style: Optional[CaptionStyle] = None) -> int:
+        """
+        Largest font size (down to min_fontsize) at which text fits within max_width_ratio of the frame.
+        """
+        style = style or self.style
+        max_width = self.width * style.max_width_ratio
+        fontsize = style.fontsize
+        while fontsize > style.min_fontsize:
+            font = self.fonts.get_font(fontsize, style.font_family, style.bold)
+            if font.getlength(text) <= max_width:
+                break
+            fontsize -= style.fontsize_step
+        return fontsize
+
+    @traced("captions.rasterize")
+    def _rasterize(self, text: str, style: CaptionStyle) -> CaptionSprite:
+        fontsize = self.fit_fontsize(text, style)
+        font = self.fonts.get_font(fontsize, style.font_family, style.bold)
+        stroke_width = int(fontsize / style.stroke_ratio)  # Dynamic stroke
+
+        # Bounding box relative to the anchor point, including the stroke
+        left, top, right, bottom = font.getbbox(text, stroke_width=stroke_width, anchor="mm")
+        w, h = max(1, right - left), max(1, bottom - top)
+
+        img = Image.new("RGBA", (w, h), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(img)
+        draw.text((-left, -top), text, font=font, fill=style.fill, anchor="mm",
+                  stroke_width=stroke_width, stroke_fill=style.stroke_fill)
+
+        image = np.array(img)
+        image.flags.writeable = False
+        x = int(round(self.width / 2 + left))
+        y = int(round(style.center_y + top))
+        return CaptionSprite(image, x, y)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
@@ -0,0 +1,180 @@
+import time
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from moviepy.video.VideoClip import VideoClip
+
+from caption_renderer import CaptionRenderer, CaptionSprite
+from tracing import current_span, traced
+
+
+class _PreparedSprite:
+    """
+    Sprite with alpha premultiplied into the colour channels, ready for a single blend per frame.
+    """
+    __slots__ = ("rgb", "inv_alpha", "x", "y", "w", "h")
+
+    def __init__(self, sprite: CaptionSprite):
+        rgba = sprite.image
+        alpha = rgba[:, :, 3:4].astype(np.uint16)
+        # Premultiplied colour (rounded) and the weight left over for the background
+        self.rgb = ((rgba[:, :, :3].astype(np.uint16) * alpha + 127) // 255).astype(np.uint8)
+        self.inv_alpha = (255 - alpha).astype(np.uint16)
+        self.x, self.y = sprite.x, sprite.y
+        self.h, self.w = rgba.shape[:2]
+
+
+class CaptionTrack:
+    """
+    All caption sprites of a video plus a sorted interval index.
+    For any time t only the active sprite(s) are blended onto the frame.
+    """
+
+    def __init__(self, renderer: CaptionRenderer):
+        self.renderer = renderer
+        self._pending: List[Tuple[float, float, str]] = []
+        self._starts: List[float] = []
+        self._ends: List[float] = []
+        self._sprites: List[_PreparedSprite] = []
+        self._max_duration = 0.0
+        self._built = False
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, text: str, start: float, duration: float):
+        """
+        Schedules text to be shown from start for duration seconds.
+        """
+        if duration <= 0 or not text:
+            return
+        self._pending.append((start, start + duration, text))
+        self._built = False
+
+    def events(self) -> List[Tuple[float, float, str]]:
+        """
+        (start, end, text) for every caption, sorted by start time.
+        """
+        return sorted(self._pending, key=lambda e: e[0])
+
+    @traced("captions.build")
+    def build(self):
+        """
+        Rasterizes and premultiplies every sprite and sorts the interval index.
+        Called lazily on the first frame; identical texts share one prepared sprite.
+        """
+        prepared: Dict[tuple, _PreparedSprite] = {}
+        entries = self.events()
+        self._starts, self._ends, self._sprites = [], [], []
+        self._max_duration = 0.0
+
+        for start, end, text in entries:
+            # Keyed like the renderer's cache: an evicted sprite's id() may be reused by another text
+            key = self.renderer.cache_key(text)
+            if key not in prepared:
+                prepared[key] = _PreparedSprite(self.renderer.render(text))
+            self._starts.append(start)
+            self._ends.append(end)
+            self._sprites.append(prepared[key])
+            self._max_duration = max(self._max_duration, end - start)
+
+        self._built = True
+
+    def active(self, t: float) -> List[_PreparedSprite]:
+        """
+        Sprites visible at time t, in start order (later captions draw on top).
+        """
+        if not self._built:
+            self.build()
+        hi = bisect_right(self._starts, t)
+        lo = hi
+        # Only intervals starting within max_duration before t can still be open
+        while lo > 0 and self._starts[lo - 1] > t - self._max_duration:
+            lo -= 1
+        return [self._sprites[i] for i in range(lo, hi) if self._ends[i] > t]
+
+    def runs(self, duration: float) -> List[Tuple[float, float]]:
+        """
+        Splits [0, duration] into maximal intervals during which the same captions are visible.
+        Every frame inside one interval looks identical over a still background.
+        """
+        if not self._built:
+            self.build()
+        cuts = {0.0, duration}
+        for start, end in zip(self._starts, self._ends):
+            if 0 < start < duration:
+                cuts.add(start)
+            if 0 < end < duration:
+                cuts.add(end)
+        cuts = sorted(cuts)
+
+        runs: List[Tuple[float, float]] = []
+        prev_key = None
+        for a, b in zip(cuts, cuts[1:]):
+            key = tuple(id(sp) for sp in self.active((a + b) / 2))
+            if runs and key == prev_key:
+                runs[-1] = (runs[-1][0], b)
+            else:
+                runs.append((a, b))
+            prev_key = key
+        return runs
+
+    def blit(self, frame: np.ndarray, t: float) -> np.ndarray:
+        """
+        Returns frame with the active captions blended in. The input frame is never modified.
+        """
+        sprites = self.active(t)
+        if not sprites:
+            return frame
+
+        out = np.array(frame[:, :, :3], dtype=np.uint8, copy=True)
+        frame_h, frame_w = out.shape[:2]
+        for sp in sprites:
+            # Clip the sprite rectangle against the frame
+            x0, y0 = max(sp.x, 0), max(sp.y, 0)
+            x1, y1 = min(sp.x + sp.w, frame_w), min(sp.y + sp.h, frame_h)
+            if x0 >= x1 or y0 >= y1:
+                continue
+            sx0, sy0 = x0 - sp.x, y0 - sp.y
+            sx1, sy1 = sx0 + (x1 - x0), sy0 + (y1 - y0)
+
+            region = out[y0:y1, x0:x1]
+            bg = (region.astype(np.uint16) * sp.inv_alpha[sy0:sy1, sx0:sx1] + 127) // 255
+            region[:] = bg.astype(np.uint8) + sp.rgb[sy0:sy1, sx0:sx1]
+        return out
+
+
+class CaptionTrackClip(VideoClip):
+    """
+    Draws a CaptionTrack directly onto a base clip.
+    Replaces one CompositeVideoClip layer per caption chunk with a single lookup per frame.
+    """
+
+    def __init__(self, base_clip, track: CaptionTrack, duration: Optional[float] = None):
+        VideoClip.__init__(self)
+        self.base_clip = base_clip
+        self.track = track
+        self.make_frame = self._make_frame
+        self.size = base_clip.size
+        self.duration = duration if duration is not None else base_clip.duration
+        self.end = self.duration
+        self.fps = getattr(base_clip, "fps", None)
+        self.audio = base_clip.audio
+
+    def _make_frame(self, t: float) -> np.ndarray:
+        span = current_span()
+        if span is None:
+            return self.track.blit(self.base_clip.get_frame(t), t)
+        # Per-frame split of the encode span: source decode vs caption compositing
+        started = time.perf_counter()
+        frame = self.base_clip.get_frame(t)
+        decoded = time.perf_counter()
+        frame = self.track.blit(frame, t)
+        span.add_time("source_seconds", decoded - started)
+        span.add_time("composite_seconds", time.perf_counter() - decoded)
+        return frame
+
+    def close(self):
+        self.base_clip.close()
+        super().close()
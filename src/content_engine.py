@@ -1,14 +1,16 @@
 import os
 import json
-import requests
 import urllib.parse
 from typing import Dict, List, Optional
+from http_client import get_client
+from tracing import traced
 
 class ContentEngine:
     def __init__(self, api_key: Optional[str] = None):
         # Pollinations.ai is free, no key needed
-        pass
+        self.http = get_client()
 
+    @traced("script.generate")
     def generate_script(self, topic: str) -> Dict:
         """
         Generates a script for a YouTube Short via Pollinations.ai (Free).
@@ -54,13 +56,14 @@ class ContentEngine:
         safe_prompt = urllib.parse.quote(full_prompt)
         url = f"https://text.pollinations.ai/{safe_prompt}?model=openai" 
         
+        # Transport errors and 429/5xx are retried with backoff by the HTTP client;
+        # this loop only re-asks when the model returns unparseable JSON.
         for attempt in range(3):
             try:
-                response = requests.get(url, timeout=90) # Increased timeout
+                response = self.http.get(url, timeout=(10, 90)) # Increased timeout
                 if response.status_code != 200:
-                    print(f"Error: API returned status {response.status_code}. Retrying...")
-                    time.sleep(2)
-                    continue
+                    print(f"Error: API returned status {response.status_code}.")
+                    return {}
                     
                 text = response.text.strip()
                 data = self._clean_and_parse_json(text)
@@ -68,10 +71,10 @@ class ContentEngine:
                     return data
             except Exception as e:
                 print(f"Error generating script (Attempt {attempt+1}): {e}")
-                time.sleep(2)
                 
         return {}
 
+    @traced("script.topics")
     def generate_viral_topics(self, category: str, count: int = 5) -> List[str]:
         """
         Asks the AI to brainstorm viral topics for a given category.
@@ -89,7 +92,7 @@ class ContentEngine:
         
         for attempt in range(3):
             try:
-                response = requests.get(url, timeout=60)
+                response = self.http.get(url, timeout=(10, 60))
                 text = response.text.strip()
                 data = self._clean_and_parse_json(text)
                 if isinstance(data, list):
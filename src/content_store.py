@@ -0,0 +1,188 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+# A "prepared" claim older than this belongs to a run that died before rendering; the thread is free again
+PREPARED_TTL = 6 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    post_id     TEXT PRIMARY KEY,
+    subreddit   TEXT,
+    title       TEXT,
+    output_path TEXT,
+    status      TEXT NOT NULL,
+    updated_at  REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS topics (
+    topic       TEXT PRIMARY KEY,
+    output_path TEXT,
+    status      TEXT NOT NULL,
+    updated_at  REAL NOT NULL,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    error       TEXT
+);
+CREATE INDEX IF NOT EXISTS posts_status ON posts(status);
+CREATE INDEX IF NOT EXISTS topics_status ON topics(status);
+"""
+
+
+class ContentStore:
+    """
+    Persistent record of every Reddit thread and farm topic we have produced (or tried to),
+    with output paths and statuses. Lookups are primary-key hits, and the history survives
+    restarts, so daily batches never re-select a published thread.
+    SQLite in WAL mode: safe to share between threads of one process and between processes.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.getenv("CONTENT_DB") or os.path.join("data", "content.db")
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        self._conn.commit()
+
+    def _migrate(self):
+        # Databases created before farm job tracking lack these columns
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(topics)")}
+        if "attempts" not in columns:
+            self._conn.execute("ALTER TABLE topics ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+        if "error" not in columns:
+            self._conn.execute("ALTER TABLE topics ADD COLUMN error TEXT")
+
+    def _execute(self, sql: str, params: Iterable = ()) -> List[tuple]:
+        with self._lock:
+            cursor = self._conn.execute(sql, tuple(params))
+            rows = cursor.fetchall()
+            self._conn.commit()
+            return rows
+
+    # --- Reddit posts ---
+
+    def is_post_used(self, post_id: str) -> bool:
+        """
+        True if the thread was produced, or is claimed by a run that is still preparing/rendering it.
+        """
+        rows = self._execute("SELECT status, updated_at FROM posts WHERE post_id = ?", (post_id,))
+        if not rows:
+            return False
+        status, updated_at = rows[0]
+        return status == "done" or (status == "prepared" and time.time() - updated_at < PREPARED_TTL)
+
+    def used_post_ids(self) -> Set[str]:
+        rows = self._execute(
+            "SELECT post_id FROM posts WHERE status = 'done' OR (status = 'prepared' AND updated_at >= ?)",
+            (time.time() - PREPARED_TTL,))
+        return {row[0] for row in rows}
+
+    def mark_post(self, post_id: str, status: str, subreddit: Optional[str] = None,
+                  title: Optional[str] = None, output_path: Optional[str] = None):
+        """
+        Inserts or updates a post. Fields passed as None keep their stored value.
+        """
+        self._execute("""
+            INSERT INTO posts (post_id, subreddit, title, output_path, status, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(post_id) DO UPDATE SET
+                subreddit = COALESCE(excluded.subreddit, subreddit),
+                title = COALESCE(excluded.title, title),
+                output_path = COALESCE(excluded.output_path, output_path),
+                status = excluded.status,
+                updated_at = excluded.updated_at
+        """, (post_id, subreddit, title, output_path, status, time.time()))
+
+    # --- Farm topics (also the farm's durable job queue: queued/running/done/failed) ---
+
+    def topic_status(self, topic: str) -> Optional[str]:
+        rows = self._execute("SELECT status FROM topics WHERE topic = ?", (topic,))
+        return rows[0][0] if rows else None
+
+    def topics(self, status: Optional[str] = None) -> List[str]:
+        if status is None:
+            rows = self._execute("SELECT topic FROM topics ORDER BY updated_at")
+        else:
+            rows = self._execute("SELECT topic FROM topics WHERE status = ? ORDER BY updated_at", (status,))
+        return [row[0] for row in rows]
+
+    def mark_topic(self, topic: str, status: str, output_path: Optional[str] = None):
+        self._execute("""
+            INSERT INTO topics (topic, output_path, status, updated_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(topic) DO UPDATE SET
+                output_path = COALESCE(excluded.output_path, output_path),
+                status = excluded.status,
+                updated_at = excluded.updated_at
+        """, (topic, output_path, status, time.time()))
+
+    def enqueue_topic(self, topic: str) -> str:
+        """
+        Adds topic as a queued job unless it is already known. Returns its current status.
+        """
+        self._execute("""
+            INSERT OR IGNORE INTO topics (topic, status, updated_at) VALUES (?, 'queued', ?)
+        """, (topic, time.time()))
+        return self.topic_status(topic)
+
+    def start_topic(self, topic: str) -> int:
+        """
+        Marks topic as running and counts the attempt. Returns the attempt number (1-based).
+        """
+        self._execute("""
+            UPDATE topics SET status = 'running', attempts = attempts + 1, error = NULL, updated_at = ?
+            WHERE topic = ?
+        """, (time.time(), topic))
+        return self.topic_attempts(topic)
+
+    def fail_topic(self, topic: str, error: str):
+        self._execute("UPDATE topics SET status = 'failed', error = ?, updated_at = ? WHERE topic = ?",
+                      (error[:500], time.time(), topic))
+
+    def topic_attempts(self, topic: str) -> int:
+        rows = self._execute("SELECT attempts FROM topics WHERE topic = ?", (topic,))
+        return rows[0][0] if rows else 0
+
+    def requeue_running(self) -> List[str]:
+        """
+        Jobs left "running" by a farm that crashed go back to the queue (partial work is kept on disk).
+        """
+        rows = self._execute("SELECT topic FROM topics WHERE status = 'running'")
+        self._execute("UPDATE topics SET status = 'queued', updated_at = ? WHERE status = 'running'",
+                      (time.time(),))
+        return [row[0] for row in rows]
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        """
+        {"posts": {status: n}, "topics": {status: n}}
+        """
+        out = {}
+        for table in ("posts", "topics"):
+            rows = self._execute(f"SELECT status, COUNT(*) FROM {table} GROUP BY status")
+            out[table] = {status: n for status, n in rows}
+        return out
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_DEFAULT_STORE: Optional[ContentStore] = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def default_store() -> ContentStore:
+    """
+    Process-wide store shared by RedditClient, RedditShortsMaker and the farm.
+    """
+    global _DEFAULT_STORE
+    with _DEFAULT_LOCK:
+        if _DEFAULT_STORE is None:
+            _DEFAULT_STORE = ContentStore()
+        return _DEFAULT_STORE
@@ -0,0 +1,64 @@
+import os
+import threading
+from typing import Dict, List
+
+
+class DiskCache:
+    """
+    Base for the size-capped on-disk caches: atomic writes and LRU eviction by file mtime.
+    An entry is every file in cache_dir sharing the same "<key>." prefix.
+    """
+
+    # Files in cache_dir that are bookkeeping, not entries
+    RESERVED = ("stats.json",)
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.enabled = max_bytes > 0
+        self._lock = threading.Lock()
+        if self.enabled:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _atomic_write(self, path: str, data: bytes):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _touch(self, *paths: str):
+        for path in paths:
+            try:
+                os.utime(path, None)
+            except OSError:
+                pass
+
+    def evict(self):
+        """
+        Deletes least recently used entries until the cache fits in max_bytes.
+        """
+        entries: Dict[str, List] = {}
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".tmp") or name in self.RESERVED:
+                continue
+            key = name.split(".", 1)[0]
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entry = entries.setdefault(key, [0.0, 0, []])
+            entry[0] = max(entry[0], stat.st_mtime)
+            entry[1] += stat.st_size
+            entry[2].append(name)
+
+        total = sum(e[1] for e in entries.values())
+        for _, size, names in sorted(entries.values()):
+            if total <= self.max_bytes:
+                break
+            # Metadata first so a concurrent reader sees a clean miss
+            for name in sorted(names, key=lambda n: not n.endswith(".json")):
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+            total -= size
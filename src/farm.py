@@ -1,8 +1,11 @@
-import subprocess
-import sys
+import multiprocessing
 import time
 import os
 import re
+import sys
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from concurrent.futures.process import BrokenProcessPool
 
 # Curated Viral Topics (Initial Seed)
 TOPICS = [
@@ -41,141 +44,280 @@ CATEGORIES = [
     "Quantum Physics for Dummies"
 ]
 
-import json
 import webbrowser
-from datetime import datetime
-
-PROGRESS_FILE = "progress.json"
-
-def update_progress(completed, total, current_topic, status, logs=[]):
-    data = {
-        "completed": completed,
-        "total": total,
-        "current_topic": current_topic,
-        "status": status,
-        "logs": logs
-    }
-    with open(PROGRESS_FILE, "w") as f:
-        json.dump(data, f)
-
-LOGS = []
+from progress_events import ProgressLog, ProgressServer
+import tracing
+
+# Progress is published as append-only events (progress_events.jsonl) and streamed to the dashboard
+PROGRESS = ProgressLog()
+
+def update_progress(completed, total, current_topic, status):
+    PROGRESS.emit("progress", completed=completed, total=total, current_topic=current_topic, status=status)
+
 def add_log(msg, type="info"):
-    timestamp = datetime.now().strftime("%H:%M:%S")
-    LOGS.append({"time": timestamp, "message": msg, "type": type})
-    # Keep log history manageable
-    if len(LOGS) > 50:
-        LOGS.pop(0)
+    PROGRESS.emit("log", message=msg, type=type)
+
+FARM_WORKERS = max(1, int(os.getenv("FARM_WORKERS", "2")))
+FARM_MAX_ATTEMPTS = max(1, int(os.getenv("FARM_MAX_ATTEMPTS", "2")))
+# Categories brainstormed at once (calls are still paced by the Pollinations limiter)
+BRAINSTORM_WORKERS = max(1, int(os.getenv("BRAINSTORM_WORKERS", str(len(CATEGORIES)))))
+# Passes over CATEGORIES before giving up on reaching the target
+BRAINSTORM_ROUNDS = max(1, int(os.getenv("BRAINSTORM_ROUNDS", "3")))
+
+# --- Worker process side: engines are created once per process and reused for every topic ---
+_PIPELINE = None
+
+def _init_farm_worker():
+    global _PIPELINE
+    from dotenv import load_dotenv
+    from main import ShortsPipeline
+    load_dotenv()
+    tracing.enable()
+    _PIPELINE = ShortsPipeline()
+
+def _farm_job(topic, resume):
+    return _PIPELINE.run(topic, resume=resume)
+
+def expected_output_path(topic):
+    safe_topic = re.sub(r'[\\/*?:"<>|]', "", topic).replace(" ", "_").lower()
+    return f"output/{safe_topic}/final_{safe_topic}.mp4"
+
+def _new_pool():
+    # spawn: workers never inherit the parent's SQLite handle or HTTP sessions.
+    # Each worker has its own provider limiters, so they split the configured rates
+    os.environ.setdefault("RATE_SHARE", str(FARM_WORKERS))
+    return ProcessPoolExecutor(max_workers=FARM_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_init_farm_worker)
+
+def cultivate(topics, target_count):
+    """
+    Runs topics on FARM_WORKERS long-lived worker processes. Job state lives in the
+    content store (queued/running/done/failed + attempts), so after a crash the next
+    run re-queues interrupted jobs and resumes them from their partial output.
+    """
+    from content_store import default_store
+    store = default_store()
+    stats = {"success": 0, "fail": 0}
+    
+    for topic in store.requeue_running():
+        add_log(f"Resuming interrupted job: {topic}", "info")
+    
+    queue = deque()
+    for topic in topics:
+        status = store.enqueue_topic(topic)
+        # --- RESUME LOGIC ---
+        expected_output = expected_output_path(topic)
+        if status == "queued" and store.topic_attempts(topic) == 0 and os.path.exists(expected_output):
+            # Finished before job tracking existed
+            store.mark_topic(topic, "done", expected_output)
+            status = "done"
+        
+        if status == "done":
+            msg = f"⏭️ Skipping '{topic}': Video already exists at {expected_output}"
+            print(msg)
+            add_log(msg, "info")
+            stats["success"] += 1 # Count as success for progress bar
+        elif status == "failed" and store.topic_attempts(topic) >= FARM_MAX_ATTEMPTS:
+            add_log(f"Giving up on '{topic}' after {store.topic_attempts(topic)} attempts", "error")
+            stats["fail"] += 1
+        else:
+            queue.append(topic)
+        # --------------------
+    
+    print(f"👷 {len(queue)} jobs for {FARM_WORKERS} workers ({stats['success']} already harvested)")
+    pool = _new_pool()
+    running = {}  # future -> (topic, start time, pool it was submitted to)
+    
+    try:
+        while queue or running:
+            while queue and len(running) < FARM_WORKERS:
+                topic = queue.popleft()
+                attempt = store.start_topic(topic)
+                print(f"\n🌱 Planted Topic (attempt {attempt}): {topic}")
+                add_log(f"Starting: {topic}")
+                # Later attempts continue from the partial run dir instead of starting over
+                future = pool.submit(_farm_job, topic, attempt > 1)
+                running[future] = (topic, time.time(), pool)
+            
+            current = ", ".join(t for t, _, _ in running.values())
+            update_progress(stats["success"] + stats["fail"], target_count, current, "Generating Video...")
+            
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                topic, start_time, job_pool = running.pop(future)
+                output, error = None, None
+                try:
+                    output = future.result()
+                except BrokenProcessPool as e:
+                    error = f"Worker crashed: {e}"
+                    if job_pool is pool:
+                        # Replace the dead pool once; its other jobs fail here and get retried
+                        pool.shutdown(wait=False)
+                        pool = _new_pool()
+                except Exception as e:
+                    error = str(e)
+                
+                if output:
+                    duration = int(time.time() - start_time)
+                    store.mark_topic(topic, "done", output)
+                    msg = f"✅ Harvested '{topic}' in {duration}s"
+                    print(msg)
+                    add_log(msg, "success")
+                    stats["success"] += 1
+                    continue
+                
+                store.fail_topic(topic, error or "No video produced")
+                if store.topic_attempts(topic) < FARM_MAX_ATTEMPTS:
+                    msg = f"🔁 Retrying '{topic}' later: {error or 'no video produced'}"
+                    queue.append(topic)
+                else:
+                    msg = f"🥀 Failed '{topic}': {error or 'no video produced'}"
+                    stats["fail"] += 1
+                print(msg)
+                add_log(msg, "error")
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    
+    return stats
+
+def seed_topics(index):
+    """
+    The curated TOPICS minus near-duplicates of other topics we already have.
+    A seed that matches itself (or has its video on disk) stays: cultivate skips or resumes it.
+    """
+    topics = []
+    for topic in TOPICS:
+        duplicate = index.find_duplicate(topic)
+        if duplicate not in (None, topic) and not os.path.exists(expected_output_path(topic)):
+            print(f"   ♻️ Skipping seed '{topic}' (near-duplicate of '{duplicate}')")
+            continue
+        index.add(topic)
+        topics.append(topic)
+    return topics
+
+def brainstorm_topics(engine, index, topics, target_count):
+    """
+    Asks for new topics in every category at once and keeps only candidates that are not
+    near-duplicates of the list or of anything produced before (topic_index.py).
+    Appends to topics until target_count is reached or BRAINSTORM_ROUNDS passes come up short.
+    """
+    rejected = 0
+    for round_no in range(BRAINSTORM_ROUNDS):
+        if len(topics) >= target_count:
+            break
+        executor = ThreadPoolExecutor(max_workers=BRAINSTORM_WORKERS, thread_name_prefix="brainstorm")
+        futures = {tracing.submit(executor, engine.generate_viral_topics, cat, 5): cat for cat in CATEGORIES}
+        try:
+            for future in as_completed(futures):
+                try:
+                    new_topics = future.result()
+                except Exception as e:
+                    print(f"⚠️ Brainstorming '{futures[future]}' failed: {e}")
+                    continue
+                for t in new_topics:
+                    if not isinstance(t, str) or not t.strip() or len(topics) >= target_count:
+                        continue
+                    t = t.strip()
+                    duplicate = index.add_if_new(t)
+                    if duplicate:
+                        rejected += 1
+                        print(f"   ♻️ Skipping '{t}' (near-duplicate of '{duplicate}')")
+                        continue
+                    topics.append(t)
+                
+                update_progress(0, target_count, "Brainstorming", f"Topics Found: {len(topics)}/{target_count}")
+                print(f"   ... Total Topics: {len(topics)}")
+                if len(topics) >= target_count:
+                    break
+        finally:
+            # Enough topics: categories not asked yet are dropped
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    if rejected:
+        add_log(f"Rejected {rejected} near-duplicate topics")
+    if len(topics) < target_count:
+        add_log(f"Only found {len(topics)}/{target_count} unique topics after {BRAINSTORM_ROUNDS} rounds", "error")
+    return topics
+
+def close_dashboard(server, linger):
+    """
+    The dashboard server lives in this process: let connected pages receive the final events
+    before it exits. With linger, the finished run stays viewable until Ctrl+C.
+    """
+    if server is None:
+        return
+    if linger:
+        print(f"📊 Dashboard still available at {server.url} (Ctrl+C to exit)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+    server.drain()
+    server.stop()
 
 def run_farm():
-    print(f"🚜 STARTING FARM MODE: Target 50 Videos...")
+    from dotenv import load_dotenv
+    load_dotenv()
+    tracing.enable()
+    print(f"🚜 STARTING FARM MODE: Target 50 Videos ({FARM_WORKERS} workers)...")
     
     # Init Progress
-    update_progress(0, 50, "Initializing", "Warming up engines...", [])
+    PROGRESS.reset()
+    update_progress(0, 50, "Initializing", "Warming up engines...")
     
-    # Open Dashboard
-    dashboard_path = os.path.abspath("frontend/dashboard.html")
-    print(f"Opening Dashboard: {dashboard_path}")
-    webbrowser.open(f"file://{dashboard_path}")
+    # Open Dashboard (served locally; it streams only new events)
+    server = None
+    try:
+        server = ProgressServer(PROGRESS).start()
+        print(f"Opening Dashboard: {server.url}")
+        webbrowser.open(server.url)
+    except OSError as e:
+        print(f"⚠️ Dashboard server unavailable ({e}); progress is still written to {PROGRESS.path}")
     
     # Dynamic expansion
     from content_engine import ContentEngine
+    from content_store import default_store
+    from topic_index import load_topic_index
     engine = ContentEngine()
     
     target_count = 50
-    current_count = len(TOPICS)
+    # Everything produced or queued before, so reworded repeats are never rendered again
+    index = load_topic_index(default_store())
+    topics = seed_topics(index)
+    current_count = len(topics)
     
     if current_count < target_count:
         msg = f"📉 Only have {current_count} topics. Generating {target_count - current_count} more..."
         print(msg)
         add_log(msg)
-        update_progress(0, target_count, "Brainstorming", "Generating new viral topics...", LOGS)
-        
-        cat_idx = 0
-        while len(TOPICS) < target_count:
-            cat = CATEGORIES[cat_idx % len(CATEGORIES)]
-            new_topics = engine.generate_viral_topics(cat, count=5)
-            for t in new_topics:
-                if t not in TOPICS:
-                    TOPICS.append(t)
-            cat_idx += 1
-            time.sleep(2) # rate limit politeness
-            
-            update_progress(0, target_count, "Brainstorming", f"Topics Found: {len(TOPICS)}/{target_count}", LOGS)
-            print(f"   ... Total Topics: {len(TOPICS)}")
+        update_progress(0, target_count, "Brainstorming", "Generating new viral topics...")
+        brainstorm_topics(engine, index, topics, target_count)
             
     # Slice to exact 50 if verified overflow
-    final_topics = TOPICS[:target_count]
+    final_topics = topics[:target_count]
     
     print("="*60)
     print(f"🚜 CULTIVATING {len(final_topics)} VIDEOS")
     print("="*60)
     
-    stats = {"success": 0, "fail": 0}
-    
-    for i, topic in enumerate(final_topics):
-        print(f"\n🌱 [{i+1}/{len(final_topics)}] Planted Topic: {topic}")
-        
-        # --- RESUME LOGIC ---
-        safe_topic = re.sub(r'[\\/*?:"<>|]', "", topic).replace(" ", "_").lower()
-        expected_output = f"output/{safe_topic}/final_{safe_topic}.mp4"
-        
-        if os.path.exists(expected_output):
-             msg = f"⏭️ Skipping '{topic}': Video already exists at {expected_output}"
-             print(msg)
-             add_log(msg, "info")
-             update_progress(i + 1, target_count, topic, "Skipped (Exists)", LOGS)
-             stats["success"] += 1 # Count as success for progress bar
-             continue
-        # --------------------
-
-        add_log(f"Starting: {topic}")
-        update_progress(i, target_count, topic, "Generating Video...", LOGS)
-        
-        print("-" * 30)
-        
-        start_time = time.time()
-        try:
-            # Using sys.executable ensures we use the active venv
-            cmd = [sys.executable, "src/main.py", "--topic", topic]
-            
-            # Run usage: subprocess.run(cmd, check=True)
-            result = subprocess.run(cmd)
-            
-            if result.returncode == 0:
-                duration = int(time.time() - start_time)
-                msg = f"✅ Harvested '{topic}' in {duration}s"
-                print(msg)
-                add_log(msg, "success")
-                stats["success"] += 1
-            else:
-                msg = f"🥀 Failed '{topic}'"
-                print(msg)
-                add_log(msg, "error")
-                stats["fail"] += 1
-                
-        except KeyboardInterrupt:
-            print("\n🛑 Farm Stopped by User.")
-            add_log("Farm stopped by user", "error")
-            break
-        except Exception as e:
-            msg = f"❌ Error: {e}"
-            print(msg)
-            add_log(msg, "error")
-            stats["fail"] += 1
-            
-        # Update progress after each video
-        update_progress(i + 1, target_count, topic, "Cooling down...", LOGS)
-            
-        # Cool-down to be nice to free APIs
-        print("💤 Resting soil (10s)...")
-        time.sleep(10)
+    try:
+        stats = cultivate(final_topics, target_count)
+    except KeyboardInterrupt:
+        # Jobs still marked "running" are re-queued and resumed by the next farm run
+        print("\n🛑 Farm Stopped by User.")
+        add_log("Farm stopped by user", "error")
+        close_dashboard(server, linger=False)
+        return
         
     final_msg = f"🚜 FARM COMPLETE: {stats['success']} Harvested, {stats['fail']} Withered."
     print("\n" + "="*60)
     print(final_msg)
     print("="*60)
     add_log(final_msg, "success")
-    update_progress(target_count, target_count, "Done", "Farm Cycle Complete", LOGS)
+    update_progress(target_count, target_count, "Done", "Farm Cycle Complete")
+    # Interactive runs keep the finished dashboard up; unattended ones exit once it caught up
+    close_dashboard(server, linger=os.getenv("PROGRESS_LINGER", "1") != "0" and sys.stdin.isatty())
 
 if __name__ == "__main__":
     run_farm()
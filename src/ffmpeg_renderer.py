@@ -0,0 +1,276 @@
+import os
+import random
+import shutil
+import subprocess
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image
+
+from caption_track import CaptionTrack
+from tracing import span
+
+
+def ffmpeg_binary() -> str:
+    """
+    The same ffmpeg moviepy uses (imageio-ffmpeg's bundled binary unless FFMPEG_BINARY is set).
+    """
+    try:
+        from moviepy.config import get_setting
+        return get_setting("FFMPEG_BINARY")
+    except Exception:
+        return shutil.which("ffmpeg") or "ffmpeg"
+
+
+def media_duration(path: str) -> float:
+    """
+    Duration in seconds read from the container header (no decoding).
+    """
+    from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+    return ffmpeg_parse_infos(path)["duration"]
+
+
+def run_ffmpeg(args: List[str], description: str = "ffmpeg"):
+    """
+    Runs ffmpeg with args, raising RuntimeError with the tail of stderr on failure.
+    """
+    cmd = [ffmpeg_binary(), "-hide_banner", "-loglevel", "error", "-y"] + args
+    with span("ffmpeg", description=description):
+        result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{description} failed ({result.returncode}): {result.stderr[-2000:]}")
+
+
+class FFmpegRenderer:
+    """
+    Render backend that describes the whole short as one ffmpeg filtergraph.
+    Seek/trim, crop/scale to the vertical frame, audio concat and caption burn-in all
+    happen inside ffmpeg; Python never touches individual frames.
+    Captions are the same sprites the moviepy path uses, overlaid with a time-gated enable expression.
+    """
+
+    def __init__(self, width: int = 1080, height: int = 1920, fps: int = 24,
+                 preset: str = "ultrafast", crf: int = 23, threads: int = 0):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.preset = preset
+        self.crf = crf
+        self.threads = threads
+
+    def encode_args(self) -> List[str]:
+        """
+        Output codec settings shared by every ffmpeg render path.
+        """
+        return [
+            "-c:v", "libx264", "-preset", self.preset, "-crf", str(self.crf),
+            "-pix_fmt", "yuv420p", "-r", str(self.fps),
+            "-c:a", "aac", "-b:a", "192k", "-ar", "44100",
+            "-threads", str(self.threads),
+            "-movflags", "+faststart",
+        ]
+
+    def fill_frame_filter(self) -> str:
+        """
+        Scale to cover the vertical frame, then center-crop (same framing as the moviepy path).
+        """
+        return (f"scale={self.width}:{self.height}:force_original_aspect_ratio=increase,"
+                f"crop={self.width}:{self.height},setsar=1,fps={self.fps},format=yuv420p")
+
+    def render_gameplay(self, video_path: str, audio_paths: List[str], track: CaptionTrack,
+                        output_path: str, start: Optional[float] = None,
+                        durations: Optional[List[float]] = None) -> str:
+        """
+        Reddit-style short: a window of gameplay under the concatenated voiceover with captions.
+        """
+        if durations is None:
+            durations = [media_duration(p) for p in audio_paths]
+        total_duration = sum(durations)
+        video_duration = media_duration(video_path)
+
+        inputs: List[str] = []
+        if video_duration < total_duration:
+            # Loop video if too short
+            inputs += ["-stream_loop", "-1", "-i", video_path]
+        else:
+            if start is None:
+                start = random.uniform(0, video_duration - total_duration)
+            # Input-side seek: ffmpeg jumps to the nearest keyframe instead of decoding from 0
+            inputs += ["-ss", f"{start:.3f}", "-t", f"{total_duration:.3f}", "-i", video_path]
+        for p in audio_paths:
+            inputs += ["-i", p]
+
+        filters = [f"[0:v]{self.fill_frame_filter()}[bg]"]
+        filters.append(self._audio_concat_filter(1, len(audio_paths)))
+        return self._render(inputs, filters, "bg", 1 + len(audio_paths), track, total_duration, output_path)
+
+    def render_slideshow(self, image_paths: List[str], audio_paths: List[str], track: CaptionTrack,
+                         output_path: str, durations: Optional[List[float]] = None) -> str:
+        """
+        Topic short: one still image per voiceover segment, captions timed on the global timeline.
+        """
+        if durations is None:
+            durations = [media_duration(p) for p in audio_paths]
+        n = len(image_paths)
+
+        inputs: List[str] = []
+        for img, duration in zip(image_paths, durations):
+            inputs += ["-loop", "1", "-framerate", str(self.fps), "-t", f"{duration:.3f}", "-i", img]
+        for p in audio_paths:
+            inputs += ["-i", p]
+
+        filters = [f"[{i}:v]{self.fill_frame_filter()}[s{i}]" for i in range(n)]
+        filters.append("".join(f"[s{i}]" for i in range(n)) + f"concat=n={n}:v=1:a=0[bg]")
+        filters.append(self._audio_concat_filter(n, len(audio_paths)))
+        return self._render(inputs, filters, "bg", n + len(audio_paths), track, sum(durations), output_path)
+
+    def render_frame_runs(self, runs: List[Tuple[str, float]], audio_paths: List[str],
+                          output_path: str) -> str:
+        """
+        Encodes a list of (frame image, seconds on screen) runs through the concat demuxer.
+        Each unique frame is decoded once; ffmpeg repeats it to fill the constant frame rate,
+        and x264 codes the repeats as near-free skip frames.
+        """
+        work_dir = tempfile.mkdtemp(prefix="ffruns_")
+        try:
+            list_path = os.path.join(work_dir, "frames.ffconcat")
+            lines = ["ffconcat version 1.0"]
+            # Quantize cumulative run ends to the frame grid so rounding never drifts from the audio
+            elapsed_frames = 0
+            elapsed = 0.0
+            for path, duration in runs:
+                elapsed += duration
+                end_frame = max(elapsed_frames + 1, int(round(elapsed * self.fps)))
+                lines.append(f"file '{self._concat_escape(path)}'")
+                lines.append(f"duration {(end_frame - elapsed_frames) / self.fps:.6f}")
+                elapsed_frames = end_frame
+            if runs:
+                # The demuxer ignores the last duration unless the final file is listed again
+                lines.append(f"file '{self._concat_escape(runs[-1][0])}'")
+            with open(list_path, "w", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+
+            inputs = ["-f", "concat", "-safe", "0", "-i", list_path]
+            for p in audio_paths:
+                inputs += ["-i", p]
+            filters = [
+                f"[0:v]fps={self.fps},format=yuv420p[bg]",
+                self._audio_concat_filter(1, len(audio_paths)),
+            ]
+            return self._render(inputs, filters, "bg", 1 + len(audio_paths), None,
+                                elapsed_frames / self.fps, output_path)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def concat_segments(self, video_paths: List[str], audio_paths: List[str], durations: List[float],
+                        output_path: str) -> str:
+        """
+        Joins independently encoded, identically configured segment videos without re-encoding.
+        Each voiceover is padded/trimmed to its segment's exact video length before the audio is
+        concatenated, so A/V stay in sync at every boundary.
+        """
+        work_dir = tempfile.mkdtemp(prefix="ffconcat_")
+        try:
+            list_path = os.path.join(work_dir, "segments.ffconcat")
+            with open(list_path, "w", encoding="utf-8") as f:
+                f.write("ffconcat version 1.0\n")
+                for path in video_paths:
+                    f.write(f"file '{self._concat_escape(path)}'\n")
+
+            inputs = ["-f", "concat", "-safe", "0", "-i", list_path]
+            filters = []
+            for i, (p, duration) in enumerate(zip(audio_paths, durations)):
+                inputs += ["-i", p]
+                filters.append(f"[{i + 1}:a]aresample=44100,apad=whole_dur={duration:.6f},"
+                               f"atrim=end={duration:.6f}[a{i}]")
+            filters.append("".join(f"[a{i}]" for i in range(len(audio_paths)))
+                           + f"concat=n={len(audio_paths)}:v=0:a=1[aout]")
+            graph_path = os.path.join(work_dir, "graph.txt")
+            with open(graph_path, "w", encoding="utf-8") as f:
+                f.write(";\n".join(filters))
+
+            run_ffmpeg(inputs + [
+                "-filter_complex_script", graph_path,
+                "-map", "0:v", "-map", "[aout]",
+                "-c:v", "copy",
+                "-c:a", "aac", "-b:a", "192k", "-ar", "44100",
+                "-movflags", "+faststart",
+                output_path,
+            ], "ffmpeg segment concat")
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        return output_path
+
+    @staticmethod
+    def _concat_escape(path: str) -> str:
+        return os.path.abspath(path).replace("'", "'\\''")
+
+    def _audio_concat_filter(self, first_input: int, count: int) -> str:
+        labels = "".join(f"[{first_input + i}:a]" for i in range(count))
+        return f"{labels}concat=n={count}:v=0:a=1[aout]"
+
+    def _render(self, inputs: List[str], filters: List[str], video_label: str, next_input: int,
+                track: Optional[CaptionTrack], total_duration: float, output_path: str) -> str:
+        work_dir = tempfile.mkdtemp(prefix="ffrender_")
+        try:
+            sprite_inputs, out_label = [], video_label
+            if track is not None:
+                sprite_inputs, caption_filters, out_label = self._caption_overlays(
+                    track, work_dir, video_label, next_input)
+                filters += caption_filters
+
+            graph_path = os.path.join(work_dir, "graph.txt")
+            with open(graph_path, "w", encoding="utf-8") as f:
+                f.write(";\n".join(filters))
+
+            args = inputs + sprite_inputs + [
+                "-filter_complex_script", graph_path,
+                "-map", f"[{out_label}]", "-map", "[aout]",
+                "-t", f"{total_duration:.3f}",
+            ] + self.encode_args() + [output_path]
+
+            overlays = f" ({len(track)} caption overlays)" if track is not None else ""
+            print(f"   - Rendering with ffmpeg{overlays}...")
+            run_ffmpeg(args, "ffmpeg render")
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        return output_path
+
+    def _caption_overlays(self, track: CaptionTrack, work_dir: str, base_label: str,
+                          first_input: int) -> Tuple[List[str], List[str], str]:
+        """
+        Writes each unique caption sprite once as a PNG and chains one time-gated overlay per caption.
+        Returns (extra input args, filters, label of the final video stream).
+        """
+        inputs: List[str] = []
+        input_index: Dict[tuple, int] = {}  # renderer cache key -> ffmpeg input index
+        uses: Dict[tuple, int] = {}
+        placed = []
+        for start, end, text in track.events():
+            sprite = track.renderer.render(text)
+            key = track.renderer.cache_key(text)
+            if key not in input_index:
+                path = os.path.join(work_dir, f"cap_{len(input_index)}.png")
+                Image.fromarray(sprite.image, "RGBA").save(path)
+                input_index[key] = first_input + len(input_index)
+                inputs += ["-i", path]
+            uses[key] = uses.get(key, 0) + 1
+            placed.append((start, end, key, sprite))
+
+        filters: List[str] = []
+        # A sprite used several times is split so every overlay gets its own stream
+        copies: Dict[tuple, List[str]] = {}
+        for key, idx in input_index.items():
+            labels = [f"sp{idx}_{j}" for j in range(uses[key])]
+            filters.append(f"[{idx}:v]format=rgba,split={len(labels)}" + "".join(f"[{l}]" for l in labels))
+            copies[key] = labels
+
+        prev = base_label
+        for n, (start, end, key, sprite) in enumerate(placed):
+            # Half-open interval so back-to-back captions never share a frame
+            filters.append(
+                f"[{prev}][{copies[key].pop()}]overlay=x={sprite.x}:y={sprite.y}:"
+                f"enable='gte(t,{start:.3f})*lt(t,{end:.3f})'[cap{n}]"
+            )
+            prev = f"cap{n}"
+        return inputs, filters, prev
@@ -0,0 +1,256 @@
+import json
+import os
+import random
+import re
+import subprocess
+import threading
+import time
+from bisect import bisect_right
+from contextlib import contextmanager
+from typing import Dict, List, NamedTuple, Optional
+
+from ffmpeg_renderer import ffmpeg_binary
+
+VIDEO_EXTENSIONS = ('.mp4', '.mkv')
+
+
+class GameplayWindow(NamedTuple):
+    """
+    A slice of a gameplay file to put under a short. `loop` means the file is shorter than needed.
+    """
+    path: str
+    start: float
+    duration: float
+    loop: bool = False
+
+
+class GameplayLibrary:
+    """
+    Persistent index of the gameplay folder: duration, resolution, fps and keyframe times per file.
+    The index is refreshed incrementally (only new or modified files are probed), start points are
+    snapped to keyframes so seeks never decode from an earlier GOP, and recently used windows are
+    remembered so consecutive shorts don't reuse the same footage.
+    """
+
+    INDEX_NAME = ".gameplay_index.json"
+    INDEX_VERSION = 1
+
+    def __init__(self, assets_dir: str, recent_limit: int = 200):
+        self.assets_dir = assets_dir
+        self.index_path = os.path.join(assets_dir, self.INDEX_NAME)
+        self.recent_limit = recent_limit
+        self._lock = threading.Lock()
+        self._files: Dict[str, Dict] = {}
+        self._recent: List[Dict] = []
+        self._refreshed = False
+        self._load()
+
+    # --- Index maintenance ---
+
+    def _load(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == self.INDEX_VERSION:
+                self._files = data.get("files", {})
+                self._recent = data.get("recent", [])
+        except (OSError, ValueError):
+            pass
+
+    def _merge_recent(self):
+        """
+        Adds windows other processes (farm workers) recorded since we last read the index.
+        """
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") != self.INDEX_VERSION:
+            return
+        merged = {(r["file"], r["start"], r["used_at"]): r for r in data.get("recent", []) + self._recent}
+        self._recent = sorted(merged.values(), key=lambda r: r["used_at"])[-self.recent_limit:]
+
+    @contextmanager
+    def _index_lock(self, stale_after: float = 10.0):
+        """
+        Cross-process lock for read-modify-write of the index: an O_EXCL lock file next to it
+        (portable, unlike fcntl). A lock left behind by a crashed process expires after stale_after.
+        """
+        lock_path = f"{self.index_path}.lock"
+        while True:
+            try:
+                os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(lock_path) > stale_after:
+                        os.remove(lock_path)
+                        continue
+                except OSError:
+                    continue  # Released meanwhile
+                time.sleep(0.02)
+            except OSError:
+                # Read-only folder: nothing gets written, so there is nothing to guard
+                yield
+                return
+        try:
+            yield
+        finally:
+            try:
+                os.remove(lock_path)
+            except OSError:
+                pass
+
+    def _save(self):
+        # Callers hold _index_lock and merged the recent windows from disk first
+        data = {"version": self.INDEX_VERSION, "files": self._files, "recent": self._recent}
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.index_path)
+
+    def refresh(self, force: bool = False) -> List[str]:
+        """
+        Re-scans the folder, probing only files whose size/mtime changed. Returns indexed file names.
+        """
+        with self._lock:
+            if self._refreshed and not force:
+                return list(self._files)
+
+            names = [f for f in os.listdir(self.assets_dir)
+                     if f.endswith(VIDEO_EXTENSIONS) and not f.startswith(".")]
+            changed = False
+
+            for name in list(self._files):
+                if name not in names:
+                    del self._files[name]
+                    changed = True
+
+            for name in names:
+                stat = os.stat(os.path.join(self.assets_dir, name))
+                entry = self._files.get(name)
+                if entry and entry.get("mtime") == stat.st_mtime and entry.get("size") == stat.st_size:
+                    continue
+                print(f"   - Indexing gameplay: {name}...")
+                try:
+                    entry = self._probe(os.path.join(self.assets_dir, name))
+                except Exception as e:
+                    print(f"⚠️ Could not index {name}: {e}")
+                    self._files.pop(name, None)
+                    continue
+                entry.update({"mtime": stat.st_mtime, "size": stat.st_size})
+                self._files[name] = entry
+                changed = True
+
+            if changed:
+                with self._index_lock():
+                    self._merge_recent()
+                    self._save()
+            self._refreshed = True
+            return list(self._files)
+
+    def _probe(self, path: str) -> Dict:
+        from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+        infos = ffmpeg_parse_infos(path)
+        width, height = infos.get("video_size") or (0, 0)
+        return {
+            "duration": infos["duration"],
+            "width": width,
+            "height": height,
+            "fps": infos.get("video_fps"),
+            "keyframes": self._keyframes(path),
+        }
+
+    def _keyframes(self, path: str) -> List[float]:
+        """
+        Keyframe timestamps; with -skip_frame nokey ffmpeg only decodes the keyframes themselves.
+        """
+        cmd = [ffmpeg_binary(), "-hide_banner", "-nostats", "-skip_frame", "nokey", "-i", path,
+               "-an", "-sn", "-vf", "showinfo", "-f", "null", "-"]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        times = {round(float(t), 3) for t in re.findall(r"pts_time:([0-9.]+)", result.stderr)}
+        return sorted(times) or [0.0]
+
+    # --- Window selection ---
+
+    def files(self) -> List[str]:
+        return self.refresh()
+
+    def info(self, path: str) -> Optional[Dict]:
+        self.refresh()
+        return self._files.get(os.path.basename(path))
+
+    def pick_window(self, duration: float, path: Optional[str] = None) -> Optional[GameplayWindow]:
+        """
+        Picks a keyframe-aligned window of `duration` seconds that doesn't overlap recent use.
+        Restricts the choice to `path` if given. Returns None if the folder is empty.
+        """
+        names = self.refresh()
+        if path is not None:
+            in_library = os.path.dirname(os.path.abspath(path)) == os.path.abspath(self.assets_dir)
+            if not in_library or os.path.basename(path) not in self._files:
+                # Unindexed file (e.g. outside the assets folder): plain random start
+                return self._unindexed_window(path, duration)
+            names = [os.path.basename(path)]
+        if not names:
+            return None
+
+        # Other processes' recent windows count too, and two of them can't pick the same one
+        with self._lock, self._index_lock():
+            self._merge_recent()
+            long_enough = [n for n in names if self._files[n]["duration"] >= duration]
+            if not long_enough:
+                # Loop video if too short
+                window = GameplayWindow(os.path.join(self.assets_dir, random.choice(names)), 0.0, duration, loop=True)
+            else:
+                window = self._choose_start(long_enough, duration)
+            self._remember(window)
+            return window
+
+    def _choose_start(self, names: List[str], duration: float) -> GameplayWindow:
+        # Visit files in random order, weighted by length so long files get proportionally more use
+        order = []
+        pool = list(names)
+        while pool:
+            name = random.choices(pool, weights=[self._files[n]["duration"] for n in pool])[0]
+            pool.remove(name)
+            order.append(name)
+
+        oldest = None  # (used_at, name, start) fallback when every start overlaps recent use
+        for name in order:
+            entry = self._files[name]
+            keyframes = entry.get("keyframes") or [0.0]
+            starts = keyframes[:bisect_right(keyframes, entry["duration"] - duration)] or [0.0]
+            recent = [r for r in self._recent if r["file"] == name]
+            fresh = []
+            for start in starts:
+                clashes = [r for r in recent if start < r["end"] and start + duration > r["start"]]
+                if not clashes:
+                    fresh.append(start)
+                    continue
+                used_at = max(r["used_at"] for r in clashes)
+                if oldest is None or used_at < oldest[0]:
+                    oldest = (used_at, name, start)
+            if fresh:
+                return GameplayWindow(os.path.join(self.assets_dir, name), random.choice(fresh), duration)
+
+        _, name, start = oldest
+        return GameplayWindow(os.path.join(self.assets_dir, name), start, duration)
+
+    def _remember(self, window: GameplayWindow):
+        self._recent.append({
+            "file": os.path.basename(window.path),
+            "start": window.start,
+            "end": window.start + window.duration,
+            "used_at": time.time(),
+        })
+        self._recent = self._recent[-self.recent_limit:]
+        self._save()
+
+    def _unindexed_window(self, path: str, duration: float) -> GameplayWindow:
+        from ffmpeg_renderer import media_duration
+        total = media_duration(path)
+        if total < duration:
+            return GameplayWindow(path, 0.0, duration, loop=True)
+        return GameplayWindow(path, random.uniform(0, total - duration), duration)
@@ -0,0 +1,183 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from http_replay import default_cassettes, prepare_request, recording_enabled, replay_target, replay_url
+from rate_limiter import limiter_for_url
+from tracing import current_span
+
+# Statuses worth retrying: throttling and transient server errors
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+Timeout = Union[float, Tuple[float, float]]
+
+
+class HTTPClient:
+    """
+    One pooled, keep-alive HTTP client for every provider (Pollinations, Hugging Face, Reddit).
+    - A single requests.Session with per-host connection pools, so repeated calls to the
+      same host reuse the TCP+TLS connection.
+    - Unified (connect, read) timeouts.
+    - Per-provider adaptive rate limiting (rate_limiter.py) for known hosts; other hosts
+      get exponential backoff with full jitter. Both honour Retry-After.
+    - Per-host latency/bytes/retry accounting (see stats()).
+    - HTTP_RECORD=1 saves successful responses as cassettes; HTTP_REPLAY_URL sends every
+      request to the local stand-in server instead (http_replay.py).
+    """
+
+    def __init__(self, retries: int = 3, backoff_base: float = 1.0, backoff_max: float = 30.0,
+                 timeout: Timeout = (10, 60), pool_size: int = 16):
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict] = {}
+
+        self.replay_url = replay_url()
+        self.cassettes = default_cassettes() if recording_enabled() and not self.replay_url else None
+
+    def request(self, method: str, url: str, retries: Optional[int] = None,
+                timeout: Optional[Timeout] = None, **kwargs) -> requests.Response:
+        """
+        Sends a request, retrying connection errors and RETRY_STATUSES.
+        Returns the last response (callers still check status_code); raises the last
+        exception if every attempt failed at the transport level.
+        """
+        attempts = 1 + (self.retries if retries is None else retries)
+        timeout = timeout if timeout is not None else self.timeout
+        host = urlsplit(url).netloc
+        # Known providers are paced by their adaptive limiter, which also absorbs the backoff
+        limiter = limiter_for_url(url)
+
+        target = full_url = url
+        body = b""
+        replaying = bool(self.replay_url) and not url.startswith(self.replay_url)
+        if self.cassettes or replaying:
+            full_url, body = prepare_request(method, url, **kwargs)
+        if replaying:
+            # Same pacing and accounting as the real provider, answered by the stand-in
+            target = replay_target(full_url, self.replay_url)
+            kwargs.pop("params", None)
+            kwargs["headers"] = dict(kwargs.get("headers") or {}, **{"X-Replay-Scheme": urlsplit(url).scheme})
+
+        for attempt in range(attempts):
+            if limiter:
+                limiter.acquire()
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, target, timeout=timeout, **kwargs)
+            except requests.RequestException as e:
+                self._record(host, time.perf_counter() - started, 0, error=True, retry=attempt > 0)
+                if limiter:
+                    limiter.record(None, time.perf_counter() - started)
+                if attempt == attempts - 1:
+                    raise
+                if limiter:
+                    print(f"HTTP Error (Attempt {attempt+1}) {host}: {e}. Retrying at {limiter.rate:.2f} req/s...")
+                    continue
+                delay = self._backoff(attempt)
+                print(f"HTTP Error (Attempt {attempt+1}) {host}: {e}. Retrying in {delay:.1f}s...")
+                time.sleep(delay)
+                continue
+
+            elapsed = time.perf_counter() - started
+            self._record(host, elapsed, len(response.content),
+                         error=response.status_code >= 400, retry=attempt > 0)
+            if limiter:
+                limiter.record(response.status_code, elapsed)
+            if self.cassettes and response.status_code < 300:
+                self.cassettes.record(method, full_url, body, response, elapsed)
+            if response.status_code not in RETRY_STATUSES or attempt == attempts - 1:
+                return response
+
+            delay = self._retry_after(response)
+            if limiter:
+                # The limiter already slowed down; Retry-After holds every caller, not just this one
+                if delay:
+                    limiter.pause(delay)
+                print(f"HTTP {response.status_code} from {host}. Retrying at {limiter.rate:.2f} req/s...")
+                continue
+            if delay is None:
+                delay = self._backoff(attempt)
+            print(f"HTTP {response.status_code} from {host}. Retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: uniform in [0, base * 2^attempt], capped
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _retry_after(self, response: requests.Response) -> Optional[float]:
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            seconds = float(value)
+        except ValueError:
+            try:
+                seconds = parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                return None
+        return min(self.backoff_max, max(0.0, seconds))
+
+    def _record(self, host: str, seconds: float, nbytes: int, error: bool, retry: bool):
+        # Traffic also counts towards the caller's open trace span
+        span = current_span()
+        if span:
+            span.add_bytes(nbytes)
+            if retry:
+                span.add_retry()
+        with self._lock:
+            s = self._stats.setdefault(host, {
+                "requests": 0, "errors": 0, "retries": 0, "bytes": 0,
+                "total_seconds": 0.0, "max_seconds": 0.0,
+            })
+            s["requests"] += 1
+            s["errors"] += int(error)
+            s["retries"] += int(retry)
+            s["bytes"] += nbytes
+            s["total_seconds"] += seconds
+            s["max_seconds"] = max(s["max_seconds"], seconds)
+
+    def stats(self) -> Dict[str, Dict]:
+        """
+        Per-host request counts, errors, retries, bytes and latency (avg/max seconds).
+        """
+        with self._lock:
+            out = {}
+            for host, s in self._stats.items():
+                out[host] = dict(s, avg_seconds=round(s["total_seconds"] / s["requests"], 3))
+            return out
+
+
+_CLIENT: Optional[HTTPClient] = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def get_client() -> HTTPClient:
+    """
+    Process-wide shared client, so every engine draws from the same connection pools.
+    """
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            _CLIENT = HTTPClient()
+        return _CLIENT
@@ -0,0 +1,459 @@
+import argparse
+import base64
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+
+from rate_limiter import PROVIDER_HOSTS
+
+# Path on the stand-in server that replays edge-tts syntheses (edge-tts itself speaks websockets)
+TTS_PATH = "/edge-tts"
+
+
+def replay_url() -> Optional[str]:
+    """
+    Base URL of the stand-in server when replaying (HTTP_REPLAY_URL), else None.
+    """
+    url = os.getenv("HTTP_REPLAY_URL")
+    return url.rstrip("/") if url else None
+
+
+def recording_enabled() -> bool:
+    return os.getenv("HTTP_RECORD", "").lower() in ("1", "true", "yes")
+
+
+def provider_for_host(host: str) -> str:
+    for suffix, provider in PROVIDER_HOSTS.items():
+        if host == suffix or host.endswith("." + suffix):
+            return provider
+    return host
+
+
+def prepare_request(method: str, url: str, **kwargs) -> Tuple[str, bytes]:
+    """
+    The exact URL (params merged, quoted) and body requests would send. Recording and
+    replay both key on these, so a replayed request matches the one that was recorded.
+    """
+    prepared = requests.Request(method.upper(), url, params=kwargs.get("params"),
+                                data=kwargs.get("data"), json=kwargs.get("json")).prepare()
+    body = prepared.body or b""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    return prepared.url, body
+
+
+def request_key(method: str, url: str, body: bytes = b"") -> str:
+    digest = hashlib.sha256(f"{method.upper()} {url}\n".encode("utf-8"))
+    digest.update(body)
+    return digest.hexdigest()[:32]
+
+
+def tts_key(text: str, voice: str, rate: str) -> str:
+    return hashlib.sha256(f"{voice}|{rate}|{text}".encode("utf-8")).hexdigest()[:32]
+
+
+def replay_target(url: str, base: str) -> str:
+    """
+    https://host/path?q -> <base>/host/path?q (the stand-in restores the original URL from the path).
+    """
+    parts = urlsplit(url)
+    target = f"{base}/{parts.netloc}{parts.path or '/'}"
+    return f"{target}?{parts.query}" if parts.query else target
+
+
+# Response headers worth replaying (validators for the Reddit cache, types for the image cache)
+KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Cache-Control")
+
+
+class Cassette(NamedTuple):
+    key: str
+    provider: str
+    method: str
+    url: str
+    status: int
+    headers: Dict[str, str]
+    seconds: float           # Latency observed when it was recorded
+    body_path: str
+    words: Optional[List] = None  # edge-tts word timings
+    text: Optional[str] = None    # edge-tts input text
+
+
+class CassetteStore:
+    """
+    Recorded provider responses: one <key>.json (status, headers, recorded latency) plus
+    <key>.body per request, grouped in a folder per provider. Unlike the caches this is
+    never evicted; it is the fixture set the stand-in server replays.
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or os.getenv("CASSETTE_DIR") or "cassettes"
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    def _write(self, provider: str, key: str, meta: Dict, body: bytes):
+        directory = os.path.join(self.root, provider)
+        os.makedirs(directory, exist_ok=True)
+        suffix = f"{os.getpid()}.{threading.get_ident()}.tmp"
+        body_path = os.path.join(directory, f"{key}.body")
+        meta_path = os.path.join(directory, f"{key}.json")
+        with open(f"{body_path}.{suffix}", "wb") as f:
+            f.write(body)
+        os.replace(f"{body_path}.{suffix}", body_path)
+        # Metadata last: a cassette is only visible once its body is complete
+        with open(f"{meta_path}.{suffix}", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(f"{meta_path}.{suffix}", meta_path)
+        with self._lock:
+            self.recorded += 1
+
+    def record(self, method: str, url: str, body: bytes, response: requests.Response, seconds: float):
+        host = urlsplit(url).hostname or ""
+        meta = {
+            "method": method.upper(),
+            "url": url,
+            "status": response.status_code,
+            "headers": {h: response.headers[h] for h in KEPT_HEADERS if h in response.headers},
+            "seconds": round(seconds, 4),
+            "recorded_at": time.time(),
+        }
+        self._write(provider_for_host(host), request_key(method, url, body), meta, response.content)
+
+    def record_tts(self, text: str, voice: str, rate: str, audio: bytes, words: List, seconds: float):
+        meta = {
+            "method": "POST",
+            "url": f"edge-tts:{voice}:{rate}",
+            "status": 200,
+            "headers": {"Content-Type": "audio/mpeg"},
+            "seconds": round(seconds, 4),
+            "recorded_at": time.time(),
+            "text": text,
+            "words": [list(w) for w in words],
+        }
+        self._write("edge_tts", tts_key(text, voice, rate), meta, audio)
+
+    def load(self) -> List[Cassette]:
+        cassettes = []
+        if not os.path.isdir(self.root):
+            return cassettes
+        for provider in sorted(os.listdir(self.root)):
+            directory = os.path.join(self.root, provider)
+            if not os.path.isdir(directory):
+                continue
+            for name in sorted(os.listdir(directory)):
+                if not name.endswith(".json"):
+                    continue
+                try:
+                    with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+                        meta = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                key = name[:-len(".json")]
+                cassettes.append(Cassette(
+                    key, provider, meta["method"], meta["url"], meta["status"], meta.get("headers", {}),
+                    meta.get("seconds", 0.0), os.path.join(directory, f"{key}.body"),
+                    meta.get("words"), meta.get("text"),
+                ))
+        return cassettes
+
+
+_CASSETTES: Optional[CassetteStore] = None
+_CASSETTES_LOCK = threading.Lock()
+
+
+def default_cassettes() -> CassetteStore:
+    """
+    Process-wide cassette store written to by the HTTP client and the TTS engine when HTTP_RECORD is set.
+    """
+    global _CASSETTES
+    with _CASSETTES_LOCK:
+        if _CASSETTES is None:
+            _CASSETTES = CassetteStore()
+        return _CASSETTES
+
+
+# --- Stand-in server ---
+
+class ReplayProfile(NamedTuple):
+    latency_scale: float = 1.0    # x recorded latency (0 answers immediately)
+    latency_jitter: float = 0.2   # +/- fraction of the latency, uniform
+    error_rate: float = 0.0       # Share of requests answered with 503
+    throttle_rate: float = 0.0    # Share of requests answered with 429 at random
+    provider_rate: float = 0.0    # Requests/s admitted per provider (0 = unlimited); excess gets 429
+    provider_burst: int = 5
+    retry_after: float = 1.0      # Retry-After seconds sent with 429s
+
+
+PROFILES: Dict[str, ReplayProfile] = {
+    "instant": ReplayProfile(latency_scale=0.0, latency_jitter=0.0),
+    "recorded": ReplayProfile(),
+    "degraded": ReplayProfile(latency_scale=2.0, latency_jitter=0.5, error_rate=0.05),
+    "throttled": ReplayProfile(throttle_rate=0.02, provider_rate=1.0, provider_burst=3, retry_after=2.0),
+}
+
+
+class _Admission:
+    """
+    Server-side token bucket: a request either gets a token now or is rejected (never queued),
+    like a provider's own rate limit.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def admit(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class ReplayIndex:
+    """
+    Lookup over a cassette store. Exact matches first; a request that was never recorded
+    (new topic, new thread id) gets the recording of the same provider and method whose
+    path looks most alike, so farm-scale runs replay realistic payloads and timings.
+    """
+
+    def __init__(self, cassettes: List[Cassette]):
+        self.exact: Dict[str, Cassette] = {c.key: c for c in cassettes}
+        self._by_host: Dict[Tuple[str, str], List[Cassette]] = {}
+        self.tts: List[Cassette] = []
+        for c in cassettes:
+            if c.provider == "edge_tts":
+                self.tts.append(c)
+            else:
+                self._by_host.setdefault((c.method, urlsplit(c.url).hostname or ""), []).append(c)
+        self._turn = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.exact)
+
+    def _rotate(self, candidates: List[Cassette]) -> Cassette:
+        # Spread fallbacks over equally good recordings instead of always the first
+        with self._lock:
+            self._turn += 1
+            return candidates[self._turn % len(candidates)]
+
+    def find(self, method: str, url: str, body: bytes) -> Tuple[Optional[Cassette], bool]:
+        """
+        Returns (cassette, exact).
+        """
+        cassette = self.exact.get(request_key(method, url, body))
+        if cassette:
+            return cassette, True
+        parts = urlsplit(url)
+        candidates = self._by_host.get((method.upper(), parts.hostname or ""))
+        if not candidates:
+            return None, False
+        segments = parts.path.strip("/").split("/")
+
+        def likeness(c: Cassette) -> Tuple[int, int]:
+            other = urlsplit(c.url).path.strip("/").split("/")
+            same = sum(1 for a, b in zip(segments, other) if a == b)
+            return same, int(len(other) == len(segments))
+
+        best = max(likeness(c) for c in candidates)
+        return self._rotate([c for c in candidates if likeness(c) == best]), False
+
+    def find_tts(self, text: str, voice: str, rate: str) -> Tuple[Optional[Cassette], bool]:
+        cassette = self.exact.get(tts_key(text, voice, rate))
+        if cassette:
+            return cassette, True
+        if not self.tts:
+            return None, False
+        # Closest length gives a realistic audio duration and synthesis time
+        closest = min(abs(len(c.text or "") - len(text)) for c in self.tts)
+        return self._rotate([c for c in self.tts if abs(len(c.text or "") - len(text)) == closest]), False
+
+
+class _ReplayHandler(BaseHTTPRequestHandler):
+    index: ReplayIndex = None
+    server_state: "ReplayServer" = None
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real providers
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def _handle(self, method: str):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        state = self.server_state
+
+        if self.path == "/__stats":
+            self._send(200, {"Content-Type": "application/json"}, json.dumps(state.stats()).encode("utf-8"))
+            return
+
+        if self.path == TTS_PATH:
+            request = json.loads(body or b"{}")
+            cassette, exact = self.index.find_tts(request.get("text", ""), request.get("voice", ""),
+                                                  request.get("rate", ""))
+            provider = "edge_tts"
+        else:
+            # /<host>/<path>?<query> -> the original provider URL
+            host_and_path = self.path.lstrip("/")
+            scheme = self.headers.get("X-Replay-Scheme", "https")
+            url = f"{scheme}://{host_and_path}"
+            cassette, exact = self.index.find(method, url, body)
+            provider = provider_for_host(urlsplit(url).hostname or "")
+
+        status = state.gate(provider, cassette, exact)
+        if status == 404:
+            self._send(404, {"Content-Type": "application/json"}, b'{"error": "no cassette"}')
+            return
+        if status in (429, 503):
+            headers = {"Content-Type": "application/json"}
+            if status == 429:
+                headers["Retry-After"] = f"{state.profile.retry_after:g}"
+            self._send(status, headers, b'{"error": "stand-in %s"}' % str(status).encode())
+            return
+
+        state.wait(cassette)
+        with open(cassette.body_path, "rb") as f:
+            payload = f.read()
+        if self.path == TTS_PATH:
+            data = {"audio": base64.b64encode(payload).decode("ascii"), "words": cassette.words or []}
+            self._send(200, {"Content-Type": "application/json"}, json.dumps(data).encode("utf-8"))
+            return
+
+        etag = cassette.headers.get("ETag")
+        if etag and self.headers.get("If-None-Match") == etag:
+            self._send(304, {"ETag": etag}, b"")
+            return
+        self._send(cassette.status, cassette.headers, payload)
+
+    def _send(self, status: int, headers: Dict[str, str], payload: bytes):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass  # Load tests would flood the console
+
+
+class ReplayServer:
+    """
+    Local stand-in for every provider. Serves recorded responses at /<host>/<path>
+    (the HTTP client rewrites URLs there when HTTP_REPLAY_URL is set) and edge-tts
+    syntheses at /edge-tts, shaped by a ReplayProfile: recorded latency (scaled, jittered),
+    random 503s and 429s, and a per-provider admission rate. Counters at /__stats.
+    """
+
+    def __init__(self, store: Optional[CassetteStore] = None, profile: Optional[ReplayProfile] = None,
+                 port: Optional[int] = None, host: str = "127.0.0.1", seed: Optional[int] = None):
+        self.store = store or CassetteStore()
+        self.index = ReplayIndex(self.store.load())
+        self.profile = profile or PROFILES[os.getenv("REPLAY_PROFILE", "recorded")]
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._admission: Dict[str, _Admission] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+        port = port if port is not None else int(os.getenv("REPLAY_PORT", "8766"))
+        handler = type("ReplayHandler", (_ReplayHandler,), {"index": self.index, "server_state": self})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://{host}:{self.httpd.server_address[1]}"
+
+    def _count(self, provider: str, outcome: str):
+        s = self._stats.setdefault(provider, {
+            "requests": 0, "exact": 0, "fallback": 0, "missing": 0, "throttled": 0, "errors": 0,
+        })
+        s["requests"] += 1
+        s[outcome] += 1
+
+    def gate(self, provider: str, cassette: Optional[Cassette], exact: bool) -> int:
+        """
+        Decides the fate of one request: 404 (nothing recorded), 429, 503 or 200 (serve it).
+        """
+        with self._lock:
+            if cassette is None:
+                self._count(provider, "missing")
+                return 404
+            profile = self.profile
+            if profile.provider_rate > 0:
+                admission = self._admission.get(provider)
+                if admission is None:
+                    admission = self._admission[provider] = _Admission(profile.provider_rate, profile.provider_burst)
+                if not admission.admit():
+                    self._count(provider, "throttled")
+                    return 429
+            roll = self._random.random()
+            if roll < profile.throttle_rate:
+                self._count(provider, "throttled")
+                return 429
+            if roll < profile.throttle_rate + profile.error_rate:
+                self._count(provider, "errors")
+                return 503
+            self._count(provider, "exact" if exact else "fallback")
+            return 200
+
+    def wait(self, cassette: Cassette):
+        profile = self.profile
+        if profile.latency_scale <= 0:
+            return
+        with self._lock:
+            jitter = self._random.uniform(-profile.latency_jitter, profile.latency_jitter)
+        time.sleep(max(0.0, cassette.seconds * profile.latency_scale * (1 + jitter)))
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {provider: dict(s) for provider, s in self._stats.items()}
+
+    def start(self) -> "ReplayServer":
+        threading.Thread(target=self.httpd.serve_forever, name="replay-server", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve recorded provider responses (see HTTP_RECORD)")
+    parser.add_argument("--cassettes", default=None, help="Cassette folder (default: CASSETTE_DIR or cassettes/)")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default=os.getenv("REPLAY_PROFILE", "recorded"))
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--latency-scale", type=float, default=None)
+    parser.add_argument("--error-rate", type=float, default=None)
+    parser.add_argument("--throttle-rate", type=float, default=None)
+    parser.add_argument("--provider-rate", type=float, default=None)
+    args = parser.parse_args()
+
+    profile = PROFILES[args.profile]
+    overrides = {name: getattr(args, name) for name in ("latency_scale", "error_rate", "throttle_rate", "provider_rate")
+                 if getattr(args, name) is not None}
+    profile = profile._replace(**overrides)
+
+    server = ReplayServer(CassetteStore(args.cassettes), profile, port=args.port)
+    print(f"📼 Replaying {len(server.index)} cassettes from {server.store.root} ({args.profile}: {profile})")
+    print(f"   Point the pipeline at it with HTTP_REPLAY_URL={server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"\n📊 {json.dumps(server.stats(), indent=2)}")
+        server.httpd.server_close()
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional, Tuple
+
+from disk_cache import DiskCache
+
+# Producer result: (image bytes, provider metadata) or None if every provider failed
+ImageProducer = Callable[[], Optional[Tuple[bytes, Dict]]]
+
+
+class ImageCache(DiskCache):
+    """
+    Persistent cache of generated images keyed by sha256(enhanced prompt, model, size).
+    Each entry is <key>.img (raw provider bytes) plus <key>.json (provider metadata).
+    Concurrent requests for the same key share one in-flight download.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        cache_dir = cache_dir or os.getenv("IMAGE_CACHE_DIR") or os.path.join("cache", "images")
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv("IMAGE_CACHE_MB", "2000")) * 1024 ** 2)
+        super().__init__(cache_dir, max_bytes)
+        self._inflight: Dict[str, Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0  # Requests that piggybacked on another thread's download
+
+    def key(self, prompt: str, model: str, width: int, height: int) -> str:
+        payload = json.dumps([prompt, model, width, height], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        return (os.path.join(self.cache_dir, f"{key}.img"),
+                os.path.join(self.cache_dir, f"{key}.json"))
+
+    def get(self, key: str) -> Optional[Tuple[bytes, Dict]]:
+        if not self.enabled:
+            return None
+        data_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(data_path, "rb") as f:
+                data = f.read()
+        except (OSError, ValueError):
+            return None
+        self._touch(data_path, meta_path)
+        return data, meta
+
+    def put(self, key: str, data: bytes, meta: Dict):
+        if not self.enabled:
+            return
+        data_path, meta_path = self._paths(key)
+        meta = dict(meta, bytes=len(data), cached_at=time.time())
+        # Data first, metadata last: an entry only counts once its .json exists
+        self._atomic_write(data_path, data)
+        self._atomic_write(meta_path, json.dumps(meta).encode("utf-8"))
+        self.evict()
+
+    def fetch(self, key: str, producer: ImageProducer) -> Optional[Tuple[bytes, Dict]]:
+        """
+        Returns the cached image for key, or runs producer once (even if several threads
+        ask for the same key at the same time) and caches a successful result.
+        """
+        cached = self.get(key)
+        if cached:
+            with self._lock:
+                self.hits += 1
+            return cached
+
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self.shared += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            # A previous owner may have finished between our get() and claiming the key
+            result = self.get(key)
+            with self._lock:
+                if result:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+            if not result:
+                result = producer()
+                if result:
+                    self.put(key, *result)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
@@ -5,6 +5,9 @@ from dotenv import load_dotenv
 from content_engine import ContentEngine
 from media_gen import MediaGen
 from video_editor import VideoEditor
+from tts_engine import WordTiming
+from PIL import Image
+import tracing
 
 import re
 import shutil
@@ -20,142 +23,196 @@ def setup_directories(base_dir):
     os.makedirs(f"{base_dir}/images", exist_ok=True)
     os.makedirs(f"{base_dir}/audio", exist_ok=True)
 
-def main():
-    load_dotenv()
-    
-    parser = argparse.ArgumentParser(description="Shorts Automation")
-    parser.add_argument("--topic", type=str, help="Topic for the short", required=False)
-    parser.add_argument("--upload", action="store_true", help="Upload to YouTube after generation")
-    parser.add_argument("--test", action="store_true", help="Generate only 1 segment for testing")
-    args = parser.parse_args()
-    
-    topic = args.topic or input("Enter a topic for the Short: ")
-    safe_topic = sanitize_filename(topic)
-    run_dir = f"output/{safe_topic}"
-    
-    print(f"--- Initializing Engines (Run Dir: {run_dir}) ---")
-    content_engine = ContentEngine()
-    media_gen = MediaGen()
-    editor = VideoEditor()
-    
-    setup_directories(run_dir)
-    
-    # 1. Generate Script
-    print("\n--- Step 1: Generating Script ---")
-    script_data = content_engine.generate_script(topic)
-    if not script_data:
-        print("Failed to generate script. Exiting.")
-        return
+class ShortsPipeline:
+    """
+    Script -> media -> video for one topic. Engines are created once, so a long-lived
+    process (e.g. a farm worker) can run many topics without re-initializing them.
+    """
+
+    def __init__(self, render_backend=None, render_workers=None):
+        self.content_engine = ContentEngine()
+        self.media_gen = MediaGen()
+        self.editor = VideoEditor(render_backend=render_backend, render_workers=render_workers)
 
-    print(f"Title: {script_data.get('title')}")
-    with open(f"{run_dir}/script.json", "w") as f:
-        json.dump(script_data, f, indent=2)
+    def run(self, topic, test=False, upload=False, resume=False):
+        """
+        Generates the short for topic and returns the output path (None if nothing was made).
+        With resume=True a previous partial run is continued: the saved script and any
+        finished images/audio in the run dir are reused instead of being wiped.
+        """
+        content_engine = self.content_engine
+        media_gen = self.media_gen
+        editor = self.editor
+
+        safe_topic = sanitize_filename(topic)
+        run_dir = f"output/{safe_topic}"
+        script_path = f"{run_dir}/script.json"
         
-    # 2. Generate Media
-    print("\n--- Step 2: Generating Media (Parallel) ---")
+        if resume and os.path.exists(script_path):
+            print(f"\n--- Resuming partial run in {run_dir} ---")
+            with open(script_path, "r") as f:
+                script_data = json.load(f)
+            for segment in script_data.get("script_segments", []):
+                if segment.get('words'):
+                    segment['words'] = [WordTiming(*w) for w in segment['words']]
+            os.makedirs(f"{run_dir}/images", exist_ok=True)
+            os.makedirs(f"{run_dir}/audio", exist_ok=True)
+        else:
+            setup_directories(run_dir)
+            
+            # 1. Generate Script
+            print("\n--- Step 1: Generating Script ---")
+            script_data = content_engine.generate_script(topic)
+            if not script_data:
+                print("Failed to generate script. Exiting.")
+                return None
+
+            print(f"Title: {script_data.get('title')}")
+            with open(script_path, "w") as f:
+                json.dump(script_data, f, indent=2)
+        
+        # 2. Generate Media
+        print("\n--- Step 2: Generating Media (Parallel) ---")
     
-    segments = script_data.get("script_segments", [])
-    if args.test and segments:
-        print("TEST MODE: Processing only the first segment.")
-        segments = segments[:1]
+        segments = script_data.get("script_segments", [])
+        if test and segments:
+            print("TEST MODE: Processing only the first segment.")
+            segments = segments[:1]
         
-    image_paths = [f"{run_dir}/images/segment_{i}.png" for i in range(len(segments))]
-    audio_paths = [f"{run_dir}/audio/segment_{i}.mp3" for i in range(len(segments))]
+        image_paths = [f"{run_dir}/images/segment_{i}.png" for i in range(len(segments))]
+        audio_paths = [f"{run_dir}/audio/segment_{i}.mp3" for i in range(len(segments))]
     
-    import concurrent.futures
+        import concurrent.futures
     
-    def process_segment_media(idx, segment):
-        # Image
-        img_path = image_paths[idx]
-        if not os.path.exists(img_path):
-            try:
-                media_gen.generate_image(segment['visual_prompt'], img_path)
-            except Exception as e:
-                print(f"Error generating image {idx}: {e}")
+        def process_segment_media(idx, segment):
+            # Image
+            img_path = image_paths[idx]
+            if not os.path.exists(img_path):
+                try:
+                    media_gen.generate_image(segment['visual_prompt'], img_path)
+                except Exception as e:
+                    print(f"Error generating image {idx}: {e}")
 
-        # Audio
-        audio_path = audio_paths[idx]
-        if not os.path.exists(audio_path):
-            try:
-                media_gen.generate_audio(segment['text'], audio_path)
-            except Exception as e:
-                print(f"Error generating audio {idx}: {e}")
+            # Audio
+            audio_path = audio_paths[idx]
+            if not os.path.exists(audio_path):
+                try:
+                    tts = media_gen.generate_audio(segment['text'], audio_path)
+                    if tts:
+                        # Real word timings for caption chunking; the length saves an ffprobe per render
+                        segment['words'] = tts.words
+                        segment['duration'] = tts.duration
+                except Exception as e:
+                    print(f"Error generating audio {idx}: {e}")
                 
-        print(f"Completed Media for Segment {idx+1}")
+            print(f"Completed Media for Segment {idx+1}")
 
-    # Use ThreadPool to run I/O bound tasks in parallel
-    # We limit to 2 workers to avoid hitting free API rate limits too hard (timeouts)
-    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
-        futures = [executor.submit(process_segment_media, i, seg) for i, seg in enumerate(segments)]
-        for future in concurrent.futures.as_completed(futures):
-            # Just retrieve result to bubble up exceptions if needed
-            try:
-                future.result()
-            except Exception as e:
-                print(f"Thread Error: {e}")
+        # Use ThreadPool to run I/O bound tasks in parallel
+        # We limit to 2 workers to avoid hitting free API rate limits too hard (timeouts)
+        with tracing.span("pipeline.media", segments=len(segments)), \
+                concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [tracing.submit(executor, process_segment_media, i, seg) for i, seg in enumerate(segments)]
+            for future in concurrent.futures.as_completed(futures):
+                # Just retrieve result to bubble up exceptions if needed
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"Thread Error: {e}")
         
-    # Check for failures and validate media integrity
-    missing_files = []
-    for i in range(len(segments)):
-        # Check Image Existence
-        if not os.path.exists(image_paths[i]): 
-            missing_files.append(f"Image {i} (Missing)")
-        else:
-            # Check Image Integrity
-            try:
-                with Image.open(image_paths[i]) as img:
-                    img.verify()
-            except Exception as e:
-                print(f"⚠️ Detected corrupt image at segment {i}: {e}")
-                missing_files.append(f"Image {i} (Corrupt)")
-                try: os.remove(image_paths[i]) # Clean up bad file
-                except: pass
+        # Save word timings and lengths with the script so a resumed run keeps them
+        with open(script_path, "w") as f:
+            json.dump(script_data, f, indent=2)
+        
+        # Check for failures and validate media integrity
+        missing_files = []
+        for i in range(len(segments)):
+            # Check Image Existence
+            if not os.path.exists(image_paths[i]): 
+                missing_files.append(f"Image {i} (Missing)")
+            else:
+                # Check Image Integrity
+                try:
+                    with Image.open(image_paths[i]) as img:
+                        img.verify()
+                except Exception as e:
+                    print(f"⚠️ Detected corrupt image at segment {i}: {e}")
+                    missing_files.append(f"Image {i} (Corrupt)")
+                    try: os.remove(image_paths[i]) # Clean up bad file
+                    except: pass
 
-        # Check Audio Existence (EdgeTTS usually reliable but good to check size)
-        if not os.path.exists(audio_paths[i]): 
-            missing_files.append(f"Audio {i} (Missing)")
-        elif os.path.getsize(audio_paths[i]) == 0:
-             missing_files.append(f"Audio {i} (Empty)")
+            # Check Audio Existence (EdgeTTS usually reliable but good to check size)
+            if not os.path.exists(audio_paths[i]): 
+                missing_files.append(f"Audio {i} (Missing)")
+            elif os.path.getsize(audio_paths[i]) == 0:
+                 missing_files.append(f"Audio {i} (Empty)")
         
-    if missing_files:
-        raise Exception(f"Critical Media Generation Failure. Missing/Corrupt: {missing_files}")
+        if missing_files:
+            raise Exception(f"Critical Media Generation Failure. Missing/Corrupt: {missing_files}")
 
-    # 3. Create Video
-    print("\n--- Step 3: Editing Video ---")
-    output_video = f"{run_dir}/final_{safe_topic}.mp4"
+        # 3. Create Video
+        print("\n--- Step 3: Editing Video ---")
+        output_video = f"{run_dir}/final_{safe_topic}.mp4"
     
-    # Filter out missing media
-    valid_segments = []
-    valid_imgs = []
-    valid_audios = []
+        # Filter out missing media
+        valid_segments = []
+        valid_imgs = []
+        valid_audios = []
     
-    for i in range(len(segments)):
-        if os.path.exists(image_paths[i]) and os.path.exists(audio_paths[i]):
-            valid_segments.append(segments[i])
-            valid_imgs.append(image_paths[i])
-            valid_audios.append(audio_paths[i])
-        else:
-            print(f"Skipping segment {i} due to missing media.")
+        for i in range(len(segments)):
+            if os.path.exists(image_paths[i]) and os.path.exists(audio_paths[i]):
+                valid_segments.append(segments[i])
+                valid_imgs.append(image_paths[i])
+                valid_audios.append(audio_paths[i])
+            else:
+                print(f"Skipping segment {i} due to missing media.")
             
-    if valid_segments:
-        editor.create_video(valid_segments, valid_imgs, valid_audios, output_video)
-        print(f"\nSUCCESS! Video generated at: {os.path.abspath(output_video)}")
+        if valid_segments:
+            editor.create_video(valid_segments, valid_imgs, valid_audios, output_video)
+            print(f"\nSUCCESS! Video generated at: {os.path.abspath(output_video)}")
         
-        # 4. Upload (Optional)
-        if args.upload:
-            print("\n--- Step 4: Uploading to YouTube ---")
-            from uploader import YouTubeUploader
-            uploader = YouTubeUploader()
+            # 4. Upload (Optional)
+            if upload:
+                print("\n--- Step 4: Uploading to YouTube ---")
+                from uploader import YouTubeUploader
+                uploader = YouTubeUploader()
             
-            # Construct metadata
-            title = script_data.get("title", f"AI Generated Short - {topic}")
-            description = f"Short about {topic}\n\nTags: {', '.join(script_data.get('keywords', []))}\n#shorts"
-            tags = script_data.get("keywords", [])
+                # Construct metadata
+                title = script_data.get("title", f"AI Generated Short - {topic}")
+                description = f"Short about {topic}\n\nTags: {', '.join(script_data.get('keywords', []))}\n#shorts"
+                tags = script_data.get("keywords", [])
             
-            uploader.upload_video(output_video, title=title, description=description, tags=tags)
+                uploader.upload_video(output_video, title=title, description=description, tags=tags)
             
-    else:
-        print("No valid segments to create video.")
+            return output_video
+        else:
+            print("No valid segments to create video.")
+            return None
+
+def main():
+    load_dotenv()
+    
+    parser = argparse.ArgumentParser(description="Shorts Automation")
+    parser.add_argument("--topic", type=str, help="Topic for the short", required=False)
+    parser.add_argument("--upload", action="store_true", help="Upload to YouTube after generation")
+    parser.add_argument("--test", action="store_true", help="Generate only 1 segment for testing")
+    parser.add_argument("--renderer", choices=["moviepy", "ffmpeg", "stills"], default=None,
+                        help="Render backend (default: RENDER_BACKEND env var or moviepy)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Parallel segment render processes (default: RENDER_WORKERS env var or 1)")
+    parser.add_argument("--resume", action="store_true", help="Continue a partial run for this topic")
+    parser.add_argument("--trace", nargs="?", const="traces", default=None, metavar="DIR",
+                        help="Write a Chrome trace of every stage to DIR (default: traces/)")
+    parser.add_argument("--profile", nargs="?", const="profiles", default=None, metavar="DIR",
+                        help="Profile each stage and dump flamegraphs to DIR (default: profiles/)")
+    args = parser.parse_args()
+    tracing.enable(trace_dir=args.trace, profile_dir=args.profile)
+    
+    topic = args.topic or input("Enter a topic for the Short: ")
+    
+    print(f"--- Initializing Engines (Run Dir: output/{sanitize_filename(topic)}) ---")
+    pipeline = ShortsPipeline(render_backend=args.renderer, render_workers=args.workers)
+    pipeline.run(topic, test=args.test, upload=args.upload, resume=args.resume)
+    tracing.TRACER.print_summary()
 
 if __name__ == "__main__":
     main()
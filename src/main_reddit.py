@@ -3,173 +3,254 @@ import random
 from reddit_client import RedditClient
 from tts_engine import TTSEngine
 from video_editor import VideoEditor
+from audio_mixer import AudioMixer
+from gameplay_library import GameplayLibrary
+from proxy_cache import ProxyCache
+from content_store import default_store
+import tracing
+from tracing import span
 import shutil
+from typing import Dict, List, NamedTuple
+
+
+class RedditJob(NamedTuple):
+    """
+    A thread whose voiceover is ready: everything render() needs, nothing network-bound left.
+    """
+    post_id: str
+    title: str
+    audio_paths: List[str]
+    segments: List[Dict]
+    output_path: str
+    audio_dir: str
+
 
 class RedditShortsMaker:
-    def __init__(self):
-        self.reddit = RedditClient()
+    def __init__(self, render_backend=None):
+        self.store = default_store()
+        self.reddit = RedditClient(store=self.store)
         self.tts = TTSEngine(output_dir="temp_assets")
-        self.editor = VideoEditor()
+        self.editor = VideoEditor(render_backend=render_backend)
+        self.mixer = AudioMixer()
         self.assets_dir = os.path.join(os.getcwd(), "assets", "gameplay")
         self.output_dir = "output_reddit"
         os.makedirs(self.output_dir, exist_ok=True)
         os.makedirs(self.assets_dir, exist_ok=True)
+        self.gameplay = GameplayLibrary(self.assets_dir)
+        self.proxies = ProxyCache()
 
     def run(self, subreddit="AskReddit", ignore_ids=None):
+        job = self.prepare(subreddit, ignore_ids)
+        if not job:
+            return None
+        return job.post_id if self.render(job) else None
+
+    def prepare(self, subreddit="AskReddit", ignore_ids=None):
+        """
+        Network-bound half of run(): picks a thread and synthesizes its voiceover.
+        subreddit may be a list, in which case the thread comes from the combined pool.
+        Returns a RedditJob ready for render(), or None. Safe to run on a background
+        thread while another job renders; each job writes its audio to its own folder.
+        """
         if ignore_ids is None: ignore_ids = []
         
         # 1. Get Content
-        print(f"🔍 Fetching viral thread from r/{subreddit}...")
-        post = self.reddit.get_viral_thread(subreddit, limit=30, ignore_ids=ignore_ids) # Increased limit for batch
+        if isinstance(subreddit, (list, tuple)):
+            # Several subreddits: served from the client's combined candidate pool
+            post = self.reddit.get_pooled_thread(list(subreddit), ignore_ids=ignore_ids)
+            subreddit = post.get('subreddit') if post else None
+        else:
+            print(f"🔍 Fetching viral thread from r/{subreddit}...")
+            post = self.reddit.get_viral_thread(subreddit, limit=30, ignore_ids=ignore_ids) # Increased limit for batch
         if not post:
             print("❌ No suitable threads found.")
             return None
 
         print(f"✅ Found Thread: {post['title']}")
+        # Claimed right away so a concurrent prefetch or a later batch won't pick it again
+        self.store.mark_post(post['id'], "prepared", subreddit=subreddit, title=post['title'])
         
         # 2. Generate Audio
         print("🎙️ Generating Voiceover...")
         segments = []
         audio_paths = []
-        image_paths = [] # We use black/transparent images or just reuse background logic
+        audio_dir = os.path.join(self.tts.output_dir, post['id'])
+        os.makedirs(audio_dir, exist_ok=True)
 
-        # Title
-        title_audio = self.tts.run_generate(post['title'], "title.mp3")
-        segments.append({'text': post['title']})
-        audio_paths.append(title_audio)
+        texts = [post['title']]
+        filenames = ["title.mp3"]
 
         # Body (if exists)
         if post['body']:
             # Split body if too long
-            body_text = post['body'][:500] 
-            body_audio = self.tts.run_generate(body_text, "body.mp3")
-            segments.append({'text': body_text})
-            audio_paths.append(body_audio)
+            texts.append(post['body'][:500])
+            filenames.append("body.mp3")
 
         # Comments
         for i, comment in enumerate(post['comments']):
-            comment_audio = self.tts.run_generate(comment, f"comment_{i}.mp3")
-            segments.append({'text': comment})
-            audio_paths.append(comment_audio)
+            texts.append(comment)
+            filenames.append(f"comment_{i}.mp3")
 
-        # 3. Background Video
-        bg_video = self._get_random_gameplay()
-        if not bg_video:
-            print("❌ No gameplay video found in 'assets/gameplay'. Please add one!")
-            return
+        # Title, body and comments are synthesized concurrently in one event loop.
+        # Word timings come from the same TTS stream, no re-probe of the files.
+        items = [(text, os.path.join(post['id'], name)) for text, name in zip(texts, filenames)]
+        try:
+            results = self.tts.generate_many(items)
+        except Exception:
+            self.store.mark_post(post['id'], "failed")
+            shutil.rmtree(audio_dir, ignore_errors=True)
+            raise
+        for text, tts in zip(texts, results):
+            segments.append({'text': text, 'words': tts.words})
+            audio_paths.append(tts.path)
 
-        # 4. Assemble
-        # We need to adapt the VideoEditor to accept a SINGLE video file and overlay audio/text
-        # The existing VideoEditor expects list of IMAGES. We need to modify it or create a new method.
-        # Let's use a new method specifically for Reddit Shorts style.
-        
         # Sanitize title for filename
         safe_title = "".join([c for c in post['title'] if c.isalnum() or c in (' ', '-', '_')]).strip()
         safe_title = safe_title.replace(" ", "_")[:50] # Limit length
         
         output_filename = os.path.join(self.output_dir, f"{safe_title}.mp4")
-        self._assemble_reddit_video(bg_video, audio_paths, segments, output_filename)
-        return post['id']
+        self.store.mark_post(post['id'], "prepared", output_path=output_filename)
+        return RedditJob(post['id'], post['title'], audio_paths, segments, output_filename, audio_dir)
+
+    def render(self, job):
+        """
+        CPU-bound half of run(): mixes, picks gameplay and encodes. Removes the job's audio afterwards.
+        """
+        # 3. Background Video (the window is chosen once the voiceover length is known)
+        if not self.gameplay.files():
+            print("❌ No gameplay video found in 'assets/gameplay'. Please add one!")
+            self.store.mark_post(job.post_id, "failed")
+            return False
+
+        # 4. Assemble
+        try:
+            self._assemble_reddit_video(None, job.audio_paths, job.segments, job.output_path)
+        except Exception:
+            self.store.mark_post(job.post_id, "failed")
+            raise
+        finally:
+            shutil.rmtree(job.audio_dir, ignore_errors=True)
+        self.store.mark_post(job.post_id, "done")
+        return True
+
+    def discard(self, job):
+        """
+        Releases a prepared job that will never be rendered, so its thread can be picked again.
+        """
+        self.store.mark_post(job.post_id, "failed")
+        shutil.rmtree(job.audio_dir, ignore_errors=True)
 
-    def _get_random_gameplay(self):
-        files = [f for f in os.listdir(self.assets_dir) if f.endswith(('.mp4', '.mkv'))]
-        if not files: return None
-        return os.path.join(self.assets_dir, random.choice(files))
+    def _get_random_gameplay(self, duration):
+        """
+        Keyframe-aligned gameplay window that hasn't been used recently.
+        """
+        return self.gameplay.pick_window(duration)
 
     def _assemble_reddit_video(self, video_path, audio_paths, segments, output_path):
-        from moviepy.editor import VideoFileClip, AudioFileClip, concatenate_audioclips, CompositeVideoClip, TextClip
-        from moviepy.video.tools.subtitles import SubtitlesClip
+        """
+        Renders the voiceover + captions over gameplay. With video_path=None a window is
+        picked from the gameplay library; otherwise a keyframe start within video_path is used.
+        """
+        from moviepy.editor import VideoFileClip, AudioFileClip
+        from caption_track import CaptionTrackClip
         
         print("🎬 Assembling Video...")
         
-        # 1. Pre-render combined audio to avoid mixing hangs
+        # 1. Mix audio in memory: one decode per clip, lossless WAV hand-off to the encoder
         print("   - Mixing Audio...")
-        audios = [AudioFileClip(p) for p in audio_paths]
-        final_audio_mem = concatenate_audioclips(audios)
-        
-        temp_audio_path = os.path.join(self.output_dir, "temp_combined_audio.mp3")
-        final_audio_mem.write_audiofile(temp_audio_path, bitrate="192k")
-        
-        # Reload as single file
-        final_audio = AudioFileClip(temp_audio_path)
-        total_duration = final_audio.duration
-        
-        # 2. Load Video and Loop/Cut
-        print("   - Preparing Video...")
-        video = VideoFileClip(video_path)
-        if video.duration < total_duration:
-            # Loop video if too short
-            video = video.loop(duration=total_duration)
+        mix = self.mixer.mix(audio_paths)
+        temp_audio_path = self.mixer.write_wav(mix, directory=self.output_dir)
+        segment_times = mix.segment_times()
+        total_duration = mix.duration
+        if video_path is None:
+            window = self._get_random_gameplay(total_duration)
         else:
-            # Pick random start point
-            max_start = video.duration - total_duration
-            start = random.uniform(0, max_start)
-            video = video.subclip(start, start + total_duration)
-            
-        video = video.resize(height=1920) # Ensure vertical 9:16 roughly
-        video = video.crop(x1=video.w//2 - 540, width=1080, height=1920)
-        video = video.set_audio(final_audio)
-
-        # 3. Generate Subtitles
-        print("   - Generating Subtitles...")
-        clips = [video]
-        current_time = 0
+            window = self.gameplay.pick_window(total_duration, path=video_path)
         
-        # We need the original durations for timing, which we can get from the audios list before we close them
-        # Re-using 'audios' list for duration reference is fine
+        # Cut from the pre-cropped vertical proxy when one has been built (same timeline)
+        proxy = self.proxies.lookup(window.path)
+        if proxy:
+            print(f"   - Using proxy {os.path.basename(proxy)}")
+            window = window._replace(path=proxy)
         
-        for i, segment in enumerate(segments):
-            text = segment['text']
-            duration = audios[i].duration 
-            
-            # Create chunked captions (2-3 words max)
-            words = text.split()
-            if not words:
-                current_time += duration
-                continue
+        try:
+            if self.editor.render_backend in ("ffmpeg", "stills"):
+                # Gameplay frames are never still, so "stills" uses the ffmpeg filtergraph too
+                return self._assemble_reddit_video_ffmpeg(window, temp_audio_path, segment_times, segments, output_path)
             
-            chunk_size = 2 # User requested 2-3 words. 2 is safer for "Big Fonts"
-            chunks = [' '.join(words[j:j+chunk_size]) for j in range(0, len(words), chunk_size)]
-            
-            if not chunks: 
-                 current_time += duration
-                 continue
+            with span("video.compose", backend="moviepy"):
+                final_audio = AudioFileClip(temp_audio_path)
+                
+                # 2. Load Video and Loop/Cut
+                print("   - Preparing Video...")
+                video = VideoFileClip(window.path)
+                if window.loop:
+                    # Loop video if too short
+                    video = video.loop(duration=total_duration)
+                else:
+                    # Keyframe-aligned start point: the reader's seek lands exactly on it
+                    video = video.subclip(window.start, window.start + total_duration)
+                    
+                if tuple(video.size) != (1080, 1920):
+                    video = video.resize(height=1920) # Ensure vertical 9:16 roughly
+                    video = video.crop(x1=video.w//2 - 540, width=1080, height=1920)
+                video = video.set_audio(final_audio)
+
+                # 3. Generate Subtitles
+                print("   - Generating Subtitles...")
+                track = self.build_caption_track(segments, segment_times)
 
-            time_per_chunk = duration / len(chunks)
+            # 4. Write Final Video
+            print("   - Rendering Final Output...")
+            # Captions are blitted straight onto the gameplay frames by a single track clip
+            final = CaptionTrackClip(video, track)
+            # Using ultra-fast preset and threads
+            with span("video.encode", backend="moviepy", duration=total_duration):
+                final.write_videofile(
+                    output_path, 
+                    fps=24, 
+                    codec='libx264', 
+                    audio_codec='aac', 
+                    preset='ultrafast', 
+                    threads=4,
+                    logger='bar'
+                )
             
-            for chunk_idx, chunk in enumerate(chunks):
-                chunk_start = current_time + (chunk_idx * time_per_chunk)
-                txt_clip = self.editor.create_caption_clip(chunk.upper(), time_per_chunk, chunk_start)
-                if txt_clip:
-                    clips.append(txt_clip)
+            final.close()
+            final_audio.close()
+            video.close()
+        finally:
+            # Clean up temp audio
+            if os.path.exists(temp_audio_path):
+                os.remove(temp_audio_path)
             
-            current_time += duration
-            audios[i].close() # Cleanup original handles
-
-        # 4. Write Final Video
-        print("   - Rendering Final Output...")
-        final = CompositeVideoClip(clips)
-        # Using ultra-fast preset and threads
-        final.write_videofile(
-            output_path, 
-            fps=24, 
-            codec='libx264', 
-            audio_codec='aac', 
-            preset='ultrafast', 
-            threads=4,
-            logger='bar'
-        )
+        print(f"✨ Video Created: {output_path}")
+
+    def build_caption_track(self, segments, segment_times):
+        """
+        Chunked captions (2 words - safer for "Big Fonts") placed at each segment's offset in the mix.
+        """
+        track = self.editor.new_caption_track()
+        for segment, (start, duration) in zip(segments, segment_times):
+            self.editor.add_captions(track, segment['text'], start, duration, segment.get('words'))
+        return track
+
+    def _assemble_reddit_video_ffmpeg(self, window, audio_path, segment_times, segments, output_path):
+        """
+        Same output as the moviepy path, built as a single ffmpeg invocation.
+        """
+        print("   - Generating Subtitles...")
+        track = self.build_caption_track(segments, segment_times)
         
-        final.close()
-        final_audio.close()
-        video.close()
-        # Clean up temp audio
-        if os.path.exists(temp_audio_path):
-            os.remove(temp_audio_path)
-            
+        total_duration = segment_times[-1][0] + segment_times[-1][1]
+        with span("video.render", backend="ffmpeg", duration=total_duration):
+            self.editor.ffmpeg.render_gameplay(window.path, [audio_path], track, output_path,
+                                               start=None if window.loop else window.start,
+                                               durations=[total_duration])
         print(f"✨ Video Created: {output_path}")
 
 if __name__ == "__main__":
+    tracing.enable()
     bot = RedditShortsMaker()
     
     # List of text-heavy subreddits good for shorts
@@ -1,57 +1,80 @@
 import asyncio
-import edge_tts
-from typing import Optional
-import time
+from typing import Dict, Optional, Tuple
 import os
+import urllib.parse
 from dotenv import load_dotenv
+from http_client import get_client
+from image_cache import ImageCache
+from tts_engine import TTSResult, synthesize
+from tracing import traced
 
 load_dotenv()
 
 class MediaGen:
     def __init__(self):
         # No API keys needed for these free tools!
-        pass
+        self.image_model = "flux"
+        self.image_width = 1080
+        self.image_height = 1920
+        self.image_cache = ImageCache()
+        self.http = get_client()
 
+    @traced("media.image")
     def generate_image(self, prompt: str, output_path: str):
         """
         Generates an image via Pollinations.ai (Free) and saves to output_path.
+        Results are cached by (enhanced prompt, model, size); identical concurrent
+        prompts share a single download.
         """
         print(f"Generating image for prompt: {prompt[:50]}...")
         try:
-            # Pollinations.ai URL format: https://image.pollinations.ai/prompt/{prompt}
             # Enhance prompt with quality boosters
             enhanced_prompt = f"{prompt}, cinematic lighting, award winning photography, 8k, highly detailed, photorealistic"
-            safe_prompt = requests.utils.quote(enhanced_prompt)
-            image_url = f"https://image.pollinations.ai/prompt/{safe_prompt}?width=1080&height=1920&model=flux&nologo=true"
-            
-            for attempt in range(3):
-                try:
-                     response = requests.get(image_url, timeout=120)
-                     if response.status_code == 200:
-                         with open(output_path, 'wb') as handler:
-                             handler.write(response.content)
-                         return # Success
-                     else:
-                         print(f"Image API Status: {response.status_code}. Retrying...")
-                         time.sleep(2)
-                except Exception as e:
-                     print(f"Image Gen Error (Attempt {attempt+1}): {e}")
-                     time.sleep(2)
-                     
-                     time.sleep(2)
-            
-            # --- BACKUP: Hugging Face ---
-            print("⚠️ Pollinations failed. Attempting Backup (Hugging Face)...")
-            if self._generate_image_hf(prompt, output_path):
-                print("✅ Backup Successful (Hugging Face)")
-                return
+            key = self.image_cache.key(enhanced_prompt, self.image_model, self.image_width, self.image_height)
+            result = self.image_cache.fetch(key, lambda: self._download_image(prompt, enhanced_prompt))
+            if not result:
+                raise Exception("Failed to generate image (All providers failed)")
 
-            raise Exception("Failed to generate image (All providers failed)")
+            data, meta = result
+            with open(output_path, 'wb') as handler:
+                handler.write(data)
+            if meta.get("provider") == "huggingface":
+                print("✅ Backup Successful (Hugging Face)")
             
         except Exception as e:
             print(f"Error generating image: {e}")
 
-    def _generate_image_hf(self, prompt: str, output_path: str) -> bool:
+    def _download_image(self, prompt: str, enhanced_prompt: str) -> Optional[Tuple[bytes, Dict]]:
+        """
+        Tries Pollinations, then the Hugging Face backup. Returns (bytes, provider metadata) or None.
+        """
+        # Pollinations.ai URL format: https://image.pollinations.ai/prompt/{prompt}
+        safe_prompt = urllib.parse.quote(enhanced_prompt)
+        image_url = (f"https://image.pollinations.ai/prompt/{safe_prompt}"
+                     f"?width={self.image_width}&height={self.image_height}&model={self.image_model}&nologo=true")
+        
+        # Retries with backoff (and Retry-After) are handled by the shared HTTP client
+        try:
+            response = self.http.get(image_url, timeout=(10, 120))
+            if response.status_code == 200:
+                return response.content, {
+                    "provider": "pollinations",
+                    "model": self.image_model,
+                    "prompt": enhanced_prompt,
+                    "content_type": response.headers.get("Content-Type"),
+                }
+            print(f"Image API Status: {response.status_code}.")
+        except Exception as e:
+            print(f"Image Gen Error: {e}")
+        
+        # --- BACKUP: Hugging Face ---
+        print("⚠️ Pollinations failed. Attempting Backup (Hugging Face)...")
+        data = self._generate_image_hf(prompt)
+        if data:
+            return data, {"provider": "huggingface", "model": "stable-diffusion-xl-base-1.0", "prompt": prompt}
+        return None
+
+    def _generate_image_hf(self, prompt: str) -> Optional[bytes]:
         """
         Backup: Generates image using Hugging Face Inference API (SDXL).
         Requires HF_TOKEN in .env
@@ -59,7 +82,7 @@ class MediaGen:
         token = os.getenv("HF_TOKEN")
         if not token:
             print("❌ No HF_TOKEN found in .env. Skipping backup.")
-            return False
+            return None
             
         API_URL = "https://api-inference.huggingface.co/models/stabilityai/stable-diffusion-xl-base-1.0"
         headers = {"Authorization": f"Bearer {token}"}
@@ -71,31 +94,34 @@ class MediaGen:
         }
 
         try:
-            response = requests.post(API_URL, headers=headers, json=payload, timeout=120)
+            response = self.http.post(API_URL, headers=headers, json=payload, timeout=(10, 120))
             if response.status_code == 200:
-                with open(output_path, 'wb') as f:
-                    f.write(response.content)
-                return True
+                return response.content
             else:
                 print(f"HF API Error: {response.status_code} - {response.text}")
-                return False
+                return None
         except Exception as e:
             print(f"HF Backup Error: {e}")
-            return False
+            return None
 
-    async def _generate_audio_async(self, text: str, output_path: str):
+    async def _generate_audio_async(self, text: str, output_path: str) -> TTSResult:
         """
-        Async helper for edge-tts
+        Async helper for edge-tts: streams into memory, then a single write to output_path.
         """
-        communicate = edge_tts.Communicate(text, "en-US-ChristopherNeural")
-        await communicate.save(output_path)
+        result = await synthesize(text, "en-US-ChristopherNeural")
+        with open(output_path, "wb") as f:
+            f.write(result.audio)
+        return result._replace(path=output_path)
 
-    def generate_audio(self, text: str, output_path: str):
+    @traced("media.audio")
+    def generate_audio(self, text: str, output_path: str) -> Optional[TTSResult]:
         """
         Generates TTS audio via Edge TTS (Free) and saves to output_path.
+        Returns the TTS result (duration + word timings), or None on failure.
         """
         print(f"Generating audio for text: {text[:30]}...")
         try:
-            asyncio.run(self._generate_audio_async(text, output_path))
+            return asyncio.run(self._generate_audio_async(text, output_path))
         except Exception as e:
             print(f"Error generating audio: {e}")
+            return None
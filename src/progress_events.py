@@ -0,0 +1,245 @@
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+EVENTS_FILE = "progress_events.jsonl"
+DASHBOARD_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "frontend", "dashboard.html")
+
+
+class ProgressLog:
+    """
+    Append-only JSONL event log. Each event is one line written with a single O_APPEND
+    write, so several processes can report at once without interleaving, and readers
+    never see half an event: only newline-terminated lines count.
+    Every run starts with a header line carrying a run id. Reader positions are
+    "<run>:<offset>" (the byte offset just past the last event read), so a reader from
+    an earlier run is reset even when the new log has already grown past its offset.
+    """
+
+    def __init__(self, path: str = EVENTS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """
+        Starts a fresh log (new farm run). Connected readers notice the new run id and start over.
+        """
+        header = {"kind": "run", "run": uuid.uuid4().hex[:12], "ts": time.time(), "pid": os.getpid()}
+        with self._lock:
+            with open(self.path, "wb") as f:
+                f.write((json.dumps(header) + "\n").encode("utf-8"))
+
+    def run_id(self) -> str:
+        """
+        Id of the run in the log ("" for a log that was never reset).
+        """
+        try:
+            with open(self.path, "rb") as f:
+                first = f.readline()
+            header = json.loads(first) if first.endswith(b"\n") else {}
+        except (OSError, ValueError):
+            return ""
+        return header.get("run", "") if header.get("kind") == "run" else ""
+
+    def emit(self, kind: str, **fields):
+        event = {"kind": kind, "ts": time.time(), "time": datetime.now().strftime("%H:%M:%S"), "pid": os.getpid()}
+        event.update(fields)
+        line = (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+
+    @staticmethod
+    def parse_position(position: str) -> Tuple[Optional[str], int]:
+        """
+        "<run>:<offset>" -> (run, offset). A bare offset (or nothing) has no run.
+        """
+        run, _, offset = (position or "").rpartition(":")
+        try:
+            return (run if _ else None), int(offset or 0)
+        except ValueError:
+            return None, 0
+
+    def read(self, position: str = "") -> Tuple[List[Dict], str, bool]:
+        """
+        Returns (events after position, new position, reset). reset is True when the
+        position belongs to another run or lies past the end of the log; reading then
+        begins from the start. Each event carries its resume position as "id".
+        """
+        run, offset = self.parse_position(position)
+        current = self.run_id()
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return [], f"{current}:0", offset > 0
+        reset = size < offset or (offset > 0 and run is not None and run != current)
+        if reset:
+            offset = 0
+        if size == offset:
+            return [], f"{current}:{offset}", reset
+
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            data = f.read(size - offset)
+        # A trailing line without its newline is still being written: leave it for next time
+        end = data.rfind(b"\n") + 1
+        events = []
+        position = offset
+        for line in data[:end].splitlines(keepends=True):
+            position += len(line)
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if event.get("kind") == "run":
+                continue  # Header, not progress
+            event["id"] = f"{current}:{position}"
+            events.append(event)
+        return events, f"{current}:{offset + end}", reset
+
+    def size(self) -> int:
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+
+class _Handler(BaseHTTPRequestHandler):
+    log: ProgressLog = None
+    server_state: "ProgressServer" = None
+    poll_interval = 0.25
+    keepalive_seconds = 15.0
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        if url.path in ("/", "/dashboard.html"):
+            self._send_dashboard()
+        elif url.path == "/events":
+            position = self.headers.get("Last-Event-ID") or query.get("offset", [""])[0]
+            self._stream(position)
+        elif url.path == "/poll":
+            self._long_poll(query.get("offset", [""])[0], float(query.get("timeout", ["25"])[0]))
+        else:
+            self.send_error(404)
+
+    def _send_dashboard(self):
+        try:
+            with open(DASHBOARD_PATH, "rb") as f:
+                body = f.read()
+        except OSError:
+            self.send_error(404, "dashboard.html not found")
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, position: str):
+        """
+        Server-sent events: sends only events past position, then tails the log.
+        EventSource reconnects with Last-Event-ID, so a dropped connection resumes in place.
+        """
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        last_write = time.monotonic()
+        client = object()
+        try:
+            while True:
+                events, position, reset = self.log.read(position)
+                chunks = []
+                if reset:
+                    chunks.append(f"id: {position.rpartition(':')[0]}:0\nevent: reset\ndata: {{}}\n\n")
+                for event in events:
+                    chunks.append(f"id: {event['id']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n")
+                if not chunks and time.monotonic() - last_write > self.keepalive_seconds:
+                    chunks.append(": keepalive\n\n")
+                if chunks:
+                    self.wfile.write("".join(chunks).encode("utf-8"))
+                    self.wfile.flush()
+                    last_write = time.monotonic()
+                # Lets the farm wait for connected dashboards to catch up before it exits
+                self.server_state.delivered(client, self.log.parse_position(position)[1])
+                time.sleep(self.poll_interval)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.server_state.disconnected(client)
+
+    def _long_poll(self, position: str, timeout: float):
+        """
+        Long-polling fallback: answers as soon as there is something past position, or after timeout.
+        """
+        deadline = time.monotonic() + min(timeout, 60.0)
+        while True:
+            events, new_position, reset = self.log.read(position)
+            if events or reset or time.monotonic() >= deadline:
+                break
+            time.sleep(self.poll_interval)
+        body = json.dumps({"events": events, "offset": new_position, "reset": reset}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Keep the farm console clean
+
+
+class ProgressServer:
+    """
+    Local HTTP server for the dashboard: / (dashboard), /events (SSE), /poll (long-poll).
+    """
+
+    def __init__(self, log: ProgressLog, port: Optional[int] = None, host: str = "127.0.0.1"):
+        port = port if port is not None else int(os.getenv("PROGRESS_PORT", "8765"))
+        self.log = log
+        handler = type("ProgressHandler", (_Handler,), {"log": log, "server_state": self})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://{host}:{self.httpd.server_address[1]}/"
+        self._clients: Dict[object, int] = {}  # SSE connection -> offset delivered so far
+        self._lock = threading.Lock()
+
+    def delivered(self, client: object, offset: int):
+        with self._lock:
+            self._clients[client] = offset
+
+    def disconnected(self, client: object):
+        with self._lock:
+            self._clients.pop(client, None)
+
+    def drain(self, timeout: float = 5.0) -> bool:
+        """
+        Waits until every connected dashboard has been sent the whole log (or timeout).
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            end = self.log.size()
+            with self._lock:
+                if all(offset >= end for offset in self._clients.values()):
+                    return True
+            time.sleep(0.1)
+        return False
+
+    def start(self) -> "ProgressServer":
+        threading.Thread(target=self.httpd.serve_forever, name="progress-server", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,134 @@
+import argparse
+import hashlib
+import os
+import threading
+from typing import List, Optional, Tuple
+
+from ffmpeg_renderer import run_ffmpeg
+
+PROXY_SIZES = {
+    "full": (1080, 1920),
+    "preview": (540, 960),
+}
+
+
+class ProxyCache:
+    """
+    Size-capped cache of pre-cropped vertical "proxy" transcodes of gameplay footage.
+    A proxy is already 1080x1920 (or 540x960) with a short GOP, so renders cut from it
+    directly instead of scaling a landscape frame and throwing half of it away every frame.
+    Least recently used proxies are evicted once the cache exceeds max_bytes.
+    """
+
+    def __init__(self, cache_dir: str = os.path.join("cache", "gameplay_proxies"),
+                 max_bytes: Optional[int] = None, gop_seconds: float = 1.0, fps: int = 24):
+        self.cache_dir = cache_dir
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv("PROXY_CACHE_GB", "20")) * 1024 ** 3)
+        self.max_bytes = max_bytes
+        self.gop_seconds = gop_seconds
+        self.fps = fps
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _proxy_path(self, source_path: str, size: Tuple[int, int]) -> str:
+        stat = os.stat(source_path)
+        # A re-encoded or replaced source gets a new key; its old proxy simply ages out
+        key = f"{os.path.abspath(source_path)}|{stat.st_size}|{stat.st_mtime}|{size[0]}x{size[1]}|{self.fps}"
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+        name = os.path.splitext(os.path.basename(source_path))[0]
+        return os.path.join(self.cache_dir, f"{name}_{size[0]}x{size[1]}_{digest}.mp4")
+
+    def lookup(self, source_path: str, size: Tuple[int, int] = PROXY_SIZES["full"]) -> Optional[str]:
+        """
+        Returns the proxy for source_path if it has been built, marking it recently used.
+        """
+        path = self._proxy_path(source_path, size)
+        if not os.path.exists(path):
+            return None
+        os.utime(path, None)  # LRU order is file mtime
+        return path
+
+    def get(self, source_path: str, size: Tuple[int, int] = PROXY_SIZES["full"]) -> str:
+        """
+        Returns the proxy for source_path, transcoding it first on a miss.
+        """
+        cached = self.lookup(source_path, size)
+        if cached:
+            return cached
+        return self.build(source_path, size)
+
+    def build(self, source_path: str, size: Tuple[int, int] = PROXY_SIZES["full"]) -> str:
+        path = self._proxy_path(source_path, size)
+        width, height = size
+        tmp_path = f"{path}.{os.getpid()}.tmp.mp4"
+        gop = max(1, int(round(self.gop_seconds * self.fps)))
+
+        print(f"   - Building {width}x{height} proxy for {os.path.basename(source_path)}...")
+        try:
+            run_ffmpeg([
+                "-i", source_path,
+                "-vf", (f"scale={width}:{height}:force_original_aspect_ratio=increase,"
+                        f"crop={width}:{height},setsar=1,fps={self.fps}"),
+                "-an",  # The short's audio is always the voiceover
+                "-c:v", "libx264", "-preset", "veryfast", "-crf", "18", "-pix_fmt", "yuv420p",
+                # Fixed short GOP: any cut point is at most gop_seconds from a keyframe
+                "-g", str(gop), "-keyint_min", str(gop), "-sc_threshold", "0",
+                "-movflags", "+faststart",
+                tmp_path,
+            ], "proxy transcode")
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep: Optional[str] = None) -> List[str]:
+        """
+        Deletes least recently used proxies until the cache fits in max_bytes.
+        """
+        removed = []
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                full = os.path.join(self.cache_dir, name)
+                if name.endswith(".mp4") and ".tmp" not in name and os.path.isfile(full):
+                    stat = os.stat(full)
+                    entries.append((stat.st_mtime, stat.st_size, full))
+            total = sum(size for _, size, _ in entries)
+            for _, size, full in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if keep and os.path.abspath(full) == os.path.abspath(keep):
+                    continue
+                try:
+                    os.remove(full)
+                except OSError:
+                    continue
+                total -= size
+                removed.append(full)
+        for full in removed:
+            print(f"   - Evicted proxy {os.path.basename(full)}")
+        return removed
+
+
+def build_all(assets_dir: str, sizes: List[str]):
+    """
+    Offline stage: builds proxies for every gameplay file in assets_dir.
+    """
+    from gameplay_library import GameplayLibrary
+    cache = ProxyCache()
+    library = GameplayLibrary(assets_dir)
+    for name in library.files():
+        for size_name in sizes:
+            cache.get(os.path.join(assets_dir, name), PROXY_SIZES[size_name])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build vertical gameplay proxies")
+    parser.add_argument("--assets", default=os.path.join(os.getcwd(), "assets", "gameplay"))
+    parser.add_argument("--sizes", nargs="+", choices=sorted(PROXY_SIZES), default=["full"])
+    args = parser.parse_args()
+    build_all(args.assets, args.sizes)
@@ -0,0 +1,176 @@
+import asyncio
+import os
+import threading
+import time
+from typing import Dict, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+
+class RateLimiter:
+    """
+    Token bucket shared by every thread that talks to one provider.
+    acquire() reserves a token and sleeps until it is due, so concurrent callers are
+    spaced out fairly (first come, first served) instead of all firing at once.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate    # Tokens per second (sustained requests/s)
+        self.burst = burst  # Requests allowed back to back after an idle period
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        self.waited = 0.0  # Total seconds callers spent waiting for a token
+
+    def reserve(self) -> float:
+        """
+        Takes a token without sleeping. Returns the seconds until it is due.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            # Tokens may go negative: that is a reservation further down the queue
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            wait = max(wait, self._blocked_until - now)
+            self.waited += wait
+            return wait
+
+    def acquire(self) -> float:
+        """
+        Blocks until a request may be sent. Returns the seconds waited.
+        """
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self) -> float:
+        """
+        acquire() for coroutines: waits without blocking the event loop.
+        """
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def pause(self, seconds: float):
+        """
+        Holds every caller for at least `seconds` (e.g. a provider's Retry-After).
+        """
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+
+class ProviderLimits(NamedTuple):
+    rate: float          # Starting requests/s
+    burst: int
+    min_rate: float
+    max_rate: float
+    slow_seconds: float  # Responses slower than this count as a sign of overload
+
+
+# Starting points only: the rate moves between min_rate and max_rate from observed responses.
+# <NAME>_RATE / <NAME>_BURST env vars override the start values (e.g. REDDIT_RATE=0.5).
+# Limiters live in one process. When RATE_SHARE processes call the same providers at once
+# (farm workers), every rate and burst is divided by it so their sum stays within these limits.
+PROVIDERS: Dict[str, ProviderLimits] = {
+    "pollinations_text": ProviderLimits(rate=0.5, burst=2, min_rate=0.05, max_rate=5.0, slow_seconds=45.0),
+    "pollinations_image": ProviderLimits(rate=0.5, burst=2, min_rate=0.05, max_rate=5.0, slow_seconds=60.0),
+    "huggingface": ProviderLimits(rate=0.5, burst=2, min_rate=0.05, max_rate=5.0, slow_seconds=90.0),
+    "reddit": ProviderLimits(rate=1.0, burst=4, min_rate=0.1, max_rate=2.0, slow_seconds=5.0),
+    "edge_tts": ProviderLimits(rate=2.0, burst=4, min_rate=0.2, max_rate=10.0, slow_seconds=15.0),
+}
+
+# Host suffix -> provider, for requests that go through the shared HTTP client
+PROVIDER_HOSTS = {
+    "text.pollinations.ai": "pollinations_text",
+    "image.pollinations.ai": "pollinations_image",
+    "huggingface.co": "huggingface",
+    "reddit.com": "reddit",
+}
+
+# Statuses that mean "slow down" rather than "this request was bad"
+THROTTLE_STATUSES = (429, 500, 502, 503, 504)
+
+
+class AdaptiveRateLimiter(RateLimiter):
+    """
+    Token bucket whose rate follows the provider (AIMD): every healthy response nudges the
+    rate up additively, every 429/5xx or transport error halves it and spaces the next call
+    by one interval at the new rate, and slow responses shave it down gently.
+    """
+
+    def __init__(self, name: str, limits: ProviderLimits):
+        super().__init__(limits.rate, limits.burst)
+        self.name = name
+        self.limits = limits
+        self.step = limits.rate * 0.1  # Additive increase per healthy response
+        self.requests = 0
+        self.throttled = 0
+
+    def record(self, status: Optional[int], seconds: float):
+        """
+        Feeds one outcome back into the rate. status=None means a transport error.
+        """
+        with self._lock:
+            self.requests += 1
+            if status is None or status in THROTTLE_STATUSES:
+                self.throttled += 1
+                self.rate = max(self.limits.min_rate, self.rate / 2)
+                self._blocked_until = max(self._blocked_until, time.monotonic() + 1 / self.rate)
+            elif seconds > self.limits.slow_seconds:
+                self.rate = max(self.limits.min_rate, self.rate * 0.9)
+            elif status < 400:
+                self.rate = min(self.limits.max_rate, self.rate + self.step)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "rate": round(self.rate, 3),
+                "requests": self.requests,
+                "throttled": self.throttled,
+                "waited_seconds": round(self.waited, 2),
+            }
+
+
+_LIMITERS: Dict[str, AdaptiveRateLimiter] = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def limiter_for(provider: str) -> AdaptiveRateLimiter:
+    """
+    Process-wide limiter for a provider name in PROVIDERS.
+    """
+    with _LIMITERS_LOCK:
+        limiter = _LIMITERS.get(provider)
+        if limiter is None:
+            limits = PROVIDERS[provider]
+            env = provider.upper()
+            share = max(1, int(os.getenv("RATE_SHARE", "1")))
+            limits = limits._replace(
+                rate=float(os.getenv(f"{env}_RATE", limits.rate)) / share,
+                burst=max(1, int(os.getenv(f"{env}_BURST", limits.burst)) // share),
+                min_rate=limits.min_rate / share,
+                max_rate=limits.max_rate / share,
+            )
+            limiter = _LIMITERS[provider] = AdaptiveRateLimiter(provider, limits)
+        return limiter
+
+
+def limiter_for_url(url: str) -> Optional[AdaptiveRateLimiter]:
+    """
+    Limiter for the provider serving url, or None for hosts we don't throttle.
+    """
+    host = urlsplit(url).hostname or ""
+    for suffix, provider in PROVIDER_HOSTS.items():
+        if host == suffix or host.endswith("." + suffix):
+            return limiter_for(provider)
+    return None
+
+
+def limiter_stats() -> Dict[str, Dict]:
+    with _LIMITERS_LOCK:
+        limiters = list(_LIMITERS.values())
+    return {limiter.name: limiter.stats() for limiter in limiters}
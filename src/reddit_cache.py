@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from disk_cache import DiskCache
+from http_client import HTTPClient, get_client
+
+
+class RedditResponseCache(DiskCache):
+    """
+    Persistent TTL cache for Reddit JSON endpoints, shared by every process on the machine.
+    Fresh entries are served without touching the network; stale ones are revalidated with
+    If-None-Match / If-Modified-Since when Reddit sent validators, so a 304 costs no body.
+    Listings get a short TTL, comment trees a longer one.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None,
+                 listing_ttl: Optional[float] = None, comments_ttl: Optional[float] = None,
+                 http: Optional[HTTPClient] = None):
+        cache_dir = cache_dir or os.getenv("REDDIT_CACHE_DIR") or os.path.join("cache", "reddit")
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv("REDDIT_CACHE_MB", "200")) * 1024 ** 2)
+        super().__init__(cache_dir, max_bytes)
+        self.listing_ttl = listing_ttl if listing_ttl is not None else float(os.getenv("REDDIT_LISTING_TTL", "300"))
+        self.comments_ttl = comments_ttl if comments_ttl is not None else float(os.getenv("REDDIT_COMMENTS_TTL", "3600"))
+        self.http = http or get_client()
+        self.hits = 0
+        self.revalidated = 0
+        self.fetched = 0
+
+    def _paths(self, url: str) -> Tuple[str, str]:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return (os.path.join(self.cache_dir, f"{key}.body"),
+                os.path.join(self.cache_dir, f"{key}.json"))
+
+    def _load(self, url: str) -> Tuple[Optional[Dict], Optional[bytes]]:
+        body_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None, None
+        return meta, body
+
+    def _store(self, url: str, meta: Dict, body: Optional[bytes]):
+        body_path, meta_path = self._paths(url)
+        if body is not None:
+            self._atomic_write(body_path, body)
+        self._atomic_write(meta_path, json.dumps(meta).encode("utf-8"))
+
+    def is_fresh(self, url: str, ttl: Optional[float] = None) -> bool:
+        """
+        True if url would be answered from disk without any request.
+        """
+        if not self.enabled:
+            return False
+        meta, _ = self._load(url)
+        ttl = self.listing_ttl if ttl is None else ttl
+        return meta is not None and time.time() - meta["fetched_at"] < ttl
+
+    def get_json(self, url: str, headers: Optional[Dict] = None, ttl: Optional[float] = None) -> Tuple[int, Any]:
+        """
+        Returns (status_code, parsed JSON or None). Cached answers report status 200.
+        """
+        if ttl is None:
+            ttl = self.listing_ttl
+        headers = dict(headers or {})
+        meta, body = self._load(url) if self.enabled else (None, None)
+
+        if meta is not None and time.time() - meta["fetched_at"] < ttl:
+            self._touch(*self._paths(url))
+            with self._lock:
+                self.hits += 1
+            return 200, json.loads(body)
+
+        if meta is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        response = self.http.get(url, headers=headers)
+
+        if response.status_code == 304 and meta is not None:
+            # Unchanged upstream: extend freshness without downloading the body again
+            meta["fetched_at"] = time.time()
+            self._store(url, meta, None)
+            self._touch(*self._paths(url))
+            with self._lock:
+                self.revalidated += 1
+            return 200, json.loads(body)
+
+        if response.status_code != 200:
+            return response.status_code, None
+
+        with self._lock:
+            self.fetched += 1
+        data = response.json()
+        if self.enabled:
+            self._store(url, {
+                "url": url,
+                "fetched_at": time.time(),
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            }, response.content)
+            self.evict()
+        return 200, data
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"hits": self.hits, "revalidated": self.revalidated, "fetched": self.fetched}
@@ -1,18 +1,53 @@
+import functools
 import praw
 import os
-from typing import Dict, List, Optional
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
 from dotenv import load_dotenv
+from http_client import get_client
+from http_replay import replay_url
+from reddit_cache import RedditResponseCache
+from content_store import ContentStore, default_store
+from rate_limiter import limiter_for
+from tracing import submit, traced
 
 load_dotenv()
 
 class RedditClient:
-    def __init__(self):
+    def __init__(self, store: Optional[ContentStore] = None):
         self.client_id = os.getenv("REDDIT_CLIENT_ID")
         self.client_secret = os.getenv("REDDIT_CLIENT_SECRET")
         self.user_agent = os.getenv("REDDIT_USER_AGENT", "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
         
+        self.http = get_client()
+        # Listings and comment trees are cached on disk with per-endpoint TTLs
+        self.cache = RedditResponseCache(http=self.http)
+        # Threads we have already produced are skipped before their comments are fetched
+        self.store = store or default_store()
+        # Candidate pool for get_pooled_thread: one combined listing serves many videos
+        self.pool_size = int(os.getenv("REDDIT_POOL_SIZE", "100"))
+        self.pool_low = int(os.getenv("REDDIT_POOL_LOW", "5"))
+        self.pool_refills = 0
+        self._pool: List = []
+        self._pool_key: Optional[str] = None
+        self._pool_after: Optional[str] = None
+        self._pool_seen: Set[str] = set()
+        self._ready: List[Dict] = []  # Inspected threads kept for the next calls
+        # Late inspections hand their candidates back from worker threads
+        self._pool_lock = threading.Lock()
+        # Passing threads kept per call, counting the one returned (so at least 1)
+        self.pool_keep = max(1, int(os.getenv("REDDIT_POOL_KEEP", "2")))
+        # Comment trees of several candidates are fetched at once, spaced by the shared
+        # adaptive Reddit limiter (JSON requests are paced inside the HTTP client)
+        self.fetch_workers = int(os.getenv("REDDIT_FETCH_WORKERS", "4"))
+        self.limiter = limiter_for("reddit")
+        self._executor = ThreadPoolExecutor(max_workers=self.fetch_workers, thread_name_prefix="reddit")
+        self._local = threading.local()
         self.use_praw = False
-        if self.client_id and self.client_secret and "your_" not in self.client_id:
+        # PRAW bypasses the shared HTTP client, so replay runs always use the JSON API
+        if self.client_id and self.client_secret and "your_" not in self.client_id and not replay_url():
             print("✅ Logged in to Reddit API (Authenticated)")
             self.reddit = praw.Reddit(
                 client_id=self.client_id,
@@ -23,125 +58,74 @@ class RedditClient:
         else:
             print("⚠️ access keys missing or default. Switching to Public JSON API (Read-Only).")
 
+    @traced("reddit.select")
     def get_viral_thread(self, subreddit_name: str = "AskReddit", limit: int = 10, ignore_ids: List[str] = []) -> Optional[Dict]:
         """
         Fetches a hot thread. Uses PRAW if available, else requests the JSON URL.
         """
         if self.use_praw:
-            return self._get_viral_thread_praw(subreddit_name, limit, ignore_ids)
+            return self._get_viral_thread_praw(subreddit_name, limit, set(ignore_ids))
         else:
-            return self._get_viral_thread_json(subreddit_name, limit, ignore_ids)
+            return self._get_viral_thread_json(subreddit_name, limit, set(ignore_ids))
 
-    def _get_viral_thread_json(self, subreddit_name: str, limit: int, ignore_ids: List[str]) -> Optional[Dict]:
-        import requests
+    def is_used(self, post_id: str, ignore_ids: Set[str]) -> bool:
+        """
+        True if the thread was excluded by the caller or is already in the content store.
+        """
+        if post_id in ignore_ids or self.store.is_post_used(post_id):
+            print(f"Skipping used thread: {post_id}")
+            return True
+        return False
+
+    def _get_viral_thread_json(self, subreddit_name: str, limit: int, ignore_ids: Set[str]) -> Optional[Dict]:
         import random
-        import time
         
         try:
             url = f"https://www.reddit.com/r/{subreddit_name}/hot.json?limit={limit}"
             headers = {"User-Agent": self.user_agent}
             
-            response = requests.get(url, headers=headers)
-            if response.status_code != 200:
-                print(f"Failed to fetch public JSON: {response.status_code}")
+            status, data = self.cache.get_json(url, headers=headers, ttl=self.cache.listing_ttl)
+            if status != 200:
+                print(f"Failed to fetch public JSON: {status}")
                 return None
                 
-            data = response.json()
             posts = data['data']['children']
             
             # Shuffle to get different results each run
             random.shuffle(posts)
             
-            for post in posts:
-                post_data = post['data']
-                if post_data.get('stickied') or post_data.get('is_video'):
-                    continue
-                
-                if post_data['id'] in ignore_ids:
-                    print(f"Skipping used thread: {post_data['id']}")
-                    continue
-                    
+            candidates = (
+                post['data'] for post in posts
+                if not post['data'].get('stickied') and not post['data'].get('is_video')
                 # Need comments - this only gives us the post. We need a specific call for comments.
                 # public URL for post: https://www.reddit.com{permalink}.json
-                if post_data['num_comments'] < 10:
-                    continue
-                    
-                print(f"Inspecting thread: {post_data['title'][:50]}...")
-                
-                # Fetch comments
-                try:
-                    permalink = post_data['permalink']
-                    comments_url = f"https://www.reddit.com{permalink}.json?sort=top"
-                    time.sleep(1) # Be polite to public API
-                    c_resp = requests.get(comments_url, headers=headers)
-                    if c_resp.status_code != 200: continue
-                    
-                    c_data = c_resp.json()
-                    # c_data is list: [0] is post object, [1] is comments listing
-                    comments_list = c_data[1]['data']['children']
-                    
-                    top_comments = []
-                    for comment in comments_list[:5]:
-                        c_body = comment['data'].get('body')
-                        if c_body and c_body != "[removed]" and len(c_body) < 300:
-                            top_comments.append(c_body)
-                    
-                    if not top_comments:
-                        continue
-                        
-                    return {
-                        "title": post_data['title'],
-                        "body": post_data.get('selftext', '')[:1000],
-                        "comments": top_comments,
-                        "url": post_data['url'],
-                        "id": post_data['id']
-                    }
-                    
-                except Exception as e:
-                    print(f"Error fetching comments for thread: {e}")
-                    continue
+                and not self.is_used(post['data']['id'], ignore_ids)
+                and post['data']['num_comments'] >= 10
+            )
+            found = self._inspect_concurrently(candidates, want=1)
+            if found:
+                return found[0]
                     
             return None
         except Exception as e:
             print(f"Error in JSON fallback: {e}")
             return None
 
-    def _get_viral_thread_praw(self, subreddit_name: str, limit: int, ignore_ids: List[str]) -> Optional[Dict]:
+    def _get_viral_thread_praw(self, subreddit_name: str, limit: int, ignore_ids: Set[str]) -> Optional[Dict]:
         try:
             subreddit = self.reddit.subreddit(subreddit_name)
             # Fetch hot posts
             threads = subreddit.hot(limit=limit)
              
-            for submission in threads:
-                if submission.stickied:
-                    continue
-
-                if submission.id in ignore_ids:
-                    print(f"Skipping used thread: {submission.id}")
-                    continue
-                 
-                if submission.num_comments < 10:
-                    continue
- 
-                # Load comments
-                submission.comments.replace_more(limit=0) # Remove "load more comments"
-                top_comments = []
-                 
-                for comment in submission.comments[:3]: # Top 3 comments
-                    if comment.body == "[removed]" or len(comment.body) > 300: 
-                        continue
-                    top_comments.append(comment.body)
-                 
-                if not top_comments:
-                    continue
-                
-                return {
-                    "title": submission.title,
-                    "body": submission.selftext if len(submission.selftext) < 500 else "",
-                    "comments": top_comments,
-                    "url": submission.url,
-                    "id": submission.id
-                }
+            candidates = (
+                submission for submission in threads
+                if not submission.stickied
+                and not self.is_used(submission.id, ignore_ids)
+                and submission.num_comments >= 10
+            )
+            found = self._inspect_concurrently(candidates, want=1)
+            if found:
+                return found[0]
                  
             return None
              
@@ -149,6 +133,260 @@ class RedditClient:
             print(f"Error fetching from Reddit (PRAW): {e}")
             return None
 
+    def _top_comments_json(self, post_data: Dict, headers: Dict) -> List[str]:
+        # Fetch comments
+        try:
+            permalink = post_data['permalink']
+            comments_url = f"https://www.reddit.com{permalink}.json?sort=top"
+            status, c_data = self.cache.get_json(comments_url, headers=headers, ttl=self.cache.comments_ttl)
+            if status != 200: return []
+            
+            # c_data is list: [0] is post object, [1] is comments listing
+            comments_list = c_data[1]['data']['children']
+            
+            top_comments = []
+            for comment in comments_list[:5]:
+                c_body = comment['data'].get('body')
+                if c_body and c_body != "[removed]" and len(c_body) < 300:
+                    top_comments.append(c_body)
+            return top_comments
+            
+        except Exception as e:
+            print(f"Error fetching comments for thread: {e}")
+            return []
+
+    def _thread_from_json(self, post_data: Dict, top_comments: List[str]) -> Dict:
+        return {
+            "title": post_data['title'],
+            "body": post_data.get('selftext', '')[:1000],
+            "comments": top_comments,
+            "url": post_data['url'],
+            "id": post_data['id'],
+            "subreddit": post_data.get('subreddit')
+        }
+
+    def _top_comments_praw(self, submission) -> List[str]:
+        # Load comments
+        submission.comments.replace_more(limit=0) # Remove "load more comments"
+        top_comments = []
+         
+        for comment in submission.comments[:3]: # Top 3 comments
+            if comment.body == "[removed]" or len(comment.body) > 300: 
+                continue
+            top_comments.append(comment.body)
+        return top_comments
+
+    def _thread_from_praw(self, submission, top_comments: List[str]) -> Dict:
+        return {
+            "title": submission.title,
+            "body": submission.selftext if len(submission.selftext) < 500 else "",
+            "comments": top_comments,
+            "url": submission.url,
+            "id": submission.id,
+            "subreddit": submission.subreddit.display_name
+        }
+
+    def _praw_local(self):
+        """
+        PRAW instances are not thread-safe: each fetch worker gets its own.
+        """
+        reddit = getattr(self._local, "reddit", None)
+        if reddit is None:
+            reddit = praw.Reddit(
+                client_id=self.client_id,
+                client_secret=self.client_secret,
+                user_agent=self.user_agent
+            )
+            self._local.reddit = reddit
+        return reddit
+
+    @traced("reddit.comments")
+    def _inspect(self, candidate: Any) -> Optional[Dict]:
+        """
+        Fetches one candidate's comment tree (JSON post data or PRAW submission).
+        Returns the thread dict, or None if it has no usable comments. Runs on a worker thread.
+        """
+        if self.use_praw:
+            print(f"Inspecting thread: {candidate.title[:50]}...")
+            # PRAW bypasses our HTTP client, so it reports to the limiter itself
+            self.limiter.acquire()
+            started = time.perf_counter()
+            submission = self._praw_local().submission(id=candidate.id)
+            try:
+                top_comments = self._top_comments_praw(submission)
+            except Exception:
+                self.limiter.record(None, time.perf_counter() - started)
+                raise
+            self.limiter.record(200, time.perf_counter() - started)
+            return self._thread_from_praw(candidate, top_comments) if top_comments else None
+
+        print(f"Inspecting thread: {candidate['title'][:50]}...")
+        headers = {"User-Agent": self.user_agent}
+        top_comments = self._top_comments_json(candidate, headers)
+        return self._thread_from_json(candidate, top_comments) if top_comments else None
+
+    def _inspect_concurrently(self, candidates: Iterable, want: int,
+                              leftover: Optional[Callable[[Any, Optional[Dict]], None]] = None) -> List[Dict]:
+        """
+        Inspects candidates fetch_workers at a time, in order, and returns as soon as `want`
+        threads passed. Candidates are pulled lazily, so nothing past the stopping point is
+        requested. The others already pulled are handed to leftover(candidate, thread):
+        queued inspections are cancelled (thread None), in-flight ones report when they
+        finish, and extra passing threads arrive with their thread. Without leftover they are dropped.
+        """
+        candidates = iter(candidates)
+        found: List[Dict] = []
+        pending: Dict[Any, Any] = {}  # future -> candidate, in submission order
+
+        def submit_next() -> bool:
+            for candidate in candidates:
+                pending[submit(self._executor, self._inspect, candidate)] = candidate
+                return True
+            return False
+
+        def hand_back(candidate, future):
+            thread = None
+            if not future.cancelled():
+                try:
+                    thread = future.result()
+                except Exception as e:
+                    print(f"Error fetching comments for thread: {e}")
+                    return
+                if not thread:
+                    return  # Inspected: no usable comments
+            leftover(candidate, thread)
+
+        for _ in range(self.fetch_workers):
+            if not submit_next():
+                break
+
+        while pending and len(found) < want:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                candidate = pending.pop(future)
+                try:
+                    thread = future.result()
+                except Exception as e:
+                    print(f"Error fetching comments for thread: {e}")
+                    thread = None
+                if thread and len(found) < want:
+                    found.append(thread)
+                elif thread and leftover is not None:
+                    leftover(candidate, thread)
+                elif not thread and len(found) < want:
+                    submit_next()
+
+        # Latest submitted first, so pushing back onto a pop()-from-the-end pool keeps the order
+        for future, candidate in reversed(list(pending.items())):
+            future.cancel()
+            if leftover is not None:
+                future.add_done_callback(functools.partial(hand_back, candidate))
+        return found
+
+    # --- Combined candidate pool ---
+
+    @traced("reddit.select")
+    def get_pooled_thread(self, subreddits: List[str], ignore_ids: List[str] = []) -> Optional[Dict]:
+        """
+        Like get_viral_thread, but draws from a pool of candidates listed across all
+        subreddits in one multireddit request (r/A+B+C/hot). The pool is refilled only
+        when it runs low, and candidates' comment trees are fetched concurrently.
+        """
+        ignore_ids = set(ignore_ids)
+        key = "+".join(sorted(subreddits))
+        if key != self._pool_key:
+            # Different subreddit set: start over
+            self._pool_key, self._pool, self._pool_after, self._pool_seen = key, [], None, set()
+            self._ready = []
+
+        # Threads already inspected by a previous call come first
+        while True:
+            with self._pool_lock:
+                if not self._ready:
+                    break
+                thread = self._ready.pop(0)
+            if not self.is_used(thread['id'], ignore_ids):
+                return thread
+
+        if len(self._pool) < self.pool_low:
+            self._refill_pool(key)
+
+        def candidates():
+            while True:
+                with self._pool_lock:
+                    if not self._pool:
+                        return
+                    candidate = self._pool.pop()
+                post_id = candidate.id if self.use_praw else candidate['id']
+                # Re-checked at pop time: another process may have produced it meanwhile
+                if not self.is_used(post_id, ignore_ids):
+                    yield candidate
+
+        # Return on the first passing thread. Other passing threads (up to pool_keep - 1,
+        # late ones included) wait in _ready; every other pulled candidate goes back on top.
+        pool, ready = self._pool, self._ready
+
+        def leftover(candidate, thread):
+            with self._pool_lock:
+                if thread and len(ready) < self.pool_keep - 1:
+                    ready.append(thread)
+                else:
+                    pool.append(candidate)
+
+        found = self._inspect_concurrently(candidates(), want=1, leftover=leftover)
+        return found[0] if found else None
+
+    @traced("reddit.listing")
+    def _refill_pool(self, key: str):
+        """
+        Appends the next page of the combined hot listing to the pool, keeping only
+        threads that pass the cheap filters and have not been pooled before.
+        """
+        import random
+
+        print(f"🔍 Refilling candidate pool from r/{key} ({len(self._pool)} left)...")
+        try:
+            if self.use_praw:
+                params = {"after": self._pool_after} if self._pool_after else {}
+                listing = list(self.reddit.subreddit(key).hot(limit=self.pool_size, params=params))
+                fresh = [s for s in listing
+                         if not s.stickied and s.num_comments >= 10 and s.id not in self._pool_seen]
+                ids = [s.id for s in listing]
+                after = listing[-1].fullname if listing else None
+            else:
+                url = f"https://www.reddit.com/r/{key}/hot.json?limit={self.pool_size}"
+                if self._pool_after:
+                    url += f"&after={self._pool_after}"
+                headers = {"User-Agent": self.user_agent}
+                status, data = self.cache.get_json(url, headers=headers, ttl=self.cache.listing_ttl)
+                if status != 200:
+                    print(f"Failed to fetch public JSON: {status}")
+                    return
+                listing = [p['data'] for p in data['data']['children']]
+                fresh = [p for p in listing
+                         if not p.get('stickied') and not p.get('is_video')
+                         and p['num_comments'] >= 10 and p['id'] not in self._pool_seen]
+                ids = [p['id'] for p in listing]
+                after = data['data'].get('after')
+        except Exception as e:
+            print(f"Error refilling candidate pool: {e}")
+            return
+
+        random.shuffle(fresh)
+        with self._pool_lock:
+            self._pool_seen.update(ids)
+            self._pool_after = after
+            if after is None:
+                # Past the last page: start over from the top next time. Forget what was listed
+                # (except threads still waiting here) so the hot list's survivors can return;
+                # produced/claimed threads are still skipped via the content store.
+                waiting = [c.id if self.use_praw else c['id'] for c in self._pool + fresh]
+                self._pool_seen = set(waiting)
+            # New candidates go underneath the ones already waiting
+            self._pool[:0] = fresh
+        self.pool_refills += 1
+        print(f"   ... {len(fresh)} new candidates ({len(self._pool)} pooled)")
+
 # Test
 if __name__ == "__main__":
     client = RedditClient()
@@ -0,0 +1,174 @@
+import hashlib
+import os
+import random
+import re
+import threading
+from typing import Dict, FrozenSet, List, Optional, Set
+
+import numpy as np
+
+# Clickbait filler that says nothing about the subject ("The X Explained", "Why X is REAL")
+STOPWORDS = frozenset("""
+a an and are as at be but by can could did do does for from has have how i if in into is it its
+just me my no not of on or our really so than that the their them there these they this those to
+too us was we were what when where which who why will with would you your
+explained explain truth about secret secrets shocking insane crazy actually real revealed
+""".split())
+
+# Mersenne prime for the universal hash family; keeps a * x + b inside uint64
+_PRIME = (1 << 31) - 1
+
+# Two topics are near-duplicates when this share of the smaller one's shingles appears in the other...
+DUP_CONTAINMENT = float(os.getenv("TOPIC_DUP_CONTAINMENT", "0.8"))
+# ...and they overlap at least this much overall (so "Mars" doesn't swallow every Mars topic)
+DUP_MIN_JACCARD = float(os.getenv("TOPIC_DUP_MIN_JACCARD", "0.25"))
+
+
+def normalize(topic: str) -> List[str]:
+    """
+    Lowercase subject words: punctuation and filler words removed ("Roko's" -> "rokos").
+    """
+    words = re.findall(r"[a-z0-9]+", topic.lower().replace("'", "").replace("_", " "))
+    return [w for w in words if w not in STOPWORDS]
+
+
+def shingles(topic: str, k: int = 4) -> FrozenSet[str]:
+    """
+    Character k-grams of each subject word (padded, so short words still count once).
+    Word-level grams tolerate plurals and small rewordings ("Theory" / "Theories").
+    """
+    out: Set[str] = set()
+    for word in normalize(topic):
+        padded = f" {word} "
+        if len(padded) <= k:
+            out.add(padded)
+        else:
+            out.update(padded[i:i + k] for i in range(len(padded) - k + 1))
+    return frozenset(out)
+
+
+class TopicIndex:
+    """
+    Near-duplicate index over topic titles: MinHash signatures of each topic's shingles,
+    bucketed by LSH bands so a lookup only compares against topics that share a band,
+    then confirmed on the exact shingle sets (titles are tiny, so that check is cheap).
+    Containment rather than plain Jaccard decides, because a rewording usually adds words:
+    "Dead Internet Theory" vs "The Dead Internet Theory Explained" are the same video.
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 64, seed: int = 1,
+                 containment: Optional[float] = None, min_jaccard: Optional[float] = None):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.containment = DUP_CONTAINMENT if containment is None else containment
+        self.min_jaccard = DUP_MIN_JACCARD if min_jaccard is None else min_jaccard
+        rng = random.Random(seed)
+        self._a = np.array([rng.randrange(1, _PRIME) for _ in range(num_perm)], dtype=np.uint64)
+        self._b = np.array([rng.randrange(0, _PRIME) for _ in range(num_perm)], dtype=np.uint64)
+        self._buckets: List[Dict[bytes, List[str]]] = [{} for _ in range(bands)]
+        self._shingles: Dict[str, FrozenSet[str]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._shingles)
+
+    def __contains__(self, topic: str) -> bool:
+        return topic in self._shingles
+
+    def signature(self, shingle_set: FrozenSet[str]) -> np.ndarray:
+        # Stable across processes (unlike hash()), so bands mean the same thing every run
+        values = np.array([int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+                           % _PRIME for s in shingle_set], dtype=np.uint64)
+        if not len(values):
+            return np.full(self.num_perm, _PRIME, dtype=np.uint64)
+        return ((np.outer(values, self._a) + self._b) % _PRIME).min(axis=0)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def _is_near(self, a: FrozenSet[str], b: FrozenSet[str]) -> bool:
+        if not a or not b:
+            return a == b
+        common = len(a & b)
+        return (common / min(len(a), len(b)) >= self.containment
+                and common / len(a | b) >= self.min_jaccard)
+
+    def _find(self, topic: str, topic_shingles: FrozenSet[str], keys: List[bytes]) -> Optional[str]:
+        if topic in self._shingles:
+            return topic
+        seen: Set[str] = set()
+        for band, key in enumerate(keys):
+            for other in self._buckets[band].get(key, ()):
+                if other in seen:
+                    continue
+                seen.add(other)
+                if self._is_near(topic_shingles, self._shingles[other]):
+                    return other
+        return None
+
+    def find_duplicate(self, topic: str) -> Optional[str]:
+        """
+        The indexed topic this one duplicates (itself if it is already indexed), or None.
+        """
+        topic_shingles = shingles(topic)
+        keys = self._band_keys(self.signature(topic_shingles))
+        with self._lock:
+            return self._find(topic, topic_shingles, keys)
+
+    def _insert(self, topic: str, topic_shingles: FrozenSet[str], keys: List[bytes]):
+        self._shingles[topic] = topic_shingles
+        for band, key in enumerate(keys):
+            self._buckets[band].setdefault(key, []).append(topic)
+
+    def add(self, topic: str):
+        topic_shingles = shingles(topic)
+        keys = self._band_keys(self.signature(topic_shingles))
+        with self._lock:
+            if topic not in self._shingles:
+                self._insert(topic, topic_shingles, keys)
+
+    def add_if_new(self, topic: str) -> Optional[str]:
+        """
+        Indexes topic unless it duplicates one already indexed. Returns that topic, or None if added.
+        Check and insert happen under one lock, so concurrent callers can't both add a pair.
+        """
+        topic_shingles = shingles(topic)
+        keys = self._band_keys(self.signature(topic_shingles))
+        with self._lock:
+            duplicate = self._find(topic, topic_shingles, keys)
+            if duplicate is None:
+                self._insert(topic, topic_shingles, keys)
+            return duplicate
+
+
+def produced_topics(output_dir: str = "output") -> List[str]:
+    """
+    Topics of finished videos on disk (output/<safe_topic>/final_<safe_topic>.mp4), including
+    ones rendered before the content store existed. Names are lossy (underscored), which the
+    shingle normalization ignores.
+    """
+    topics = []
+    try:
+        names = sorted(os.listdir(output_dir))
+    except OSError:
+        return topics
+    for name in names:
+        if os.path.exists(os.path.join(output_dir, name, f"final_{name}.mp4")):
+            topics.append(name.replace("_", " "))
+    return topics
+
+
+def load_topic_index(store=None, output_dir: str = "output") -> TopicIndex:
+    """
+    Index of everything the farm has produced or queued: content store topics plus finished outputs.
+    """
+    index = TopicIndex()
+    if store is not None:
+        for topic in store.topics():
+            index.add(topic)
+    for topic in produced_topics(output_dir):
+        index.add(topic)
+    return index
@@ -0,0 +1,266 @@
+import atexit
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+# Innermost open span of the current thread / asyncio task
+_CURRENT: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+# Thread whose profiler covers the enclosing spans (pool threads copying the context run their own)
+_PROFILING: contextvars.ContextVar = contextvars.ContextVar("profiling", default=None)
+# Children finishing in pool threads roll up into the same parent
+_ROLLUP_LOCK = threading.Lock()
+
+
+class Span:
+    """
+    One timed stage: wall and CPU time, bytes transferred and retries (the HTTP client
+    attributes its traffic to the innermost open span; children roll up into parents).
+    """
+
+    __slots__ = ("name", "attrs", "parent", "start", "wall", "cpu", "bytes", "retries", "tid", "_cpu_start")
+
+    def __init__(self, name: str, attrs: Dict, parent: Optional["Span"]):
+        self.name = name
+        self.attrs = attrs
+        self.parent = parent
+        self.start = time.perf_counter()
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.bytes = 0
+        self.retries = 0
+        self.tid = threading.get_ident()
+        self._cpu_start = time.thread_time()
+
+    def add_bytes(self, n: int):
+        with _ROLLUP_LOCK:
+            self.bytes += n
+
+    def add_retry(self, n: int = 1):
+        with _ROLLUP_LOCK:
+            self.retries += n
+
+    def add_time(self, key: str, seconds: float):
+        """
+        Accumulates time spent in a sub-step too fine-grained for its own spans (e.g. per frame).
+        """
+        self.attrs[key] = self.attrs.get(key, 0.0) + seconds
+
+    def _finish(self):
+        self.wall = time.perf_counter() - self.start
+        self.cpu = time.thread_time() - self._cpu_start
+        if self.parent is not None:
+            with _ROLLUP_LOCK:
+                self.parent.bytes += self.bytes
+                self.parent.retries += self.retries
+
+
+class Tracer:
+    """
+    Collects finished spans for this process. Exports Chrome trace-event JSON
+    (open in chrome://tracing or https://ui.perfetto.dev) and per-stage summaries.
+    With profile_dir set, the outermost span in each thread also runs under a sampling
+    profiler (pyinstrument, else cProfile) and dumps one flamegraph per stage.
+    With from_env, PROFILE_DIR / TRACE_DIR are read at the first span (after load_dotenv()).
+    """
+
+    def __init__(self, profile_dir: Optional[str] = None, from_env: bool = False):
+        self.spans: List[Span] = []
+        self.epoch = time.perf_counter()
+        self.profile_dir = profile_dir
+        self.trace_dir: Optional[str] = None
+        self._lock = threading.Lock()
+        self._profiles = 0
+        self._env_pending = from_env
+
+    def load_env(self):
+        """
+        Applies PROFILE_DIR and TRACE_DIR (export at exit to TRACE_DIR/trace-<pid>.json).
+        """
+        self._env_pending = False
+        self.profile_dir = os.getenv("PROFILE_DIR") or self.profile_dir
+        trace_dir = os.getenv("TRACE_DIR")
+        with self._lock:
+            if not trace_dir or self.trace_dir:
+                return
+            self.trace_dir = trace_dir
+        atexit.register(self._export_at_exit)
+
+    def _export_at_exit(self):
+        if self.spans:
+            path = os.path.join(self.trace_dir, f"trace-{os.getpid()}.json")
+            self.export_chrome(path)
+            print(f"🧭 Trace written: {path}")
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        if self._env_pending:
+            self.load_env()
+        parent = _CURRENT.get()
+        span = Span(name, attrs, parent)
+        token = _CURRENT.set(span)
+        thread = threading.get_ident()
+        profiler = self._start_profiler() if self.profile_dir and _PROFILING.get() != thread else None
+        profiling_token = _PROFILING.set(thread) if profiler else None
+        try:
+            yield span
+        except BaseException as e:
+            span.attrs["error"] = repr(e)[:200]
+            raise
+        finally:
+            if profiler:
+                self._stop_profiler(profiler, name)
+                _PROFILING.reset(profiling_token)
+            _CURRENT.reset(token)
+            span._finish()
+            with self._lock:
+                self.spans.append(span)
+
+    def traced(self, name: Optional[str] = None):
+        """
+        Decorator form of span() for functions and coroutines.
+        """
+        def decorate(fn):
+            span_name = name or fn.__qualname__
+            if _is_coroutine(fn):
+                @functools.wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    with self.span(span_name):
+                        return await fn(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    # --- Profiling ---
+
+    def _start_profiler(self):
+        try:
+            from pyinstrument import Profiler
+            profiler = Profiler(interval=0.001, async_mode="disabled")
+        except ImportError:
+            # Deterministic fallback: cProfile output loads into snakeviz / flameprof
+            import cProfile
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                return None  # Another profiler is already active (3.12+: process-wide)
+            return profiler
+        try:
+            profiler.start()
+        except RuntimeError:
+            return None  # Another profiler is already active in this thread
+        return profiler
+
+    def _stop_profiler(self, profiler, name: str):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        with self._lock:
+            self._profiles += 1
+            stem = os.path.join(self.profile_dir, f"{name}-{os.getpid()}-{self._profiles}")
+        if hasattr(profiler, "output_html"):
+            profiler.stop()
+            with open(f"{stem}.html", "w", encoding="utf-8") as f:
+                f.write(profiler.output_html())
+        else:
+            profiler.disable()
+            profiler.dump_stats(f"{stem}.prof")
+
+    # --- Export ---
+
+    def chrome_events(self) -> List[Dict]:
+        pid = os.getpid()
+        with self._lock:
+            spans = list(self.spans)
+        events = []
+        for span in spans:
+            args = dict(span.attrs, cpu_ms=round(span.cpu * 1000, 2), bytes=span.bytes, retries=span.retries)
+            events.append({
+                "name": span.name,
+                "cat": span.name.split(".", 1)[0],
+                "ph": "X",
+                "ts": round((span.start - self.epoch) * 1e6),
+                "dur": round(span.wall * 1e6),
+                "pid": pid,
+                "tid": span.tid,
+                "args": {k: v if isinstance(v, (int, float, str, bool)) or v is None else str(v)
+                         for k, v in args.items()},
+            })
+        return events
+
+    def export_chrome(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.chrome_events(), "displayTimeUnit": "ms"}, f)
+        os.replace(tmp_path, path)
+
+    def summary(self) -> Dict[str, Dict]:
+        """
+        Per span name: count, total wall/CPU seconds, bytes and retries.
+        """
+        out: Dict[str, Dict] = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            s = out.setdefault(span.name, {"count": 0, "wall": 0.0, "cpu": 0.0, "bytes": 0, "retries": 0})
+            s["count"] += 1
+            s["wall"] += span.wall
+            s["cpu"] += span.cpu
+            s["bytes"] += span.bytes
+            s["retries"] += span.retries
+        return out
+
+    def print_summary(self):
+        rows = sorted(self.summary().items(), key=lambda item: -item[1]["wall"])
+        if not rows:
+            return
+        print("\n⏱️ Stage timings (wall / CPU / bytes / retries):")
+        for name, s in rows:
+            print(f"   {name:<24} x{s['count']:<4} {s['wall']:8.2f}s {s['cpu']:8.2f}s "
+                  f"{s['bytes'] / 1024:10.1f} KiB {s['retries']:4d}")
+
+
+def _is_coroutine(fn) -> bool:
+    import inspect
+    return inspect.iscoroutinefunction(fn)
+
+
+def current_span() -> Optional[Span]:
+    return _CURRENT.get()
+
+
+TRACER = Tracer(from_env=True)
+span = TRACER.span
+traced = TRACER.traced
+
+
+def enable(trace_dir: Optional[str] = None, profile_dir: Optional[str] = None):
+    """
+    Turns on export at exit (trace_dir/trace-<pid>.json, one file per process) and/or
+    per-stage profiling; with no arguments, applies TRACE_DIR / PROFILE_DIR (call after
+    load_dotenv()). Arguments are exported as those env vars so worker processes follow.
+    """
+    if profile_dir:
+        os.environ["PROFILE_DIR"] = profile_dir
+    if trace_dir:
+        os.environ["TRACE_DIR"] = trace_dir
+    TRACER.load_env()
+
+
+def submit(executor, fn, *args, **kwargs):
+    """
+    executor.submit() that runs fn in a copy of the caller's context, so spans opened in
+    the pool thread nest under (and roll bytes/retries up into) the caller's open span.
+    """
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
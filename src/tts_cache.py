@@ -0,0 +1,131 @@
+import atexit
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from disk_cache import DiskCache
+
+# Bump when the cached payload format or synthesis parameters change meaning
+CACHE_FORMAT_VERSION = 1
+
+
+def engine_version() -> str:
+    try:
+        from edge_tts.version import __version__
+    except ImportError:
+        __version__ = "unknown"
+    return f"edge-tts/{__version__}/fmt{CACHE_FORMAT_VERSION}"
+
+
+class TTSCache(DiskCache):
+    """
+    Content-addressed on-disk cache of synthesized speech.
+    Entries are keyed by sha256(text, voice, rate, engine version) and stored as
+    <key>.mp3 plus <key>.json (duration + word timings), both written atomically.
+    Total size is capped; least recently used entries (by file mtime) are evicted.
+    Hits skip the network entirely.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        cache_dir = cache_dir or os.getenv("TTS_CACHE_DIR") or os.path.join("cache", "tts")
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv("TTS_CACHE_MB", "500")) * 1024 ** 2)
+        super().__init__(cache_dir, max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self.miss_seconds = 0.0  # Wall time spent synthesizing on misses
+
+    def key(self, text: str, voice: str, rate: str) -> str:
+        payload = json.dumps([text, voice, rate, engine_version()], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        return (os.path.join(self.cache_dir, f"{key}.mp3"),
+                os.path.join(self.cache_dir, f"{key}.json"))
+
+    def get(self, key: str) -> Optional[Tuple[bytes, float, List[Tuple[str, float, float]]]]:
+        """
+        Returns (audio, duration, words) or None. Counts the lookup as a hit or miss.
+        """
+        if not self.enabled:
+            return None
+        audio_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(audio_path, "rb") as f:
+                audio = f.read()
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        # Touch both files: LRU order is mtime
+        self._touch(audio_path, meta_path)
+        with self._lock:
+            self.hits += 1
+        return audio, meta["duration"], [tuple(w) for w in meta["words"]]
+
+    def put(self, key: str, audio: bytes, duration: float, words: List[Tuple[str, float, float]],
+            synth_seconds: float = 0.0):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.miss_seconds += synth_seconds
+        audio_path, meta_path = self._paths(key)
+        # Audio first, metadata last: a reader only trusts an entry once its .json exists
+        self._atomic_write(audio_path, audio)
+        meta = {"duration": duration, "words": [list(w) for w in words], "engine": engine_version()}
+        self._atomic_write(meta_path, json.dumps(meta).encode("utf-8"))
+        self.evict()
+
+    def stats(self) -> Dict:
+        """
+        Counters for this process. saved_seconds estimates synthesis time avoided by hits.
+        """
+        with self._lock:
+            avg_miss = self.miss_seconds / self.misses if self.misses else 0.0
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / (self.hits + self.misses) if (self.hits + self.misses) else 0.0,
+                "saved_seconds": round(self.hits * avg_miss, 2),
+            }
+
+    def save_stats(self):
+        """
+        Adds this process's counters to <cache_dir>/stats.json so a whole farm run can be summed up.
+        """
+        if not self.enabled or not (self.hits or self.misses):
+            return
+        stats_path = os.path.join(self.cache_dir, "stats.json")
+        with self._lock:
+            try:
+                with open(stats_path, "r", encoding="utf-8") as f:
+                    totals = json.load(f)
+            except (OSError, ValueError):
+                totals = {"hits": 0, "misses": 0, "miss_seconds": 0.0}
+            totals["hits"] += self.hits
+            totals["misses"] += self.misses
+            totals["miss_seconds"] += self.miss_seconds
+            self.hits = self.misses = 0
+            self.miss_seconds = 0.0
+            self._atomic_write(stats_path, json.dumps(totals).encode("utf-8"))
+
+
+_DEFAULT_CACHE: Optional[TTSCache] = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def default_cache() -> TTSCache:
+    """
+    Process-wide cache shared by TTSEngine and MediaGen. Counters are flushed to stats.json at exit.
+    """
+    global _DEFAULT_CACHE
+    with _DEFAULT_LOCK:
+        if _DEFAULT_CACHE is None:
+            _DEFAULT_CACHE = TTSCache()
+            atexit.register(_DEFAULT_CACHE.save_stats)
+        return _DEFAULT_CACHE
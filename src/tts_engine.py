@@ -1,22 +1,214 @@
 import asyncio
+import base64
 import edge_tts
 import os
+import time
+from typing import List, NamedTuple, Optional, Tuple
+from tts_cache import default_cache
+from rate_limiter import limiter_for
+from http_client import get_client
+from http_replay import TTS_PATH, default_cassettes, recording_enabled, replay_url
+from tracing import current_span, span, traced
+
+# edge-tts reports offsets/durations in 100-nanosecond ticks
+TICKS_PER_SECOND = 10_000_000
+
+class WordTiming(NamedTuple):
+    text: str
+    start: float     # Seconds from the start of the clip
+    duration: float
+
+class TTSResult(NamedTuple):
+    audio: bytes
+    duration: float
+    words: List[WordTiming]
+    path: Optional[str] = None
+
+def mp3_duration(data: bytes) -> float:
+    """
+    Exact duration of an MP3 byte string by walking its frame headers (no decoder needed).
+    """
+    bitrates = {
+        1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],  # MPEG-1 Layer III
+        2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],      # MPEG-2/2.5 Layer III
+    }
+    sample_rates = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+    pos = 0
+    # Skip an ID3v2 tag if present
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        pos = 10 + size
+
+    seconds = 0.0
+    n = len(data)
+    while pos + 4 <= n:
+        if data[pos] != 0xFF or (data[pos + 1] & 0xE0) != 0xE0:
+            pos += 1
+            continue
+        version_bits = (data[pos + 1] >> 3) & 0x3
+        layer_bits = (data[pos + 1] >> 1) & 0x3
+        bitrate_idx = (data[pos + 2] >> 4) & 0xF
+        rate_idx = (data[pos + 2] >> 2) & 0x3
+        padding = (data[pos + 2] >> 1) & 0x1
+        if version_bits == 1 or layer_bits != 1 or bitrate_idx in (0, 15) or rate_idx == 3:
+            pos += 1
+            continue
+        mpeg1 = version_bits == 3
+        bitrate = bitrates[1 if mpeg1 else 2][bitrate_idx] * 1000
+        sample_rate = sample_rates[version_bits][rate_idx]
+        samples = 1152 if mpeg1 else 576
+        frame_len = (samples // 8) * bitrate // sample_rate + padding
+        if frame_len <= 0:
+            pos += 1
+            continue
+        # A leading Xing/Info frame is metadata, not audio
+        if seconds or data.find(b"Xing", pos, pos + 64) == -1 and data.find(b"Info", pos, pos + 64) == -1:
+            seconds += samples / sample_rate
+        pos += frame_len
+    return seconds
+
+async def synthesize(text: str, voice: str, rate: str = "+0%", use_cache: bool = True) -> TTSResult:
+    """
+    Streams edge-tts straight into memory, collecting audio chunks and WordBoundary events
+    from the same stream. Returns audio bytes, duration and per-word offsets in one pass.
+    Identical (text, voice, rate) requests are served from the on-disk TTS cache.
+    """
+    cache = default_cache() if use_cache else None
+    if cache:
+        key = cache.key(text, voice, rate)
+        cached = cache.get(key)
+        if cached:
+            audio, duration, words = cached
+            return TTSResult(audio, duration, [WordTiming(*w) for w in words])
+
+    # Cache misses are paced by the adaptive edge-tts limiter
+    limiter = limiter_for("edge_tts")
+    await limiter.acquire_async()
+    started = time.perf_counter()
+    replay = replay_url()
+
+    chunks = []
+    words = []
+    with span("tts.synthesize", chars=len(text)) as s:
+        try:
+            if replay:
+                # Offline: the stand-in server answers with a recorded synthesis
+                audio, words = await asyncio.to_thread(_replay_synthesis, replay, text, voice, rate)
+                chunks.append(audio)
+                s.add_bytes(len(audio))
+            else:
+                async for chunk in _stream(text, voice, rate):
+                    if chunk["type"] == "audio":
+                        chunks.append(chunk["data"])
+                        s.add_bytes(len(chunk["data"]))
+                    elif chunk["type"] == "WordBoundary":
+                        words.append(WordTiming(
+                            chunk["text"],
+                            chunk["offset"] / TICKS_PER_SECOND,
+                            chunk["duration"] / TICKS_PER_SECOND,
+                        ))
+        except Exception:
+            limiter.record(None, time.perf_counter() - started)
+            raise
+
+    audio = b"".join(chunks)
+    if not audio:
+        limiter.record(None, time.perf_counter() - started)
+        raise RuntimeError("TTS returned no audio")
+    limiter.record(200, time.perf_counter() - started)
+    result = TTSResult(audio, mp3_duration(audio), words)
+    if cache:
+        cache.put(key, result.audio, result.duration, result.words, time.perf_counter() - started)
+    if recording_enabled() and not replay:
+        default_cassettes().record_tts(text, voice, rate, result.audio, result.words, time.perf_counter() - started)
+    return result
+
+def _stream(text: str, voice: str, rate: str):
+    try:
+        communicate = edge_tts.Communicate(text, voice, rate=rate, boundary="WordBoundary")
+    except TypeError:
+        # edge-tts < 7 has no boundary option and always emits WordBoundary events
+        communicate = edge_tts.Communicate(text, voice, rate=rate)
+    return communicate.stream()
+
+def _replay_synthesis(base_url: str, text: str, voice: str, rate: str) -> Tuple[bytes, List[WordTiming]]:
+    """
+    Fetches a recorded synthesis from the stand-in server (see http_replay.py).
+    """
+    response = get_client().post(f"{base_url}{TTS_PATH}", json={"text": text, "voice": voice, "rate": rate},
+                                 retries=0)
+    if response.status_code != 200:
+        raise RuntimeError(f"TTS stand-in returned {response.status_code}")
+    data = response.json()
+    return base64.b64decode(data["audio"]), [WordTiming(*w) for w in data["words"]]
 
 class TTSEngine:
-    def __init__(self, output_dir="temp_audio"):
+    def __init__(self, output_dir="temp_audio", concurrency: Optional[int] = None, retries: int = 3):
         self.output_dir = output_dir
         os.makedirs(self.output_dir, exist_ok=True)
         # Voices: en-US-ChristopherNeural (Male), en-US-AriaNeural (Female), etc.
-        self.voice = "en-US-ChristopherNeural" 
+        self.voice = "en-US-ChristopherNeural"
+        self.rate = "+0%"
+        # Max simultaneous syntheses in generate_many
+        self.concurrency = max(1, int(concurrency or os.getenv("TTS_CONCURRENCY") or 4))
+        self.retries = retries
+
+    async def synthesize(self, text: str, filename: Optional[str] = None) -> TTSResult:
+        """
+        Synthesizes text in memory. If filename is given the audio is also written there
+        (one write, no re-read) and the result carries its absolute path.
+        """
+        result = await synthesize(text, self.voice, self.rate)
+        if filename:
+            output_path = os.path.abspath(os.path.join(self.output_dir, filename))
+            with open(output_path, "wb") as f:
+                f.write(result.audio)
+            result = result._replace(path=output_path)
+        return result
 
     async def generate_audio(self, text: str, filename: str) -> str:
         """
         Generates audio file from text. Returns absolute path.
         """
-        output_path = os.path.join(self.output_dir, filename)
-        communicate = edge_tts.Communicate(text, self.voice)
-        await communicate.save(output_path)
-        return os.path.abspath(output_path)
+        result = await self.synthesize(text, filename)
+        return result.path
+
+    def run_synthesize(self, text: str, filename: Optional[str] = None) -> TTSResult:
+        """
+        Synchronous wrapper for synthesize.
+        """
+        return asyncio.run(self.synthesize(text, filename))
+
+    async def generate_many_async(self, items: List[Tuple[str, Optional[str]]]) -> List[TTSResult]:
+        """
+        Synthesizes many (text, filename) pairs concurrently in the current event loop,
+        at most self.concurrency at a time, retrying each item independently.
+        Results come back in input order.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run_one(text: str, filename: Optional[str]) -> TTSResult:
+            async with semaphore:
+                for attempt in range(self.retries):
+                    try:
+                        return await self.synthesize(text, filename)
+                    except Exception as e:
+                        if attempt == self.retries - 1:
+                            raise
+                        # The edge-tts limiter has already slowed down; the retry waits for its next token
+                        if current_span():
+                            current_span().add_retry()
+                        print(f"TTS Error (Attempt {attempt+1}) for '{text[:30]}': {e}")
+
+        return await asyncio.gather(*(run_one(text, filename) for text, filename in items))
+
+    @traced("tts.batch")
+    def generate_many(self, items: List[Tuple[str, Optional[str]]]) -> List[TTSResult]:
+        """
+        Synchronous wrapper for generate_many_async: one event loop for the whole batch.
+        """
+        return asyncio.run(self.generate_many_async(items))
 
     def run_generate(self, text: str, filename: str) -> str:
         """
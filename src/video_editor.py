@@ -1,140 +1,124 @@
 import os
-from typing import List, Dict
-from moviepy.editor import ImageClip, AudioFileClip, concatenate_videoclips, CompositeVideoClip
-from PIL import Image, ImageDraw, ImageFont
+import math
+import concurrent.futures
+import shutil
+import tempfile
+from typing import List, Dict, Optional
+from moviepy.editor import ImageClip, AudioFileClip, concatenate_videoclips
 import numpy as np
+from PIL import Image
+from caption_renderer import CaptionRenderer
+from caption_track import CaptionTrack, CaptionTrackClip
+from ffmpeg_renderer import FFmpegRenderer, media_duration
+from tracing import span
+
+RENDER_BACKENDS = ("moviepy", "ffmpeg", "stills")
 
 class VideoEditor:
-    def __init__(self):
+    def __init__(self, render_backend: Optional[str] = None, render_workers: Optional[int] = None):
         # Default shorts resolution
         self.width = 1080
         self.height = 1920
+        self.captions = CaptionRenderer(width=self.width)
+
+        # "moviepy" composites frames in Python, "ffmpeg" builds a single filtergraph,
+        # "stills" composes each unique slideshow frame once (falls back to ffmpeg for gameplay)
+        self.render_backend = (render_backend or os.getenv("RENDER_BACKEND") or "moviepy").lower()
+        if self.render_backend not in RENDER_BACKENDS:
+            raise ValueError(f"Unknown render backend '{self.render_backend}'. Choose from {RENDER_BACKENDS}")
+        self.ffmpeg = FFmpegRenderer(width=self.width, height=self.height)
+        self.fps = 24
+
+        # Segment-level render processes for the moviepy slideshow path (1 = single encode)
+        self.render_workers = max(1, int(render_workers or os.getenv("RENDER_WORKERS") or 1))
 
     def create_caption_clip(self, text, duration, start_time):
         """
         Creates a moviepy clip for a short burst of text (2 words).
         Style: Big, Bold, Yellow/White with Black Outline.
+        The sprite comes from the shared caption renderer, so repeated chunks are free.
         """
-        # Canvas size - Increased height for safety
-        img = Image.new('RGBA', (self.width, 500), (0, 0, 0, 0))
-        draw = ImageDraw.Draw(img)
-        
-        # Load Font - Try Arial Bold for that "YouTuber" look
-        fontsize = 150 # Increased for "Big Fonts" request
-        font_name = "arialbd.ttf"
-        try:
-            font = ImageFont.truetype(font_name, fontsize)
-        except:
-            try:
-                font_name = "arial.ttf"
-                font = ImageFont.truetype(font_name, fontsize)
-            except:
-                font = ImageFont.load_default()
-                
-        # --- Shrink to Fit Logic ---
-        # Max width with padding (90% of screen)
-        max_width = self.width * 0.9
-        
-        # We need to measure text. Pillow's getlength is useful.
-        # If unavailable, we catch error and skip (fallback).
-        try:
-            while fontsize > 50:
-                length = draw.textlength(text, font=font)
-                if length > max_width:
-                    fontsize -= 5
-                    font = ImageFont.truetype(font_name, fontsize)
-                else:
-                    break
-        except Exception as e:
-            print(f"Warning: Could not resize text: {e}")
-
-        # Text Handling
-        # Center position
-        w, h = img.size
-        
-        # Draw Outline (Stroke)
-        stroke_width = int(fontsize / 15) # Dynamic stroke
-        x, y = w / 2, h / 2
-        
-        # Draw black outline by drawing text in black at multiple offsets
-        for adj_x in range(-stroke_width, stroke_width+1):
-            for adj_y in range(-stroke_width, stroke_width+1):
-                 draw.text((x+adj_x, y+adj_y), text, font=font, fill='black', anchor='mm')
-        
-        # Draw Main Text (Yellow)
-        text_color = '#FFD700' # Gold/Yellow
-        
-        draw.text((x, y), text, font=font, fill=text_color, anchor='mm')
-        
-        # Convert to clip
-        img_np = np.array(img)
-        clip = ImageClip(img_np, duration=duration)
-        clip = clip.set_position(('center', 1100)).set_start(start_time) # Raised position slightly
+        sprite = self.captions.render(text)
+        clip = ImageClip(sprite.image, duration=duration)
+        clip = clip.set_position((sprite.x, sprite.y)).set_start(start_time)
         return clip
 
+    def new_caption_track(self) -> CaptionTrack:
+        """
+        Empty caption track sharing this editor's sprite cache.
+        """
+        return CaptionTrack(self.captions)
+
+    def chunk_text(self, text: str, chunk_size: int = 2) -> List[str]:
+        """
+        Groups words into caption chunks (2 words is safest for "Big Fonts").
+        """
+        words = text.split()
+        return [' '.join(words[i:i+chunk_size]) for i in range(0, len(words), chunk_size)]
+
+    def add_captions(self, track: CaptionTrack, text: str, start: float, duration: float, words=None):
+        """
+        Splits text into chunks on the track within [start, start + duration].
+        With TTS word timings (objects with .text/.start, relative to the clip) each chunk
+        appears when its first word is spoken; otherwise chunks are spread evenly.
+        """
+        if words:
+            chunk_size = 2
+            starts = [min(w.start, duration) for w in words[::chunk_size]]
+            for idx, chunk_start in enumerate(starts):
+                chunk_end = starts[idx + 1] if idx + 1 < len(starts) else duration
+                chunk = ' '.join(w.text for w in words[idx * chunk_size:(idx + 1) * chunk_size])
+                # The first chunk is shown from the very start of the clip (covers leading silence)
+                if idx == 0:
+                    chunk_start = 0
+                track.add(chunk.upper(), start + chunk_start, chunk_end - chunk_start)
+            return
+
+        chunks = self.chunk_text(text)
+        if not chunks:
+            return
+        time_per_chunk = duration / len(chunks)
+        for idx, chunk in enumerate(chunks):
+            track.add(chunk.upper(), start + idx * time_per_chunk, time_per_chunk)
+
     def create_video(self, segments: List[Dict], image_paths: List[str], audio_paths: List[str], output_file: str):
         """
         Assembles the video via Concatenation (Safer for audio).
         """
         print(f"Assembling video with {len(segments)} segments...")
+        if self.render_backend == "ffmpeg":
+            with span("video.render", backend="ffmpeg", segments=len(segments)):
+                return self._create_video_ffmpeg(segments, image_paths, audio_paths, output_file)
+        if self.render_backend == "stills":
+            with span("video.render", backend="stills", segments=len(segments)):
+                return self._create_video_stills(segments, image_paths, audio_paths, output_file)
+        if self.render_workers > 1:
+            with span("video.render", backend="parallel", segments=len(segments)):
+                return self._create_video_parallel(segments, image_paths, audio_paths, output_file)
+
         segment_clips = []
         
-        for i, segment in enumerate(segments):
-            if i >= len(image_paths) or i >= len(audio_paths):
-                break
+        with span("video.compose", backend="moviepy", segments=len(segments)):
+            for i, segment in enumerate(segments):
+                if i >= len(image_paths) or i >= len(audio_paths):
+                    break
+                    
+                # Load Audio
+                audio_clip = AudioFileClip(audio_paths[i])
+                # The clip is open anyway; the parsed MP3 length can run long on a LAME/Xing header
+                duration = min(segment.get('duration') or audio_clip.duration, audio_clip.duration)
                 
-            # Load Audio
-            audio_clip = AudioFileClip(audio_paths[i])
-            duration = audio_clip.duration
-            
-            # Load Image
-            img_clip = ImageClip(image_paths[i])
-            
-            # Crop/Resize Logic
-            img_w, img_h = img_clip.size
-            target_ratio = self.width / self.height
-            current_ratio = img_w / img_h
-            
-            if current_ratio > target_ratio:
-                 new_width = int(img_h * target_ratio)
-                 center_x = img_w // 2
-                 img_clip = img_clip.crop(x1=center_x - new_width//2, width=new_width, height=img_h)
-            else:
-                 new_height = int(img_w / target_ratio)
-                 center_y = img_h // 2
-                 img_clip = img_clip.crop(y1=center_y - new_height//2, width=img_w, height=new_height)
-                 
-            img_clip = img_clip.resize(newsize=(self.width, self.height))
-            img_clip = img_clip.set_duration(duration)
-            img_clip = img_clip.set_audio(audio_clip)
-            
-            # --- Dynamic Captions (Per Segment) ---
-            full_text = segment.get('text', '')
-            words = full_text.split()
-            
-            # Group words into chunks of 2
-            chunk_size = 2
-            chunks = [' '.join(words[i:i+chunk_size]) for i in range(0, len(words), chunk_size)]
-            
-            txt_clips = []
-            if chunks:
-                time_per_chunk = duration / len(chunks)
+                # Compose this segment (Image + Audio + Text Overlays)
+                segment_composite = self.build_segment_clip(segment, image_paths[i], duration)
+                segment_composite = segment_composite.set_audio(audio_clip)
+                segment_clips.append(segment_composite)
                 
-                for idx, chunk in enumerate(chunks):
-                    # Relative start time for this segment (starts at 0)
-                    start = idx * time_per_chunk
-                    txt_clip = self.create_caption_clip(chunk.upper(), time_per_chunk, start)
-                    txt_clips.append(txt_clip)
-            
-            # Compose this segment (Image + Audio + Text Overlays)
-            # The base clip is img_clip. The text clips overlay on top.
-            segment_composite = CompositeVideoClip([img_clip] + txt_clips).set_duration(duration)
-            segment_clips.append(segment_composite)
-            
-        # Concatenate all segments sequentially
-        final_video = concatenate_videoclips(segment_clips, method="compose")
+            # Concatenate all segments sequentially
+            final_video = concatenate_videoclips(segment_clips, method="compose")
         try:
-            final_video.write_videofile(output_file, fps=24, codec='libx264', audio_codec='aac')
+            # Frame decode + caption compositing happen inside the encode loop (split in span attrs)
+            with span("video.encode", backend="moviepy", duration=final_video.duration):
+                final_video.write_videofile(output_file, fps=self.fps, codec='libx264', audio_codec='aac')
         finally:
             # Cleanup to prevent file locks
             final_video.close()
@@ -142,3 +126,159 @@ class VideoEditor:
                 clip.close()
         
         print(f"Video saved to {output_file}")
+
+    def segment_durations(self, segments: List[Dict], audio_paths: List[str]) -> List[float]:
+        """
+        Voiceover length per segment: the TTS duration stored on the segment, probing the file only without one.
+        """
+        return [segment.get('duration') or media_duration(path) for segment, path in zip(segments, audio_paths)]
+
+    def build_segment_clip(self, segment: Dict, image_path: str, duration: float) -> CaptionTrackClip:
+        """
+        One silent slideshow segment: the cropped still with its captions (times start at 0).
+        """
+        # Load Image
+        img_clip = ImageClip(image_path)
+        
+        # Crop/Resize Logic
+        img_w, img_h = img_clip.size
+        target_ratio = self.width / self.height
+        current_ratio = img_w / img_h
+        
+        if current_ratio > target_ratio:
+             new_width = int(img_h * target_ratio)
+             center_x = img_w // 2
+             img_clip = img_clip.crop(x1=center_x - new_width//2, width=new_width, height=img_h)
+        else:
+             new_height = int(img_w / target_ratio)
+             center_y = img_h // 2
+             img_clip = img_clip.crop(y1=center_y - new_height//2, width=img_w, height=new_height)
+             
+        img_clip = img_clip.resize(newsize=(self.width, self.height))
+        img_clip = img_clip.set_duration(duration)
+        
+        # --- Dynamic Captions (Per Segment) ---
+        track = self.new_caption_track()
+        self.add_captions(track, segment.get('text', ''), 0, duration, segment.get('words'))
+        
+        # The caption track draws straight onto the image frames, no per-chunk layers.
+        return CaptionTrackClip(img_clip, track, duration=duration)
+
+    def render_segment_video(self, segment: Dict, image_path: str, frames: int, output_file: str) -> str:
+        """
+        Encodes one silent segment of exactly `frames` frames with the shared segment codec settings.
+        """
+        # moviepy samples arange(0, duration, 1/fps), i.e. ceil(duration * fps) frames;
+        # sitting half a frame short of the boundary makes that exactly `frames` despite float error
+        duration = (frames - 0.5) / self.fps
+        clip = self.build_segment_clip(segment, image_path, duration)
+        try:
+            clip.write_videofile(output_file, fps=self.fps, codec='libx264', audio=False,
+                                 preset='medium', logger=None)
+        finally:
+            clip.close()
+        return output_file
+
+    def _create_video_parallel(self, segments: List[Dict], image_paths: List[str], audio_paths: List[str], output_file: str):
+        """
+        Renders every segment in its own process, then stream-copies them together.
+        Segment lengths are rounded up to whole frames and the audio is padded to match.
+        """
+        count = min(len(segments), len(image_paths), len(audio_paths))
+        frames = [math.ceil(d * self.fps) for d in self.segment_durations(segments[:count], audio_paths)]
+        work_dir = tempfile.mkdtemp(prefix="segments_", dir=os.path.dirname(os.path.abspath(output_file)))
+        part_paths = [os.path.join(work_dir, f"segment_{i}.mp4") for i in range(count)]
+
+        workers = min(self.render_workers, count)
+        print(f"   - Rendering {count} segments on {workers} processes...")
+        try:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(_render_segment_worker, self.render_backend,
+                                    segments[i], image_paths[i], frames[i], part_paths[i])
+                    for i in range(count)
+                ]
+                for future in futures:
+                    future.result()  # Bubble up the first failure
+
+            durations = [n / self.fps for n in frames]
+            self.ffmpeg.concat_segments(part_paths, audio_paths[:count], durations, output_file)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        print(f"Video saved to {output_file}")
+
+    def _create_video_ffmpeg(self, segments: List[Dict], image_paths: List[str], audio_paths: List[str], output_file: str):
+        """
+        Same slideshow as create_video, rendered as one ffmpeg filtergraph.
+        """
+        count = min(len(segments), len(image_paths), len(audio_paths))
+        durations = self.segment_durations(segments[:count], audio_paths)
+
+        # Captions live on the global timeline here (segments are concatenated inside ffmpeg)
+        track = self.new_caption_track()
+        current_time = 0
+        for segment, duration in zip(segments[:count], durations):
+            self.add_captions(track, segment.get('text', ''), current_time, duration, segment.get('words'))
+            current_time += duration
+
+        self.ffmpeg.render_slideshow(image_paths[:count], audio_paths[:count], track, output_file, durations)
+        print(f"Video saved to {output_file}")
+
+    def _create_video_stills(self, segments: List[Dict], image_paths: List[str], audio_paths: List[str], output_file: str):
+        """
+        Run-length slideshow render: between caption changes every frame is identical, so each
+        unique frame is composed exactly once and shown for its whole run via the concat demuxer.
+        """
+        count = min(len(segments), len(image_paths), len(audio_paths))
+        durations = self.segment_durations(segments[:count], audio_paths)
+        frame_dir = tempfile.mkdtemp(prefix="stills_")
+        runs = []
+        try:
+            for i in range(count):
+                background = self.load_still(image_paths[i])
+                track = self.new_caption_track()
+                self.add_captions(track, segments[i].get('text', ''), 0, durations[i], segments[i].get('words'))
+
+                written = {}  # Same captions over the same background -> same frame file
+                for start, end in track.runs(durations[i]):
+                    mid = (start + end) / 2
+                    key = tuple(id(sp) for sp in track.active(mid))
+                    if key not in written:
+                        path = os.path.join(frame_dir, f"seg{i}_frame{len(written)}.png")
+                        Image.fromarray(track.blit(background, mid)).save(path, compress_level=1)
+                        written[key] = path
+                    runs.append((written[key], end - start))
+
+            print(f"   - {len(runs)} frame runs for {sum(durations):.1f}s of video")
+            self.ffmpeg.render_frame_runs(runs, audio_paths[:count], output_file)
+        finally:
+            shutil.rmtree(frame_dir, ignore_errors=True)
+        print(f"Video saved to {output_file}")
+
+    def load_still(self, image_path: str) -> np.ndarray:
+        """
+        Center-crops an image to the shorts aspect ratio and resizes it to the frame size.
+        """
+        with Image.open(image_path) as img:
+            img = img.convert("RGB")
+            img_w, img_h = img.size
+            target_ratio = self.width / self.height
+            if img_w / img_h > target_ratio:
+                new_width = int(img_h * target_ratio)
+                left = img_w // 2 - new_width // 2
+                img = img.crop((left, 0, left + new_width, img_h))
+            else:
+                new_height = int(img_w / target_ratio)
+                top = img_h // 2 - new_height // 2
+                img = img.crop((0, top, img_w, top + new_height))
+            return np.array(img.resize((self.width, self.height), Image.LANCZOS))
+
+
+# One editor per worker process so fonts and sprite caches stay warm across segments
+_WORKER_EDITOR: Optional[VideoEditor] = None
+
+def _render_segment_worker(render_backend: str, segment: Dict, image_path: str, frames: int, output_file: str) -> str:
+    global _WORKER_EDITOR
+    if _WORKER_EDITOR is None:
+        _WORKER_EDITOR = VideoEditor(render_backend=render_backend, render_workers=1)
+    return _WORKER_EDITOR.render_segment_video(segment, image_path, frames, output_file)
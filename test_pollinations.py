@@ -1,10 +1,15 @@
-import requests
+import os
+import sys
 import urllib.parse
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+from http_client import get_client
+
 prompt = "Write a one sentence fact about space."
 safe_prompt = urllib.parse.quote(prompt)
 
 models = ["", "openai", "searchgpt", "mistral", "turbo"]
+http = get_client()
 
 for m in models:
     url = f"https://text.pollinations.ai/{safe_prompt}"
@@ -13,10 +18,12 @@ for m in models:
     
     print(f"Testing Model '{m}': {url}")
     try:
-        response = requests.get(url)
+        response = http.get(url)
         print(f"Status: {response.status_code}")
         if response.status_code == 200:
             print(f"Content: {response.text[:50]}...")
     except Exception as e:
         print(f"Error: {e}")
     print("-" * 20)
+
+print(f"Latency: {http.stats()}")